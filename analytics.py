@@ -0,0 +1,417 @@
+"""
+Aggregation helpers for the dashboard.
+
+The transaction table is rolled up once per dataset version into a cube keyed by
+(day, category, country, city, type, hour, weekday, flow). Charts answer by
+rolling up the cube instead of scanning transactions, so their cost depends on
+the number of distinct key combinations rather than the number of rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+from calendar_dimension import add_calendar_keys, month_labels
+from data_store import align_categories, amount_cents, to_cents
+from kpi_index import KPIIndex
+from perf import span
+
+# Cube dimensions; the calendar keys (calendar_dimension.CALENDAR_KEYS) are carried along as attributes of Date
+CUBE_KEYS = ['Date', 'Merchant_Category', 'Country', 'City', 'Type', 'Hour', 'Weekday', 'Flow']
+
+# Sign of a transaction: expenses are negative amounts, income positive
+FLOW_CATEGORIES = ['Expense', 'Income', 'Zero']
+
+# Columns of the per-filter expense/income selections (read by the 3D scatter and the AI advisor)
+FLOW_VIEW_COLUMNS = ['Date', 'Amount', 'Amount_Abs', 'Merchant_Category', 'Hour']
+
+# Columns of the balance scatter sample and the number of rows it (and the 3D scatter) shows
+SCATTER_COLUMNS = ['Date', 'Amount', 'Amount_Abs', 'Balance', 'Merchant_Category']
+SCATTER_ROWS = 500
+SCATTER_3D_ROWS = 300
+
+
+def _cells_to_euros(cube):
+    """Cube cells summed in integer cents (exact) as euro amounts."""
+    return cube.assign(Amount=cube['Amount'] / 100, Amount_Abs=cube['Amount_Abs'] / 100)
+
+
+def build_cube(df):
+    """Aggregate transactions into the cube (one pass over the table)."""
+    amount = df['Amount'].to_numpy()
+    cents = amount_cents(df)
+    flow = np.where(amount < 0, 0, np.where(amount > 0, 1, 2))
+    keyed = df.assign(Flow=pd.Categorical.from_codes(flow, FLOW_CATEGORIES), Cents=cents, Abs_Cents=np.abs(cents))
+    cube = keyed.groupby(CUBE_KEYS, observed=True, sort=False).agg(
+        Amount=('Cents', 'sum'),
+        Amount_Abs=('Abs_Cents', 'sum'),
+        Max_Abs=('Amount_Abs', 'max'),
+        Count=('Amount', 'size'),
+    ).reset_index()
+    # Calendar keys are derived from the (far fewer) cube rows rather than every transaction
+    return add_calendar_keys(_cells_to_euros(cube).sort_values('Date', kind='stable').reset_index(drop=True))
+
+
+def extend_cube(cube, new_rows):
+    """
+    Fold transactions appended after the cube was built (dated on or after its last
+    day) into the cube. Only the new rows are aggregated; cube cells from their
+    first day onward are merged with them, everything before is reused as is.
+    """
+    if len(new_rows) == 0:
+        return cube
+    cube, new_cube = align_categories(cube, build_cube(new_rows))
+    lo = int(np.searchsorted(cube['Date'].to_numpy(), new_cube['Date'].iloc[0].to_datetime64(), side='left'))
+    cells = pd.concat([cube.iloc[lo:], new_cube], ignore_index=True)
+    merged = cells.assign(Cents=to_cents(cells['Amount']), Abs_Cents=to_cents(cells['Amount_Abs'])).groupby(
+        CUBE_KEYS, observed=True, sort=False).agg(
+        Amount=('Cents', 'sum'),
+        Amount_Abs=('Abs_Cents', 'sum'),
+        Max_Abs=('Max_Abs', 'max'),
+        Count=('Count', 'sum'),
+    ).reset_index()
+    merged = add_calendar_keys(_cells_to_euros(merged).sort_values('Date', kind='stable'))
+    return pd.concat([cube.iloc[:lo], merged], ignore_index=True)
+
+
+def date_range_bounds(frame, start_date, end_date):
+    """
+    Positional bounds [lo, hi) of an inclusive date range in a Date-sorted frame,
+    found with two binary searches instead of comparing every row.
+    """
+    dates = frame['Date'].to_numpy()
+    start = pd.Timestamp(start_date).to_datetime64()
+    end = (pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_datetime64()
+    return int(np.searchsorted(dates, start, side='left')), int(np.searchsorted(dates, end, side='left'))
+
+
+def category_mask(frame, category):
+    """Boolean mask of rows in a category, compared on the precomputed categorical codes."""
+    column = frame['Merchant_Category']
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        return (column == category).to_numpy()
+    categories = column.cat.categories
+    if category not in categories:
+        return np.zeros(len(frame), dtype=bool)
+    return column.cat.codes.to_numpy() == categories.get_loc(category)
+
+
+def filter_date_category(frame, start_date, end_date, category='All'):
+    """
+    Restrict a Date-sorted frame (transactions or cube) to an inclusive date range
+    and an optional category. The date range is a positional slice, not a copy.
+    """
+    lo, hi = date_range_bounds(frame, start_date, end_date)
+    view = frame.iloc[lo:hi]
+    if category != 'All':
+        view = view[category_mask(view, category)]
+    return view
+
+
+def filter_row_ids(frame, row_ids, start_date, end_date, category='All'):
+    """
+    Restrict sorted row ids of a Date-sorted RangeIndex frame to an inclusive date
+    range and an optional category, looking only at the given rows.
+    """
+    lo, hi = date_range_bounds(frame, start_date, end_date)
+    row_ids = row_ids[np.searchsorted(row_ids, lo):np.searchsorted(row_ids, hi)]
+    if category != 'All':
+        column = frame['Merchant_Category']
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            categories = column.cat.categories
+            if category not in categories:
+                return row_ids[:0]
+            row_ids = row_ids[column.cat.codes.to_numpy()[row_ids] == categories.get_loc(category)]
+        else:
+            row_ids = row_ids[column.to_numpy()[row_ids] == category]
+    return row_ids
+
+
+def rollup(cube, by, value='Amount_Abs'):
+    """Sum one measure of the cube over the given dimension(s)."""
+    return cube.groupby(by, observed=True)[value].sum().reset_index()
+
+
+def rollup_stats(cube, by):
+    """Total, transaction count and mean of Amount_Abs over the given dimension(s)."""
+    stats = cube.groupby(by, observed=True).agg(Total=('Amount_Abs', 'sum'), Count=('Count', 'sum')).reset_index()
+    stats['Mean'] = stats['Total'] / stats['Count']
+    return stats
+
+
+def monthly_summary_from_cube(cube):
+    """Monthly income, expenses and net flow (Month, Income, Expenses, Net)."""
+    if len(cube) == 0:
+        return pd.DataFrame(columns=['Month', 'Income', 'Expenses', 'Net'])
+    income = cube[cube['Flow'] == 'Income'].groupby('MonthKey')['Amount'].sum().rename('Income')
+    expenses = cube[cube['Flow'] == 'Expense'].groupby('MonthKey')['Amount_Abs'].sum().rename('Expenses')
+    summary = pd.concat([income, expenses], axis=1).fillna(0).sort_index()
+    summary.insert(0, 'Month', month_labels(summary.index))
+    summary = summary.reset_index(drop=True)
+    summary['Net'] = summary['Income'] - summary['Expenses']
+    return summary
+
+
+def period_totals(filtered_df, expenses_df, income_df):
+    """
+    Raw aggregates of the filtered transactions that the KPIs are derived from
+    (the SQL backend returns the same dict from a single query).
+    """
+    totals = {'transactions': len(filtered_df)}
+    if len(filtered_df) > 0:
+        # Money totals are summed in integer cents
+        cents = amount_cents(filtered_df)
+        totals['total_income'] = cents[cents > 0].sum() / 100
+        totals['total_expenses'] = -cents[cents < 0].sum() / 100
+        totals['first_date'] = filtered_df['Date'].iloc[0]
+        totals['last_date'] = filtered_df['Date'].iloc[-1]
+        totals['unique_days'] = filtered_df['Date'].nunique()
+        totals['mean_amount'] = filtered_df['Amount'].mean()
+    totals['largest_expense'] = abs(expenses_df['Amount'].min()) if len(expenses_df) > 0 else 0
+    totals['largest_income'] = income_df['Amount'].max() if len(income_df) > 0 else 0
+    if len(expenses_df) > 0:
+        # Expenses of the most recent month in the filtered data, not the actual current month
+        most_recent_date = expenses_df['Date'].iloc[-1]
+        month_start = most_recent_date.to_period('M').start_time
+        totals['last_expense_date'] = most_recent_date
+        in_month = (expenses_df['Date'] >= month_start).to_numpy()
+        totals['current_month_expenses'] = -amount_cents(expenses_df)[in_month].sum() / 100
+    return totals
+
+
+def kpis_from_totals(totals, balances, monthly_budget):
+    """Headline KPI values from the period aggregates of `period_totals`."""
+    kpis = {}
+    if totals['transactions'] > 0:
+        # Balance at the end of the latest day in view, reconstructed from amounts (binary search)
+        current_balance = balances.balance_as_of(totals['last_date'])
+        total_income = totals['total_income']
+        total_expenses = totals['total_expenses']
+        date_range_days = (totals['last_date'] - totals['first_date']).days
+    else:
+        current_balance = 0
+        total_income = 0
+        total_expenses = 0
+        date_range_days = 1
+    if totals['transactions'] > 0:
+        kpis['first_date'] = totals['first_date']
+        kpis['last_date'] = totals['last_date']
+    kpis['current_balance'] = current_balance
+    kpis['balance_divergences'] = balances.divergence_count
+    kpis['total_income'] = total_income
+    kpis['total_expenses'] = total_expenses
+    kpis['date_range_days'] = date_range_days
+    kpis['net_flow'] = total_income - total_expenses
+
+    # Date range calculations
+    date_range_months = date_range_days / 30.44 if date_range_days > 0 else 1
+    kpis['date_range_months'] = date_range_months
+
+    # Monthly calculations
+    # Monthly income is fixed at €1000 (monthly stipend)
+    kpis['avg_monthly_income'] = 1000.0
+    kpis['avg_monthly_expenses'] = total_expenses / max(date_range_months, 1)
+    kpis['savings_rate'] = ((total_income - total_expenses) / total_income * 100) if total_income > 0 else 0
+
+    # Additional KPIs
+    total_transactions = totals['transactions']
+    unique_days = totals['unique_days'] if total_transactions > 0 else 0
+    kpis['total_transactions'] = total_transactions
+    kpis['avg_transaction_size'] = abs(totals['mean_amount']) if total_transactions > 0 else 0
+    kpis['avg_daily_spending'] = total_expenses / max(date_range_days, 1) if date_range_days > 0 else 0
+    kpis['largest_expense'] = totals['largest_expense']
+    kpis['largest_income'] = totals['largest_income']
+    kpis['unique_days'] = unique_days
+    kpis['transactions_per_day'] = total_transactions / max(unique_days, 1) if unique_days > 0 else 0
+
+    # Budget calculations - use the most recent month in filtered data, not the actual current month
+    if 'last_expense_date' in totals:
+        kpis['current_month'] = totals['last_expense_date'].strftime('%Y-%m')
+        kpis['current_month_expenses'] = totals['current_month_expenses']
+    else:
+        kpis['current_month'] = pd.Timestamp.now().strftime('%Y-%m')
+        kpis['current_month_expenses'] = 0
+    kpis['budget_used_pct'] = (kpis['current_month_expenses'] / monthly_budget * 100) if monthly_budget > 0 else 0
+    kpis['budget_remaining'] = monthly_budget - kpis['current_month_expenses']
+    return kpis
+
+
+def top_merchants(expenses_df, n=15):
+    """Merchants with the highest total spending (Merchant, Total Spent)."""
+    if len(expenses_df) == 0:
+        return pd.DataFrame(columns=['Merchant', 'Total Spent'])
+    spent = pd.Series(-amount_cents(expenses_df), index=expenses_df.index)
+    merchants = spent.groupby(expenses_df['Description_Anon'], observed=True).sum().reset_index()
+    merchants.columns = ['Merchant', 'Total Spent']
+    merchants = merchants.sort_values('Total Spent', ascending=False).head(n)
+    merchants['Total Spent'] = merchants['Total Spent'] / 100
+    return merchants
+
+
+def first_rows(frame, columns, n, expenses_only=False):
+    """The first n rows of a frame with a non-zero (or, with expenses_only, negative) amount."""
+    amount = frame['Amount'].to_numpy()
+    # Gather just those rows rather than masking the whole range
+    ids = np.flatnonzero(amount < 0 if expenses_only else amount != 0)[:n]
+    return frame.iloc[ids][[col for col in columns if col in frame.columns]]
+
+
+def filtered_rows(df, row_index, start_date, end_date, category='All', filters=(), amount_range=None):
+    """
+    The rows selected by one set of filters (see filtered_view) and their expense
+    and income rows. `row_ids` are the selected row positions for the multi-select
+    filters, None for a date range and category (a contiguous slice).
+    """
+    if filters or amount_range is not None:
+        # Date range via binary search, the other filters by AND/OR of packed bitmaps over that window
+        lo, hi = date_range_bounds(df, start_date, end_date)
+        row_ids = row_index.select(lo, hi, filters, amount_range)
+        filtered_df = df.iloc[row_ids]
+    else:
+        # Date range via binary search on the sorted Date column + category code mask
+        row_ids = None
+        filtered_df = filter_date_category(df, start_date, end_date, category)
+    # Expense/income rows gather only the columns their readers use; the column
+    # selection itself is a copy-on-write view of the shared table
+    flows = filtered_df[FLOW_VIEW_COLUMNS]
+    expenses_df = flows[flows['Amount'] < 0] if len(filtered_df) > 0 else pd.DataFrame()
+    income_df = flows[flows['Amount'] > 0] if len(filtered_df) > 0 else pd.DataFrame()
+    return {'filtered_df': filtered_df, 'row_ids': row_ids, 'expenses_df': expenses_df, 'income_df': income_df}
+
+
+def filtered_view(df, cube, balances, engine, row_index, cube_index, start_date, end_date, category='All',
+                  filters=(), amount_range=None, monthly_budget=0):
+    """
+    Everything the dashboard shows for one set of filters: the selected rows, their
+    expense/income columns, the matching cube cells, KPIs, monthly summary, daily
+    balances, top merchants and the rows sampled by the scatter charts. `filters`
+    holds (column, picked values) pairs of the multi-select filters, `amount_range`
+    an inclusive amount bound or None; without either, the query engine answers for
+    the date range and a single category - and `df` may be None (a scan version),
+    leaving the row-level entries None. Each step is timed as a span of the active trace.
+    """
+    multi_filter = bool(filters) or amount_range is not None
+    with span('filter') as filter_span:
+        if df is None:
+            rows = {'filtered_df': None, 'row_ids': None, 'expenses_df': None, 'income_df': None}
+        else:
+            rows = filtered_rows(df, row_index, start_date, end_date, category, filters, amount_range)
+            filter_span.rows = len(rows['filtered_df'])
+        filtered_df, expenses_df, income_df = rows['filtered_df'], rows['expenses_df'], rows['income_df']
+
+    # The balance is a property of the account, so only the date range applies
+    with span('daily_balances'):
+        daily_balances = balances.daily_balances(start_date, end_date)
+
+    if not multi_filter:
+        # Same filters applied to the aggregation cube - charts roll this up instead of scanning rows
+        with span('cube_view') as cube_span:
+            cube_view = engine.cube(start_date, end_date, category)
+            cube_span.rows = len(cube_view)
+        with span('monthly_summary'):
+            monthly_summary = engine.monthly_summary(start_date, end_date, category)
+        with span('kpis'):
+            kpis = kpis_from_totals(engine.totals(start_date, end_date, category), balances, monthly_budget)
+        with span('top_merchants'):
+            merchants = engine.top_merchants(start_date, end_date, category)
+    else:
+        # The query engines only know date + category: the rest is answered from the selected rows
+        with span('cube_view') as cube_span:
+            if amount_range is None and all(col in cube_index.columns for col, _ in filters):
+                # Every filter is a cube dimension - select cube cells with the cube's own bitmaps
+                lo, hi = date_range_bounds(cube, start_date, end_date)
+                cube_view = cube.iloc[cube_index.select(lo, hi, filters)]
+            else:
+                # Product and amount are not cube dimensions - aggregate the selected rows instead
+                cube_view = build_cube(filtered_df)
+            cube_span.rows = len(cube_view)
+        with span('monthly_summary'):
+            monthly_summary = monthly_summary_from_cube(cube_view)
+        with span('kpis'):
+            kpis = kpis_from_totals(period_totals(filtered_df, expenses_df, income_df), balances, monthly_budget)
+        with span('top_merchants'):
+            merchants = top_merchants(filtered_df.loc[filtered_df['Amount'] < 0, ['Description_Anon', 'Amount']])
+
+    with span('scatter_rows'):
+        if filtered_df is not None:
+            scatter = first_rows(filtered_df, SCATTER_COLUMNS, SCATTER_ROWS)
+            expense_rows = expenses_df.head(SCATTER_3D_ROWS)
+        else:
+            scatter = engine.first_rows(start_date, end_date, category, SCATTER_COLUMNS, SCATTER_ROWS)
+            expense_rows = engine.first_rows(start_date, end_date, category, FLOW_VIEW_COLUMNS, SCATTER_3D_ROWS,
+                                             expenses_only=True)
+
+    return {
+        **rows,
+        'cube_view': cube_view,
+        'expense_cube': cube_view[cube_view['Flow'] == 'Expense'],
+        'monthly_summary': monthly_summary,
+        'kpis': kpis,
+        'daily_balances': daily_balances,
+        'top_merchants': merchants,
+        'scatter_rows': scatter,
+        'expense_rows': expense_rows,
+    }
+
+
+def sort_order(frame, column):
+    """Row positions of a RangeIndex frame ordered by one column (stable, missing values last)."""
+    return frame[column].sort_values(kind='stable').index.to_numpy()
+
+
+def order_rank(order):
+    """Inverse of a sort order: the position of every row in it."""
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank
+
+
+def ordered_rows(order, row_ids, n_rows, ascending=True, rank=None):
+    """
+    Row ids of a subset arranged in a precomputed order of the full table.
+
+    The subset is marked in a boolean membership mask and read back in `order`,
+    so no frame is sorted or copied; descending order walks the same array backwards.
+    Small subsets (e.g. search hits) are instead sorted by their rank when given.
+    """
+    if len(row_ids) == n_rows:
+        ordered = order
+    elif rank is not None and len(row_ids) < n_rows // 16:
+        ordered = row_ids[np.argsort(rank[row_ids], kind='stable')]
+    else:
+        member = np.zeros(n_rows, dtype=bool)
+        member[row_ids] = True
+        ordered = order[member[order]]
+    return ordered if ascending else ordered[::-1]
+
+
+class PandasEngine:
+    """In-memory query backend: aggregates come from the prebuilt cube, the KPI index and the Date-sorted table."""
+
+    name = 'pandas'
+
+    def __init__(self, df, cube, kpi_index=None):
+        self.df = df
+        self._cube = cube
+        # The dataset manager passes the version's index (extended on appends); built here otherwise
+        self._kpis = kpi_index if kpi_index is not None else KPIIndex(df)
+
+    def cube(self, start_date, end_date, category='All'):
+        """The aggregation cube restricted to the filters."""
+        return filter_date_category(self._cube, start_date, end_date, category)
+
+    def totals(self, start_date, end_date, category='All'):
+        """Period aggregates of the filtered transactions (see period_totals), from prefix-sum lookups."""
+        return self._kpis.totals(start_date, end_date, category)
+
+    def monthly_summary(self, start_date, end_date, category='All'):
+        """Monthly income, expenses and net flow (Month, Income, Expenses, Net)."""
+        return monthly_summary_from_cube(self.cube(start_date, end_date, category))
+
+    def top_merchants(self, start_date, end_date, category='All', n=15):
+        """Merchants with the highest total spending (Merchant, Total Spent)."""
+        filtered = filter_date_category(self.df, start_date, end_date, category)
+        return top_merchants(filtered.loc[filtered['Amount'] < 0, ['Description_Anon', 'Amount']], n)
+
+    def first_rows(self, start_date, end_date, category, columns, n, expenses_only=False):
+        """The first n rows (in Date order) with a non-zero or negative amount (see first_rows)."""
+        return first_rows(filter_date_category(self.df, start_date, end_date, category), columns, n, expenses_only)
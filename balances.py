@@ -0,0 +1,156 @@
+"""
+Running-balance engine.
+
+Balances are reconstructed from the transaction amounts instead of trusting
+the reported Balance column (or the row order it implies): each ledger - one
+account, or the whole table when there is no Account column - gets a running
+total from a single cumulative sum over integer cents, anchored on the
+ledger's first reported balance. Rows whose reported Balance disagrees with the
+reconstruction are flagged.
+
+Every ledger's balance is its opening balance plus the sum of its amounts so
+far, and a ledger counts towards the total only from its first row on (before
+that nothing is known about it). The total over all ledgers after any row is
+then one table-wide cumulative sum of the amounts, with each ledger's opening
+added at its first row. "Balance as of a date" is a single binary search over
+the Date-sorted rows and one array lookup, and the end-of-day balances behind
+the balance chart are that same array sampled at the last row of every day.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from data_store import amount_cents, to_cents
+
+# Columns identifying a ledger (one running balance) when present in the data. Product is not one:
+# the statements carry a single Balance that runs across the Current/Savings/Deposit rows alike
+LEDGER_COLUMNS = ['Account']
+
+# Reported balances further than this from the reconstruction are flagged (in cents)
+BALANCE_TOLERANCE_CENTS = 1
+
+
+class BalanceEngine:
+    """Reconstructed per-ledger running balances of a Date-sorted transaction table."""
+
+    def __init__(self, df, by=None):
+        self.by = [col for col in (LEDGER_COLUMNS if by is None else by) if col in df.columns]
+        self.n_rows = 0
+        self.ledgers = pd.Index([])
+        self.dates = np.empty(0, dtype='datetime64[ns]')
+        self.ledger = np.empty(0, dtype=np.int64)
+        self.running_cents = np.empty(0, dtype=np.int64)
+        # Total balance of the ledgers started so far after each row, and the end-of-day rows of the table
+        self.cumulative_cents = np.empty(0, dtype=np.int64)
+        self.day_dates = np.empty(0, dtype='datetime64[ns]')
+        self.day_end_rows = np.empty(0, dtype=np.int64)
+        self.diverged = np.empty(0, dtype=bool)
+        self.opening_cents = np.empty(0, dtype=np.int64)
+        self.closing_cents = np.empty(0, dtype=np.int64)
+        self._ingest(df)
+
+    def _ledger_labels(self, df):
+        if not self.by:
+            return pd.Index(np.zeros(len(df), dtype=np.int64))
+        if len(self.by) == 1:
+            return pd.Index(df[self.by[0]].astype(object))
+        return pd.MultiIndex.from_frame(df[self.by].astype(object))
+
+    def _ingest(self, df):
+        """Append the running balances of rows that follow the ones already ingested."""
+        labels = self._ledger_labels(df)
+        codes = self.ledgers.get_indexer(labels) if len(self.ledgers) else np.full(len(df), -1)
+        if (codes < 0).any():
+            new_ledgers = labels[codes < 0].unique()
+            self.ledgers = self.ledgers.append(new_ledgers) if len(self.ledgers) else new_ledgers
+            codes = self.ledgers.get_indexer(labels)
+        codes = np.asarray(codes, dtype=np.int64)
+
+        amount = amount_cents(df)
+        reported = df['Balance'].to_numpy(dtype=float)
+        reported_cents = to_cents(reported)
+
+        # Group rows by ledger (stable, so each ledger keeps date order) and restart the
+        # cumulative sum at every ledger boundary
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(order) else np.empty(0, dtype=np.int64)
+        lengths = np.diff(np.r_[starts, len(order)])
+        start_ledgers = sorted_codes[starts]
+        csum = np.cumsum(amount[order])
+        within = csum - np.repeat(csum[starts] - amount[order][starts], lengths)
+
+        # Carry on from each ledger's closing balance; new ledgers open at their first reported balance
+        n_ledgers = len(self.ledgers)
+        opening = np.r_[self.opening_cents, np.zeros(n_ledgers - len(self.opening_cents), dtype=np.int64)]
+        closing = np.r_[self.closing_cents, np.zeros(n_ledgers - len(self.closing_cents), dtype=np.int64)]
+        known = start_ledgers < len(self.closing_cents)
+        first_rows = order[starts]
+        start_balance = np.where(known, closing[start_ledgers], reported_cents[first_rows] - amount[first_rows])
+        opening[start_ledgers[~known]] = start_balance[~known]
+
+        running = np.empty(len(order), dtype=np.int64)
+        running[order] = within + np.repeat(start_balance, lengths)
+        closing[start_ledgers] = running[order[starts + lengths - 1]]
+
+        diverged = ~np.isnan(reported) & (np.abs(reported_cents - running) > BALANCE_TOLERANCE_CENTS)
+
+        # A new ledger's opening joins the total at its first row
+        flow = amount.copy()
+        flow[first_rows[~known]] += start_balance[~known]
+
+        dates = df['Date'].to_numpy(dtype='datetime64[ns]')
+        carried = self.cumulative_cents[-1] if len(self.cumulative_cents) else 0
+        # The previous last day may continue in the new rows, so its end row is recomputed
+        first_new_day = len(self.day_dates) - 1 if len(self.day_dates) and len(dates) \
+            and dates[0] == self.day_dates[-1] else len(self.day_dates)
+        all_dates = np.concatenate([self.dates, dates])
+        tail_start = self.day_end_rows[first_new_day - 1] + 1 if first_new_day > 0 else 0
+        tail = all_dates[tail_start:]
+        tail_ends = np.flatnonzero(np.r_[tail[1:] != tail[:-1], True]) + tail_start if len(tail) else \
+            np.empty(0, dtype=np.int64)
+
+        self.dates = all_dates
+        self.ledger = np.concatenate([self.ledger, codes])
+        self.running_cents = np.concatenate([self.running_cents, running])
+        self.cumulative_cents = np.concatenate([self.cumulative_cents, carried + np.cumsum(flow)])
+        self.day_end_rows = np.concatenate([self.day_end_rows[:first_new_day], tail_ends])
+        self.day_dates = all_dates[self.day_end_rows]
+        self.diverged = np.concatenate([self.diverged, diverged])
+        self.opening_cents = opening
+        self.closing_cents = closing
+        self.n_rows += len(df)
+
+    def extended(self, df):
+        """Engine for `df`, the ingested table with rows appended at the end (only new rows are summed)."""
+        if len(df) == self.n_rows:
+            return self
+        engine = copy.copy(self)
+        engine._ingest(df.iloc[self.n_rows:])
+        return engine
+
+    @property
+    def running(self):
+        """Reconstructed balance after each row, in euros."""
+        return self.running_cents / 100
+
+    @property
+    def divergence_count(self):
+        """Rows whose reported Balance differs from the reconstructed running balance."""
+        return int(self.diverged.sum())
+
+    def balance_as_of(self, date):
+        """Total balance at the end of `date` over the ledgers started by then (0 before the first row)."""
+        end = (pd.Timestamp(date).normalize() + pd.Timedelta(days=1)).to_datetime64()
+        pos = int(np.searchsorted(self.dates, end, side='left'))
+        return int(self.cumulative_cents[pos - 1]) / 100 if pos > 0 else 0.0
+
+    def daily_balances(self, start_date, end_date):
+        """Total balance at the end of every day with transactions in an inclusive date range (Date, Balance)."""
+        start = pd.Timestamp(start_date).to_datetime64()
+        end = (pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_datetime64()
+        lo, hi = np.searchsorted(self.day_dates, [start, end], side='left')
+        balance = self.cumulative_cents[self.day_end_rows[lo:hi]] / 100
+        return pd.DataFrame({'Date': self.day_dates[lo:hi], 'Balance': balance})
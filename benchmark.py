@@ -0,0 +1,312 @@
+"""
+Headless benchmark of the dashboard compute pipeline.
+
+Drives the same code paths as dashboard.py - loading, the derived per-version
+structures, filtering, KPIs, the monthly summary, every chart's aggregation and
+figure build, search and explorer paging - outside Streamlit, on datasets made
+by generate_dummy_data at several sizes. Each stage reports its best wall time
+over a few repeats and, from a separate pass under tracemalloc (which slows
+allocation-heavy code), its peak traced memory. Results can be saved as a
+baseline and later runs compared against it to catch regressions.
+
+    python benchmark.py                                  # 1k, 100k, 1M and 10M rows
+    python benchmark.py --rows 1000 100000 --save-baseline baseline.json
+    python benchmark.py --rows 1000 100000 --baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+import plotly.io as pio
+
+from analytics import build_cube, filter_row_ids, filtered_view, order_rank, ordered_rows, rollup, sort_order
+from balances import BalanceEngine
+from bitmap_index import FILTER_COLUMNS, BitmapIndex
+from charts import (FIGURE_BUILDERS, average_by_category, category_expenses, category_monthly, category_totals,
+                    country_category_pivot, country_metrics, country_spending_map, health_score, hour_expenses,
+                    location_hierarchy, top_categories, top_cities, weekday_hour_pivot)
+from data_store import (dataset_mtime, enable_copy_on_write, parquet_path_for, read_csv_transactions,
+                        read_transactions, snapshot_path_for, write_parquet, write_snapshot)
+from dataset_manager import build_scan_version
+from generate_dummy_data import END_DATE, START_DATE, write_transactions_streaming
+from kpi_index import KPIIndex
+from perf import start_trace
+from query_engines import QUERY_ENGINES, create_engine
+from search_index import SearchIndex
+
+DEFAULT_ROWS = [1_000, 100_000, 1_000_000, 10_000_000]
+
+# A stage regresses when it is this much slower (or uses this much more memory) than the baseline
+DEFAULT_THRESHOLD = 0.25
+
+# Stages faster than this in both runs are too noisy to compare
+MIN_COMPARABLE_SECONDS = 0.005
+
+
+class StageRecorder:
+    """Best wall time, or peak traced memory when tracemalloc is running, of named stages."""
+
+    def __init__(self):
+        self.track_memory = tracemalloc.is_tracing()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            baseline_bytes = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        result = self.stages.setdefault(name, {})
+        if self.track_memory:
+            peak_bytes = tracemalloc.get_traced_memory()[1] - baseline_bytes
+            result['peak_bytes'] = max(result.get('peak_bytes', 0), peak_bytes)
+        else:
+            result['seconds'] = min(result.get('seconds', seconds), seconds)
+
+    def record_spans(self, trace, prefix=''):
+        """Wall times of a trace's spans as stages named after them (no memory: spans only keep time)."""
+        if self.track_memory:
+            return
+        for span in trace.spans:
+            result = self.stages.setdefault(prefix + span.name, {})
+            seconds = span.duration_ms / 1000
+            result['seconds'] = min(result.get('seconds', seconds), seconds)
+
+
+# Charts as dashboard.py draws them: chart name -> (figure builder, prepare(view) -> (data, params)),
+# with the inputs from the chart input functions both share
+CHARTS = {
+    'health_gauge': ('health_gauge', lambda view: (health_score(view['kpis']['savings_rate']), {})),
+    'monthly_waterfall': ('monthly_waterfall', lambda view: (view['monthly_summary'], {})),
+    'balance_trend': ('balance_trend', lambda view: (
+        view['daily_balances'], {'current_balance': view['kpis']['current_balance']})),
+    'top_categories_bar': ('top_categories_bar', lambda view: (top_categories(view['expense_cube']), {})),
+    'income_expenses': ('income_expenses', lambda view: (view['monthly_summary'], {})),
+    'category_bar': ('category_bar', lambda view: (
+        category_expenses(category_totals(view['expense_cube'])), {'text_size': 12, 'text_family': 'Inter'})),
+    'scatter_balance': ('scatter_balance', lambda view: (view['scatter_rows'], {})),
+    'scatter_3d': ('scatter_3d', lambda view: (view['expense_rows'], {})),
+    'category_trends': ('category_trends', lambda view: (
+        category_monthly(view['expense_cube'], category_totals(view['expense_cube']), 5), {})),
+    'avg_category_spending': ('avg_category_spending', lambda view: (average_by_category(view['expense_cube']), {})),
+    'category_stacked_area': ('category_stacked_area', lambda view: (
+        category_monthly(view['expense_cube'], category_totals(view['expense_cube']), 6), {})),
+    'weekday_spending': ('weekday_spending', lambda view: (rollup(view['expense_cube'], 'WeekdayCode'), {})),
+    'hour_spending': ('hour_spending', lambda view: (hour_expenses(view['expense_cube']), {})),
+    'weekday_hour_heatmap': ('weekday_hour_heatmap', lambda view: (weekday_hour_pivot(view['expense_cube']), {})),
+    'top_merchants': ('top_merchants', lambda view: (view['top_merchants'], {})),
+    'world_map': ('world_map', lambda view: (country_spending_map(view['expense_cube']), {})),
+    'country_bubble': ('country_bubble', lambda view: (country_metrics(view['expense_cube']), {})),
+    'sunburst_hierarchy': ('sunburst_hierarchy', lambda view: (location_hierarchy(view['expense_cube']), {})),
+    'country_trends': ('country_trends', lambda view: (rollup(view['expense_cube'], ['MonthKey', 'Country']), {})),
+    'country_category_heatmap': ('country_category_heatmap', lambda view: (
+        country_category_pivot(view['expense_cube']), {})),
+    'city_bar': ('city_bar', lambda view: (top_cities(view['expense_cube']), {})),
+    'country_stacked_area': ('country_stacked_area', lambda view: (
+        rollup(view['expense_cube'], ['MonthKey', 'Country']), {})),
+}
+
+
+def dataset_path(data_dir, rows, seed):
+    """Generated benchmark CSV for a row count, created on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    csv_path = os.path.join(data_dir, f'bench_{rows}_seed{seed}.csv')
+    if not os.path.exists(csv_path):
+        print(f"  generating {rows:,} rows → {csv_path}")
+        write_transactions_streaming(rows, START_DATE, END_DATE, csv_path=csv_path, seed=seed)
+    return csv_path
+
+
+def run_pipeline(csv_path, engine_name, repeat, search_term='bolt', page_size=100):
+    """Run every stage of the dashboard pipeline on one dataset; returns {stage: {seconds} or {peak_bytes}}."""
+    recorder = StageRecorder()
+    stage = recorder.stage
+
+    # Cold start: parse the CSV, write the Parquet copy and the Arrow snapshot every later load memory-maps
+    with stage('load_csv'):
+        df = read_csv_transactions(csv_path)
+    with stage('write_parquet'):
+        write_parquet(df, parquet_path_for(csv_path))
+    with stage('write_snapshot'):
+        write_snapshot(df, snapshot_path_for(csv_path))
+    del df
+    for _ in range(repeat):
+        with stage('load_snapshot'):
+            df = read_transactions(csv_path)
+
+    # Scan version of the Parquet-scanning engines: balances and filter options, without the table
+    scan = None
+    if engine_name != 'pandas':
+        for _ in range(repeat):
+            with stage('build_scan_version'):
+                scan = build_scan_version(csv_path, dataset_mtime(csv_path))
+
+    # Per-version structures built by the dataset manager
+    with stage('build_cube'):
+        cube = build_cube(df)
+    with stage('build_search_index'):
+        search_index = SearchIndex(df)
+    with stage('build_kpi_index'):
+        kpi_index = KPIIndex(df)
+    with stage('build_bitmap_index'):
+        bitmap_index = BitmapIndex(df)
+    with stage('build_cube_bitmap_index'):
+        cube_bitmap_index = BitmapIndex(cube, FILTER_COLUMNS, None)
+    with stage('build_balances'):
+        balances = BalanceEngine(df)
+    with stage('engine_init'):
+        engine = create_engine(engine_name, csv_path, df, cube, kpi_index)
+
+    # Append-only versions: the indexes of all but the last 1% of the rows, extended with the rest
+    head = df.iloc[:len(df) - len(df) // 100]
+    head_kpi_index, head_bitmap_index = KPIIndex(head), BitmapIndex(head)
+    with stage('extend_kpi_index'):
+        head_kpi_index.extended(df)
+    with stage('extend_bitmap_index'):
+        head_bitmap_index.extended(df)
+    del head, head_kpi_index, head_bitmap_index
+    # Multi-select filters: two values each of three columns, plus an amount range
+    filters = tuple((col, tuple(bitmap_index.values[col][:2])) for col in ('Type', 'Merchant_Category', 'Country'))
+
+    start_date, end_date, category = df['Date'].min().date(), df['Date'].max().date(), 'All'
+    structures = (df, cube, balances, engine, bitmap_index, cube_bitmap_index)
+    for _ in range(repeat):
+        # Per-filter view, as compute_filtered_view builds it; its steps are timed as trace spans
+        trace = start_trace('benchmark')
+        with stage('filtered_view'):
+            view = filtered_view(*structures, start_date, end_date, category, monthly_budget=1000)
+        recorder.record_spans(trace)
+        if scan is not None:
+            # The same view from the Parquet copies alone, as a scan version serves it
+            trace = start_trace('benchmark')
+            with stage('scan:filtered_view'):
+                filtered_view(None, None, scan['balances'], engine, None, None, start_date, end_date, category,
+                              monthly_budget=1000)
+            recorder.record_spans(trace, prefix='scan:')
+
+        for chart, (builder, prepare) in CHARTS.items():
+            with stage(f'agg:{chart}'):
+                data, params = prepare(view)
+            # Built and serialized, as st.plotly_chart does on a figure-cache miss
+            with stage(f'figure:{chart}'):
+                pio.to_json(FIGURE_BUILDERS[builder](data, **params), validate=False)
+
+        # Multi-select filters, answered from the bitmap indexes
+        trace = start_trace('benchmark')
+        with stage('multi:filtered_view'):
+            filtered_view(*structures, start_date, end_date, category, filters, (10.0, 100.0), 1000)
+        recorder.record_spans(trace, prefix='multi:')
+
+        with stage('search'):
+            matches = filter_row_ids(df, search_index.search(search_term), start_date, end_date, category)
+        with stage('explorer_page'):
+            order = sort_order(df, 'Amount')
+            rank = order_rank(order)
+            page_ids = ordered_rows(order, matches, len(df), ascending=False, rank=rank)[:page_size]
+            df.iloc[page_ids]
+    return recorder.stages
+
+
+def compare(results, baseline, threshold):
+    """Regressions of `results` against `baseline`: (rows, stage, metric, baseline value, new value)."""
+    regressions = []
+    for rows, stages in results.items():
+        for name, new in stages.items():
+            old = baseline.get(rows, {}).get(name)
+            if old is None:
+                continue
+            if (max(old['seconds'], new['seconds']) >= MIN_COMPARABLE_SECONDS
+                    and new['seconds'] > old['seconds'] * (1 + threshold)):
+                regressions.append((rows, name, 'seconds', old['seconds'], new['seconds']))
+            if (old.get('peak_bytes') and new.get('peak_bytes')
+                    and new['peak_bytes'] > old['peak_bytes'] * (1 + threshold)
+                    and new['peak_bytes'] - old['peak_bytes'] > 1 << 20):
+                regressions.append((rows, name, 'peak_bytes', old['peak_bytes'], new['peak_bytes']))
+    return regressions
+
+
+def print_results(rows, stages, max_rss):
+    print(f"\n{rows:,} rows (process peak RSS {max_rss / 2**20:,.0f} MB)")
+    print(f"  {'stage':<34}{'seconds':>12}{'peak MB':>12}")
+    for name, result in stages.items():
+        peak = f"{result['peak_bytes'] / 2**20:,.1f}" if 'peak_bytes' in result else '-'
+        print(f"  {name:<34}{result['seconds']:>12.4f}{peak:>12}")
+
+
+def parse_args():
+    """Command-line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard compute pipeline headlessly.")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help="dataset sizes to run (default: 1k 100k 1M 10M)")
+    parser.add_argument('--engine', default='pandas', choices=sorted(QUERY_ENGINES),
+                        help="query engine for the aggregations (default: pandas)")
+    parser.add_argument('--repeat', type=int, default=3, help="repeats per stage; the best time is kept (default: 3)")
+    parser.add_argument('--seed', type=int, default=42, help="generator seed (default: 42)")
+    parser.add_argument('--data-dir', default='bench_data', help="where generated datasets are kept (default: bench_data)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass (no peak memory)")
+    parser.add_argument('--output', default=None, help="write results to this JSON file")
+    parser.add_argument('--save-baseline', default=None, help="write results as a baseline JSON file")
+    parser.add_argument('--baseline', default=None, help="compare against a baseline JSON file (exit 1 on regression)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"relative slowdown counted as a regression (default: {DEFAULT_THRESHOLD})")
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmark and report, save or compare the results."""
+    args = parse_args()
+    # As in the dashboard, so the stages measure the same (shared, not copied) selections
+    enable_copy_on_write()
+    if not QUERY_ENGINES[args.engine]:
+        print(f"❌ The {args.engine} engine is not installed")
+        sys.exit(1)
+
+    results = {}
+    for rows in args.rows:
+        csv_path = dataset_path(args.data_dir, rows, args.seed)
+        stages = run_pipeline(csv_path, args.engine, args.repeat)
+        if not args.no_memory:
+            # Second pass for memory only: tracemalloc would distort the timings
+            tracemalloc.start()
+            for name, result in run_pipeline(csv_path, args.engine, 1).items():
+                stages[name].update(result)
+            tracemalloc.stop()
+        # ru_maxrss is KB on Linux, bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+        results[str(rows)] = stages
+        print_results(rows, stages, max_rss)
+
+    report = {
+        'meta': {'engine': args.engine, 'repeat': args.repeat, 'seed': args.seed, 'python': platform.python_version(),
+                 'pandas': pd.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'results': results,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📁 Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for rows, name, metric, old, new in regressions:
+                print(f"  {int(rows):>11,} rows  {name:<34}{metric:<12}{old:>14,.4f} → {new:,.4f}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Packed bitmap indexes for the multi-select filters.
+
+Every value of a filter column (Type, Product, Merchant_Category, Country,
+City, Hour) gets one bit per row, packed eight rows to a byte. A filter is
+answered with bitwise operations on those bytes: the values picked in one
+column are OR-ed together and the columns AND-ed. Amounts are split into
+equal-depth bins with one bitmap each; the bins overlapping an amount range
+are OR-ed, and only the surviving rows are compared with the exact bounds.
+
+The table is sorted by Date, so a date range is a contiguous block of rows
+(analytics.date_range_bounds) and only the bytes covering that block are
+combined. A query touches (picked values) x (date window / 8) bytes, however
+many rows end up matching.
+
+Rows appended to the table only need their own bytes packed: the bitmaps of
+the earlier rows are copied over, and the amount bins keep the edges of the
+first build.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+# Columns offered as multi-select filters
+FILTER_COLUMNS = ['Type', 'Product', 'Merchant_Category', 'Country', 'City', 'Hour']
+
+# Column of the amount range filter, and the number of equal-depth bins it is indexed with
+AMOUNT_COLUMN = 'Amount_Abs'
+AMOUNT_BINS = 64
+
+
+def _value_codes(column):
+    """Integer codes of a column (-1 for missing) and the values they stand for."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column, sort=True)
+
+
+def _present_values(column):
+    """Codes of a column, its values, and the positions of the values that occur (in value order)."""
+    codes, uniques = _value_codes(column)
+    # Only values that occur are offered (categories can outlive their rows)
+    return codes, uniques, np.flatnonzero(np.bincount(codes[codes >= 0], minlength=len(uniques)))
+
+
+def _amount_range(amount):
+    """(min, max) of the non-missing amounts, (0, 0) when there are none."""
+    valid = amount[~np.isnan(amount)]
+    return (float(valid.min()), float(valid.max())) if len(valid) else (0.0, 0.0)
+
+
+def _pack(codes, n_codes):
+    """One packed bitmap (row of bytes) per code."""
+    return np.stack([np.packbits(codes == code) for code in range(n_codes)]) if n_codes else \
+        np.zeros((0, (len(codes) + 7) // 8), dtype=np.uint8)
+
+
+def intersect_sorted(row_ids, selected):
+    """The row ids that also appear in `selected` (both sorted), by binary search."""
+    if len(selected) == 0:
+        return row_ids[:0]
+    positions = np.minimum(np.searchsorted(selected, row_ids), len(selected) - 1)
+    return row_ids[selected[positions] == row_ids]
+
+
+class FilterOptions:
+    """
+    The values each filter column offers and the bounds of the amount filter,
+    as a BitmapIndex of the same frame reports them, without building bitmaps.
+    """
+
+    def __init__(self, df, columns=FILTER_COLUMNS, amount_column=AMOUNT_COLUMN):
+        self.columns = [col for col in columns if col in df.columns]
+        self.values = {}
+        for col in self.columns:
+            _, uniques, present = _present_values(df[col])
+            self.values[col] = uniques[present].tolist()
+        self.amount_range = (0.0, 0.0)
+        if amount_column in df.columns:
+            self.amount_range = _amount_range(df[amount_column].to_numpy(dtype=float))
+
+
+class BitmapIndex:
+    """Per-value packed bitmaps of the filter columns (and amount bins) of a Date-sorted frame."""
+
+    def __init__(self, df, columns=FILTER_COLUMNS, amount_column=AMOUNT_COLUMN, amount_bins=AMOUNT_BINS):
+        self.n_rows = len(df)
+        self.columns = [col for col in columns if col in df.columns]
+        self.amount_bins = amount_bins
+        self.values = {}
+        self._positions = {}
+        self._bitmaps = {}
+        for col in self.columns:
+            codes, uniques, present = _present_values(df[col])
+            remap = np.full(len(uniques) + 1, -1, dtype=np.int64)
+            remap[present] = np.arange(len(present))
+            self.values[col] = uniques[present].tolist()
+            self._positions[col] = {value: i for i, value in enumerate(self.values[col])}
+            self._bitmaps[col] = _pack(remap[codes], len(present))
+
+        self.amount_column = amount_column if amount_column in df.columns else None
+        self.amount_range = (0.0, 0.0)
+        if self.amount_column is not None:
+            self._amount = df[amount_column].to_numpy(dtype=float)
+            valid = self._amount[~np.isnan(self._amount)]
+            self.amount_range = _amount_range(valid)
+            if len(valid):
+                self._amount_edges = np.unique(np.quantile(valid, np.linspace(0, 1, amount_bins + 1)))
+            else:
+                self._amount_edges = np.zeros(1)
+            n_bins = max(len(self._amount_edges) - 1, 1)
+            bins = np.clip(np.searchsorted(self._amount_edges, self._amount, side='right') - 1, 0, n_bins - 1)
+            # Missing amounts fall outside every bin, so an amount filter drops them
+            self._amount_bitmaps = _pack(np.where(np.isnan(self._amount), -1, bins), n_bins)
+
+    def extended(self, df, start=None):
+        """
+        Index of `df`, whose rows before `start` (by default the indexed row count)
+        are those of the indexed frame. Only the bytes from the one holding row
+        `start` onward are packed; values first seen there get a bitmap of their own.
+        """
+        start = self.n_rows if start is None else start
+        if start == self.n_rows == len(df):
+            return self
+        if self.amount_column is not None and not len(self._amount_edges) > 1 or \
+                any(col not in df.columns for col in self.columns):
+            return BitmapIndex(df, self.columns, self.amount_column, self.amount_bins)
+
+        index = copy.copy(self)
+        index.n_rows = len(df)
+        index.values, index._positions, index._bitmaps = {}, {}, {}
+        kept_bytes = start // 8
+        tail = df.iloc[8 * kept_bytes:]
+        n_bytes = (len(df) + 7) // 8
+        for col in self.columns:
+            old_bitmaps = self._bitmaps[col][:, :kept_bytes]
+            kept = [value for value, used in zip(self.values[col], old_bitmaps.any(axis=1)) if used]
+            codes, uniques, present = _present_values(tail[col])
+            merged = set(kept).union(uniques[present].tolist())
+            # Same value order as a fresh build: category order, otherwise sorted
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                values = [value for value in df[col].cat.categories.tolist() if value in merged]
+            else:
+                values = sorted(merged)
+            positions = {value: i for i, value in enumerate(values)}
+            bitmaps = np.zeros((len(values), n_bytes), dtype=np.uint8)
+            bitmaps[[positions[value] for value in kept], :kept_bytes] = \
+                old_bitmaps[[self._positions[col][value] for value in kept]]
+            remap = np.full(len(uniques) + 1, -1, dtype=np.int64)
+            remap[present] = np.arange(len(present))
+            bitmaps[[positions[value] for value in uniques[present].tolist()], kept_bytes:] = \
+                _pack(remap[codes], len(present))
+            index.values[col], index._positions[col], index._bitmaps[col] = values, positions, bitmaps
+
+        if self.amount_column is not None:
+            index._amount = df[self.amount_column].to_numpy(dtype=float)
+            tail_amount = index._amount[8 * kept_bytes:]
+            if not np.isnan(tail_amount).all():
+                low, high = _amount_range(tail_amount)
+                index.amount_range = (min(self.amount_range[0], low), max(self.amount_range[1], high))
+            n_bins = len(self._amount_bitmaps)
+            bins = np.clip(np.searchsorted(self._amount_edges, tail_amount, side='right') - 1, 0, n_bins - 1)
+            index._amount_bitmaps = np.zeros((n_bins, n_bytes), dtype=np.uint8)
+            index._amount_bitmaps[:, :kept_bytes] = self._amount_bitmaps[:, :kept_bytes]
+            index._amount_bitmaps[:, kept_bytes:] = _pack(np.where(np.isnan(tail_amount), -1, bins), n_bins)
+        return index
+
+    def _amount_bin(self, amount):
+        n_bins = len(self._amount_bitmaps)
+        return int(np.clip(np.searchsorted(self._amount_edges, amount, side='right') - 1, 0, n_bins - 1))
+
+    def select(self, lo, hi, filters=(), amount_range=None):
+        """
+        Sorted row ids in [lo, hi) matching every filter. `filters` holds
+        (column, picked values) pairs - a row matches a column when it has any
+        of the picked values - and `amount_range` an inclusive (low, high) bound
+        on the amount column. Empty pickings and unknown columns are ignored.
+        """
+        first_byte, last_byte = lo // 8, (hi + 7) // 8
+        selected = None
+
+        def restrict(bitmaps, rows):
+            nonlocal selected
+            bits = np.bitwise_or.reduce(bitmaps[rows, first_byte:last_byte], axis=0) if len(rows) else \
+                np.zeros(last_byte - first_byte, dtype=np.uint8)
+            selected = bits if selected is None else np.bitwise_and(selected, bits, out=selected)
+
+        for col, picked in filters:
+            if not picked or col not in self._bitmaps:
+                continue
+            positions = self._positions[col]
+            restrict(self._bitmaps[col], [positions[value] for value in picked if value in positions])
+        if amount_range is not None and self.amount_column is not None:
+            low, high = amount_range
+            restrict(self._amount_bitmaps, np.arange(self._amount_bin(low), self._amount_bin(high) + 1))
+
+        if selected is None:
+            return np.arange(lo, hi)
+        bits = np.unpackbits(selected)[lo - 8 * first_byte:hi - 8 * first_byte]
+        row_ids = np.flatnonzero(bits) + lo
+        if amount_range is not None and self.amount_column is not None:
+            # Edge bins also hold amounts just outside the range
+            amount = self._amount[row_ids]
+            row_ids = row_ids[(amount >= amount_range[0]) & (amount <= amount_range[1])]
+        return row_ids
@@ -0,0 +1,58 @@
+"""
+Calendar dimension: integer keys for the day, week, month and quarter of a date.
+
+Keys are counted from the Unix epoch (day 0 = 1970-01-01), so they sort
+chronologically, group as plain integers and convert back to labels with a
+single vectorized call. Weeks start on Monday; weekday codes run Monday = 0 to
+Sunday = 6, so sorting by code gives calendar order without a categorical.
+
+The aggregation cube carries these keys for every row (analytics.build_cube),
+computed once per dataset version; charts group on them and turn them into
+labels only when the figure is built.
+"""
+
+import numpy as np
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Key columns added by add_calendar_keys, with their storage types
+CALENDAR_KEYS = {'DayKey': 'int32', 'WeekKey': 'int32', 'MonthKey': 'int32', 'QuarterKey': 'int16',
+                 'WeekdayCode': 'int8'}
+
+# 1970-01-01 was a Thursday: shifting by 3 days puts Mondays on multiples of 7
+_EPOCH_WEEKDAY = 3
+
+
+def day_keys(dates):
+    """Days since 1970-01-01 of a datetime column or array."""
+    return np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+
+
+def calendar_keys(dates):
+    """Integer day/week/month/quarter keys and weekday codes of the given dates."""
+    days = day_keys(dates)
+    months = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+    keys = {
+        'DayKey': days,
+        'WeekKey': (days + _EPOCH_WEEKDAY) // 7,
+        'MonthKey': months,
+        'QuarterKey': months // 3,
+        'WeekdayCode': (days + _EPOCH_WEEKDAY) % 7,
+    }
+    return {name: values.astype(CALENDAR_KEYS[name]) for name, values in keys.items()}
+
+
+def add_calendar_keys(frame):
+    """The frame with the calendar key columns of its Date column appended."""
+    return frame.assign(**calendar_keys(frame['Date']))
+
+
+def month_labels(month_keys):
+    """'YYYY-MM' labels of month keys."""
+    return np.asarray(month_keys, dtype=np.int64).astype('datetime64[M]').astype(str)
+
+
+def weekday_labels(weekday_codes):
+    """Day names of weekday codes (Monday = 0)."""
+    return np.asarray(WEEKDAY_NAMES, dtype=object)[np.asarray(weekday_codes, dtype=np.int64)]
+
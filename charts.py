@@ -0,0 +1,918 @@
+"""
+Figure builders for the dashboard charts.
+
+Each chart is registered under a name and built by a pure function of its
+(already aggregated) input frame and a few scalar parameters. Built figures are
+cached process-wide, keyed by chart name plus a hash of the inputs, so reruns
+and other sessions with unchanged inputs skip building the figure again. The
+cache is bounded by the estimated size of the cached figures (LRU eviction):
+a figure holds its input arrays plus a roughly fixed layout.
+
+The chart inputs are rolled up from the filtered view (mostly its expense
+cube) by the functions below the cache, which dashboard.py and benchmark.py
+both call, so the benchmark measures exactly what the dashboard draws.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from analytics import rollup, rollup_stats
+from calendar_dimension import calendar_keys, month_labels, weekday_labels
+from perf import record_cache
+
+# Color palette - vibrant neon colors
+COLORS = {
+    'primary': '#00f5ff',
+    'secondary': '#ff00ff',
+    'accent': '#ffd700',
+    'income': '#00f5ff',
+    'expense': '#ff00ff',
+    'positive': '#00f5ff',
+    'negative': '#ff00ff'
+}
+
+# Vibrant color palette for multi-series charts
+VIBRANT_COLORS = px.colors.qualitative.Vivid + px.colors.qualitative.Set3
+
+# Country name to ISO code mapping (common countries) for the world map
+COUNTRY_TO_ISO = {
+    'France': 'FRA',
+    'United States': 'USA',
+    'United Kingdom': 'GBR',
+    'Germany': 'DEU',
+    'Spain': 'ESP',
+    'Italy': 'ITA',
+    'Netherlands': 'NLD',
+    'Belgium': 'BEL',
+    'Switzerland': 'CHE',
+    'Portugal': 'PRT',
+    'Austria': 'AUT',
+    'Poland': 'POL',
+    'Sweden': 'SWE',
+    'Denmark': 'DNK',
+    'Norway': 'NOR',
+    'Finland': 'FIN',
+    'Ireland': 'IRL',
+    'Greece': 'GRC',
+    'Czech Republic': 'CZE',
+    'Romania': 'ROU',
+    'Hungary': 'HUN',
+    'Canada': 'CAN',
+    'Australia': 'AUS',
+    'Japan': 'JPN',
+    'China': 'CHN',
+    'India': 'IND',
+    'Brazil': 'BRA',
+    'Mexico': 'MEX',
+    'Argentina': 'ARG',
+    'South Korea': 'KOR',
+    'Singapore': 'SGP',
+    'Thailand': 'THA',
+    'Indonesia': 'IDN',
+    'Malaysia': 'MYS',
+    'Philippines': 'PHL',
+    'Vietnam': 'VNM',
+    'New Zealand': 'NZL',
+    'South Africa': 'ZAF',
+    'Turkey': 'TUR',
+    'Israel': 'ISR',
+    'United Arab Emirates': 'ARE',
+    'Saudi Arabia': 'SAU',
+    'Egypt': 'EGY',
+    'Morocco': 'MAR',
+    'Tunisia': 'TUN',
+    'Algeria': 'DZA',
+    'Russia': 'RUS',
+    'Ukraine': 'UKR',
+    'Croatia': 'HRV',
+    'Serbia': 'SRB',
+    'Bulgaria': 'BGR',
+    'Slovakia': 'SVK',
+    'Slovenia': 'SVN',
+    'Estonia': 'EST',
+    'Latvia': 'LVA',
+    'Lithuania': 'LTU',
+    'Luxembourg': 'LUX',
+    'Iceland': 'ISL',
+    'Cyprus': 'CYP',
+    'Malta': 'MLT'
+}
+
+# Upper bound on the estimated size of all cached figures
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Layout, template and trace attributes every figure carries whatever its data
+FIGURE_BASE_BYTES = 16 * 1024
+
+# Registered builders: chart name -> function(data, **params) returning a figure
+FIGURE_BUILDERS = {}
+
+
+def register_figure(name):
+    """Register a figure builder under a chart name."""
+    def decorator(builder):
+        FIGURE_BUILDERS[name] = builder
+        return builder
+    return decorator
+
+
+def input_fingerprint(*values):
+    """Stable hash of builder inputs (frames by content, everything else by repr)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for value in values:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            frame = value.to_frame() if isinstance(value, pd.Series) else value
+            digest.update(repr((list(frame.columns), list(frame.dtypes.astype(str)), frame.index.names)).encode())
+            digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+        elif isinstance(value, dict):
+            digest.update(repr(sorted(value.items())).encode())
+        else:
+            digest.update(repr(value).encode())
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def estimated_figure_bytes(data):
+    """Approximate footprint of a cached figure: the fixed layout plus the arrays of its input."""
+    if isinstance(data, pd.DataFrame):
+        return FIGURE_BASE_BYTES + int(data.memory_usage(index=True).sum())
+    if isinstance(data, pd.Series):
+        return FIGURE_BASE_BYTES + int(data.memory_usage(index=True))
+    return FIGURE_BASE_BYTES
+
+
+class FigureCache:
+    """LRU cache of built figures, bounded by the total of their estimated sizes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, fig, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (fig, nbytes)
+            self.total_bytes += nbytes
+            # Evict least recently used figures, always keeping the newest one
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+figure_cache = FigureCache(FIGURE_CACHE_MAX_BYTES)
+
+
+def with_month_labels(frame):
+    """An aggregate keyed by MonthKey with the 'YearMonth' labels its figure shows."""
+    return frame.assign(YearMonth=month_labels(frame['MonthKey']))
+
+
+def get_figure(name, data, **params):
+    """
+    Return the figure registered as `name` for this input, building it only on a
+    cache miss. Cached figures are shared between reruns and sessions, so callers
+    must not modify them.
+    """
+    key = (name, input_fingerprint(data, params))
+    fig = figure_cache.get(key)
+    record_cache('figure_cache', hit=fig is not None)
+    if fig is None:
+        fig = FIGURE_BUILDERS[name](data, **params)
+        # Sized from the input rather than by serializing the figure a second time
+        figure_cache.put(key, fig, estimated_figure_bytes(data))
+    return fig
+
+
+def health_score(savings_rate):
+    """Financial health score (0-100) shown by the gauge."""
+    return min(100, max(0, savings_rate + 50))
+
+
+def category_totals(expense_cube):
+    """Spending per merchant category, as a Series indexed by category."""
+    return rollup(expense_cube, 'Merchant_Category').set_index('Merchant_Category')['Amount_Abs']
+
+
+def top_categories(expense_cube, n=5):
+    """The n categories with the most spending, with their share of those n (Percentage)."""
+    top_cats = rollup(expense_cube, 'Merchant_Category').sort_values('Amount_Abs', ascending=False).head(n)
+    top_cats['Percentage'] = (top_cats['Amount_Abs'] / top_cats['Amount_Abs'].sum() * 100).round(1)
+    return top_cats
+
+
+def category_expenses(totals):
+    """Category totals (see category_totals) as a frame, largest first."""
+    return totals.reset_index().sort_values('Amount_Abs', ascending=False)
+
+
+def category_monthly(expense_cube, totals, n):
+    """Monthly spending of the n categories with the largest totals (see category_totals)."""
+    trends = expense_cube[expense_cube['Merchant_Category'].isin(totals.nlargest(n).index)]
+    return rollup(trends, ['MonthKey', 'Merchant_Category'])
+
+
+def average_by_category(expense_cube, min_count=3, n=8):
+    """The n categories with the highest mean expense, among those with at least min_count expenses."""
+    avg_by_category = rollup_stats(expense_cube, 'Merchant_Category')[['Merchant_Category', 'Mean', 'Count']]
+    avg_by_category.columns = ['Category', 'Avg_Amount', 'Count']
+    avg_by_category = avg_by_category[avg_by_category['Count'] >= min_count]
+    return avg_by_category.sort_values('Avg_Amount', ascending=False).head(n)
+
+
+def hour_expenses(expense_cube):
+    """Spending per hour of day, in hour order."""
+    return rollup(expense_cube, 'Hour').sort_values('Hour')
+
+
+def weekday_hour_pivot(expense_cube):
+    """Spending per weekday (rows, Monday first) and hour (columns)."""
+    heatmap_data = rollup(expense_cube, ['WeekdayCode', 'Hour'])
+    return heatmap_data.pivot(index='WeekdayCode', columns='Hour', values='Amount_Abs').fillna(0)
+
+
+def country_metrics(expense_cube):
+    """Total, mean and count of expenses per country, highest total first."""
+    metrics = rollup_stats(expense_cube, 'Country')[['Country', 'Total', 'Mean', 'Count']]
+    metrics.columns = ['Country', 'Total_Spending', 'Avg_Transaction', 'Transaction_Count']
+    return metrics.sort_values('Total_Spending', ascending=False)
+
+
+def country_spending_map(expense_cube):
+    """Spending per country with its ISO code (countries without one are dropped)."""
+    spending = rollup(expense_cube, 'Country')
+    spending.columns = ['Country', 'Spending']
+    spending['ISO'] = spending['Country'].map(COUNTRY_TO_ISO)
+    return spending.dropna(subset=['ISO'])
+
+
+def location_hierarchy(expense_cube, n=100):
+    """The n largest country / city / category cells."""
+    hierarchy = rollup(expense_cube, ['Country', 'City', 'Merchant_Category'])
+    return hierarchy.sort_values('Amount_Abs', ascending=False).head(n)
+
+
+def country_category_pivot(expense_cube):
+    """Spending per category (rows) and country (columns)."""
+    heatmap_data = rollup(expense_cube, ['Country', 'Merchant_Category'])
+    return heatmap_data.pivot(index='Merchant_Category', columns='Country', values='Amount_Abs').fillna(0)
+
+
+def top_cities(expense_cube, n=10):
+    """The n cities with the most spending, smallest first (bottom-up bars)."""
+    return rollup(expense_cube, 'City').sort_values('Amount_Abs', ascending=True).tail(n)
+
+
+@register_figure('health_gauge')
+def build_health_gauge(health_score):
+    fig_gauge = go.Figure(go.Indicator(
+        mode="gauge+number+delta",
+        value=health_score,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': "Financial Health Score", 'font': {'color': '#ffffff', 'size': 16}},
+        delta={'reference': 50, 'font': {'color': '#ffffff'}},
+        gauge={
+            'axis': {'range': [None, 100], 'tickcolor': '#ffffff'},
+            'bar': {'color': COLORS['primary']},
+            'steps': [
+                {'range': [0, 33], 'color': 'rgba(255, 0, 255, 0.2)'},
+                {'range': [33, 66], 'color': 'rgba(255, 215, 0, 0.2)'},
+                {'range': [66, 100], 'color': 'rgba(0, 245, 255, 0.2)'}
+            ],
+            'threshold': {
+                'line': {'color': COLORS['secondary'], 'width': 4},
+                'thickness': 0.75,
+                'value': 90
+            }
+        }
+    ))
+    fig_gauge.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=350,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    return fig_gauge
+
+
+@register_figure('monthly_waterfall')
+def build_monthly_waterfall(monthly_summary):
+    net_flow = monthly_summary['Net']
+
+    fig_waterfall = go.Figure(go.Waterfall(
+        name="Income Minus Expenses",
+        orientation="v",
+        measure=["relative"] * (len(monthly_summary) - 1) + ["total"],
+        x=monthly_summary['Month'],
+        textposition="outside",
+        text=net_flow.apply(lambda x: f"€{x:,.0f}"),
+        y=net_flow,
+        connector={"line": {"color": COLORS['accent']}},
+        increasing={"marker": {"color": COLORS['income']}},
+        decreasing={"marker": {"color": COLORS['expense']}},
+        totals={"marker": {"color": COLORS['accent']}}
+    ))
+    fig_waterfall.update_layout(
+        title="",
+        xaxis_title="Month",
+        yaxis_title="Amount (€) - Income Minus Expenses",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        showlegend=False,
+        height=350,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
+    )
+    return fig_waterfall
+
+
+@register_figure('balance_trend')
+def build_balance_trend(balance_df, current_balance):
+    fig_balance = px.area(
+        balance_df,
+        x='Date',
+        y='Balance',
+        title="",
+        labels={'Balance': 'Balance (€)', 'Date': 'Date'},
+        color_discrete_sequence=[COLORS['primary']]
+    )
+    fig_balance.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        hovermode='x unified',
+        height=300,
+        showlegend=False,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
+    )
+    fig_balance.add_hline(y=current_balance, line_dash="dash", line_color=COLORS['secondary'],
+                          annotation_text=f"Current: €{current_balance:,.0f}")
+    return fig_balance
+
+
+@register_figure('top_categories_bar')
+def build_top_categories_bar(top_cats):
+    fig_categories = px.bar(
+        top_cats,
+        x='Amount_Abs',
+        y='Merchant_Category',
+        orientation='h',
+        title="",
+        labels={'Amount_Abs': 'Amount (€)', 'Merchant_Category': 'Category'},
+        color='Amount_Abs',
+        color_continuous_scale='Plasma',
+        text='Amount_Abs'
+    )
+    fig_categories.update_traces(
+        texttemplate='€%{text:,.0f}',
+        textposition='outside',
+        textfont_color='#ffffff'
+    )
+    fig_categories.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=300,
+        showlegend=False,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)', showgrid=True),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)', showgrid=False, categoryorder='total ascending')
+    )
+    return fig_categories
+
+
+@register_figure('income_expenses')
+def build_income_expenses(monthly_summary):
+    fig_monthly = go.Figure()
+    fig_monthly.add_trace(go.Bar(
+        x=monthly_summary['Month'],
+        y=monthly_summary['Income'],
+        name='Income',
+        marker_color=COLORS['income']
+    ))
+    fig_monthly.add_trace(go.Bar(
+        x=monthly_summary['Month'],
+        y=monthly_summary['Expenses'],
+        name='Expenses',
+        marker_color=COLORS['expense']
+    ))
+    fig_monthly.add_trace(go.Scatter(
+        x=monthly_summary['Month'],
+        y=monthly_summary['Net'],
+        name='Income Minus Expenses',
+        mode='lines+markers',
+        line=dict(color=COLORS['accent'], width=3),
+        marker=dict(size=8)
+    ))
+    fig_monthly.update_layout(
+        title="",
+        xaxis_title="Month",
+        yaxis_title="Amount (€)",
+        barmode='group',
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        hovermode='x unified',
+        height=400,
+        margin=dict(l=0, r=0, t=0, b=0),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(color='#ffffff', size=11)),
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
+    )
+    return fig_monthly
+
+
+@register_figure('category_bar')
+def build_category_bar(category_expenses, text_size=12, text_family=None):
+    fig_category = px.bar(
+        category_expenses,
+        x='Merchant_Category',
+        y='Amount_Abs',
+        title="",
+        labels={'Amount_Abs': 'Amount (€)', 'Merchant_Category': 'Category'},
+        color='Amount_Abs',
+        color_continuous_scale='Plasma',
+        text='Amount_Abs'
+    )
+    textfont = dict(color='#ffffff', size=text_size)
+    if text_family:
+        textfont['family'] = text_family
+    fig_category.update_traces(
+        texttemplate='€%{text:,.0f}',
+        textposition='outside',
+        textfont=textfont
+    )
+    fig_category.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=400,
+        margin=dict(l=0, r=0, t=0, b=0),
+        showlegend=False,
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
+    )
+    return fig_category
+
+
+@register_figure('scatter_balance')
+def build_scatter_balance(scatter_df):
+    # Derived columns are passed as arrays (labelled below), so the input frame is neither copied nor modified
+    transaction_type = np.where(scatter_df['Amount'].to_numpy() > 0, 'Income', 'Expense')
+    fig_scatter = px.scatter(
+        scatter_df,
+        x='Amount_Abs',
+        y='Balance',
+        color=transaction_type,
+        size='Amount_Abs',
+        hover_data=['Merchant_Category', 'Date'],
+        title="",
+        labels={'Amount_Abs': 'Transaction Amount (€)', 'Balance': 'Account Balance (€)', 'color': 'Transaction_Type'},
+        color_discrete_map={'Income': COLORS['income'], 'Expense': COLORS['expense']}
+    )
+    fig_scatter.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=300,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+        legend=dict(font=dict(color='#ffffff', size=11))
+    )
+    return fig_scatter
+
+
+@register_figure('scatter_3d')
+def build_scatter_3d(scatter_3d_data):
+    weekday_num = calendar_keys(scatter_3d_data['Date'])['WeekdayCode'] + 1
+    fig_3d = px.scatter_3d(
+        scatter_3d_data,
+        x='Hour',
+        y=weekday_num,
+        z='Amount_Abs',
+        color='Merchant_Category',
+        size='Amount_Abs',
+        hover_data=['Date'],
+        title="",
+        labels={'Hour': 'Hour of Day', 'y': 'Day of Week', 'Amount_Abs': 'Amount (€)'},
+        color_discrete_sequence=VIBRANT_COLORS
+    )
+    fig_3d.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=300,
+        margin=dict(l=0, r=0, t=0, b=0),
+        legend=dict(font=dict(color='#ffffff', size=11)),
+        scene=dict(
+            xaxis_title="Hour",
+            yaxis_title="Day of Week",
+            zaxis_title="Amount (€)",
+            bgcolor='rgba(0,0,0,0)',
+            xaxis=dict(gridcolor='rgba(255,255,255,0.1)', backgroundcolor='rgba(0,0,0,0)'),
+            yaxis=dict(gridcolor='rgba(255,255,255,0.1)', backgroundcolor='rgba(0,0,0,0)'),
+            zaxis=dict(gridcolor='rgba(255,255,255,0.1)', backgroundcolor='rgba(0,0,0,0)')
+        )
+    )
+    return fig_3d
+
+
+@register_figure('category_trends')
+def build_category_trends(category_monthly):
+    category_monthly = with_month_labels(category_monthly)
+    fig_trends = px.line(
+        category_monthly,
+        x='YearMonth',
+        y='Amount_Abs',
+        color='Merchant_Category',
+        title="",
+        labels={'Amount_Abs': 'Spending (€)', 'YearMonth': 'Month'},
+        markers=True,
+        color_discrete_sequence=VIBRANT_COLORS
+    )
+    fig_trends.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        hovermode='x unified',
+        height=300,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+        legend=dict(font=dict(color='#ffffff', size=11))
+    )
+    return fig_trends
+
+
+@register_figure('avg_category_spending')
+def build_avg_category_spending(avg_by_category):
+    fig_avg_cat = px.bar(
+        avg_by_category,
+        x='Category',
+        y='Avg_Amount',
+        title="",
+        labels={'Avg_Amount': 'Average Amount (€)', 'Category': 'Category'},
+        color='Avg_Amount',
+        color_continuous_scale='Plasma',
+        text='Avg_Amount'
+    )
+    fig_avg_cat.update_traces(
+        texttemplate='€%{text:,.0f}',
+        textposition='outside',
+        textfont=dict(color='#ffffff', size=10)
+    )
+    fig_avg_cat.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=300,
+        margin=dict(l=0, r=0, t=0, b=0),
+        showlegend=False,
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
+    )
+    return fig_avg_cat
+
+
+@register_figure('category_stacked_area')
+def build_category_stacked_area(area_monthly):
+    area_monthly = with_month_labels(area_monthly)
+    fig_area = px.area(
+        area_monthly,
+        x='YearMonth',
+        y='Amount_Abs',
+        color='Merchant_Category',
+        title="",
+        labels={'Amount_Abs': 'Spending (€)', 'YearMonth': 'Month'},
+        color_discrete_sequence=VIBRANT_COLORS
+    )
+    fig_area.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=300,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+        legend=dict(font=dict(color='#ffffff', size=11))
+    )
+    return fig_area
+
+
+@register_figure('weekday_spending')
+def build_weekday_spending(weekday_expenses):
+    weekday_expenses = weekday_expenses.assign(Weekday=weekday_labels(weekday_expenses['WeekdayCode']))
+    fig_weekday = px.bar(
+        weekday_expenses,
+        x='Weekday',
+        y='Amount_Abs',
+        title="",
+        labels={'Amount_Abs': 'Spending (€)', 'Weekday': 'Day'},
+        color='Amount_Abs',
+        color_continuous_scale='Plasma',
+        text='Amount_Abs'
+    )
+    fig_weekday.update_traces(
+        texttemplate='€%{text:,.0f}',
+        textposition='outside',
+        textfont=dict(color='#ffffff', size=11)
+    )
+    fig_weekday.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=350,
+        margin=dict(l=0, r=0, t=0, b=0),
+        showlegend=False,
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
+    )
+    return fig_weekday
+
+
+@register_figure('hour_spending')
+def build_hour_spending(hour_expenses):
+    fig_hour = px.line(
+        hour_expenses,
+        x='Hour',
+        y='Amount_Abs',
+        title="",
+        labels={'Amount_Abs': 'Spending (€)', 'Hour': 'Hour'},
+        color_discrete_sequence=[COLORS['secondary']],
+        markers=True
+    )
+    fig_hour.update_traces(
+        line=dict(width=3),
+        marker=dict(size=6),
+        fill='tonexty',
+        fillcolor=f'rgba(255, 0, 255, 0.1)'
+    )
+    fig_hour.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        hovermode='x unified',
+        height=350,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(tickmode='linear', dtick=2, gridcolor='rgba(255,255,255,0.1)'),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
+    )
+    return fig_hour
+
+
+@register_figure('weekday_hour_heatmap')
+def build_weekday_hour_heatmap(heatmap_pivot):
+    heatmap_pivot = heatmap_pivot.set_axis(pd.Index(weekday_labels(heatmap_pivot.index), name='Weekday'), axis=0)
+    fig_heatmap = px.imshow(
+        heatmap_pivot,
+        labels=dict(x="Hour", y="Day", color="Spending (€)"),
+        title="",
+        color_continuous_scale='Plasma',
+        aspect="auto"
+    )
+    fig_heatmap.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=350,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    return fig_heatmap
+
+
+@register_figure('top_merchants')
+def build_top_merchants(top_merchants):
+    fig_merchants = px.bar(
+        top_merchants,
+        x='Total Spent',
+        y='Merchant',
+        orientation='h',
+        title="",
+        labels={'Total Spent': 'Total Spent (€)', 'Merchant': 'Merchant'},
+        color='Total Spent',
+        color_continuous_scale='Plasma',
+        text='Total Spent'
+    )
+    fig_merchants.update_traces(
+        texttemplate='€%{text:,.0f}',
+        textposition='outside',
+        textfont=dict(color='#ffffff', size=10)
+    )
+    fig_merchants.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=450,
+        margin=dict(l=0, r=0, t=0, b=0),
+        showlegend=False,
+        yaxis={'categoryorder': 'total ascending'},
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)')
+    )
+    return fig_merchants
+
+
+@register_figure('world_map')
+def build_world_map(country_spending_map):
+    fig_map = px.choropleth(
+        country_spending_map,
+        locations='ISO',
+        color='Spending',
+        hover_name='Country',
+        hover_data={'ISO': False, 'Spending': ':,.2f'},
+        color_continuous_scale='Plasma',
+        title="",
+        labels={'Spending': 'Spending (€)'}
+    )
+    fig_map.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        geo=dict(
+            bgcolor='rgba(0,0,0,0)',
+            lakecolor='rgba(0,0,0,0)',
+            landcolor='rgba(255,255,255,0.1)',
+            showlakes=False,
+            showland=True,
+            showocean=True,
+            oceancolor='rgba(0,0,0,0.3)',
+            projection_type='natural earth'
+        ),
+        height=350,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    fig_map.update_geos(
+        showcountries=True,
+        countrycolor='rgba(255,255,255,0.3)',
+        showcoastlines=True,
+        coastlinecolor='rgba(255,255,255,0.2)'
+    )
+    return fig_map
+
+
+@register_figure('country_bubble')
+def build_country_bubble(country_metrics):
+    fig_bubble = px.scatter(
+        country_metrics,
+        x='Avg_Transaction',
+        y='Total_Spending',
+        size='Transaction_Count',
+        color='Total_Spending',
+        hover_name='Country',
+        hover_data=['Avg_Transaction', 'Transaction_Count'],
+        color_continuous_scale='Plasma',
+        title="",
+        labels={'Avg_Transaction': 'Avg Transaction (€)', 'Total_Spending': 'Total Spending (€)'}
+    )
+    fig_bubble.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=400,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
+    )
+    return fig_bubble
+
+
+@register_figure('sunburst_hierarchy')
+def build_sunburst_hierarchy(hierarchy_data):
+    fig_sunburst = px.sunburst(
+        hierarchy_data,
+        path=['Country', 'City', 'Merchant_Category'],
+        values='Amount_Abs',
+        color='Amount_Abs',
+        color_continuous_scale='Plasma',
+        title=""
+    )
+    fig_sunburst.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=400,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    return fig_sunburst
+
+
+@register_figure('country_trends')
+def build_country_trends(country_monthly):
+    country_monthly = with_month_labels(country_monthly)
+    fig_trend = px.line(
+        country_monthly,
+        x='YearMonth',
+        y='Amount_Abs',
+        color='Country',
+        markers=True,
+        color_discrete_sequence=VIBRANT_COLORS
+    )
+    fig_trend.update_traces(line=dict(width=3), marker=dict(size=8))
+    fig_trend.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        hovermode='x unified',
+        height=400,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
+        legend=dict(font=dict(color='#ffffff', size=11), bgcolor='rgba(0,0,0,0.5)')
+    )
+    return fig_trend
+
+
+@register_figure('country_category_heatmap')
+def build_country_category_heatmap(heatmap_pivot):
+    fig_heatmap = px.imshow(
+        heatmap_pivot,
+        labels=dict(x="Country", y="Category", color="Spending (€)"),
+        color_continuous_scale='Plasma',
+        aspect="auto",
+        text_auto=True
+    )
+    fig_heatmap.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=400,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    return fig_heatmap
+
+
+@register_figure('city_bar')
+def build_city_bar(city_spending_bar):
+    fig_city_bar = px.bar(
+        city_spending_bar,
+        x='Amount_Abs',
+        y='City',
+        orientation='h',
+        color='Amount_Abs',
+        color_continuous_scale='Plasma',
+        text='Amount_Abs'
+    )
+    fig_city_bar.update_traces(
+        texttemplate='€%{text:,.0f}',
+        textposition='outside',
+        textfont=dict(color='#ffffff', size=10)
+    )
+    fig_city_bar.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=400,
+        margin=dict(l=0, r=0, t=30, b=0),
+        showlegend=False
+    )
+    return fig_city_bar
+
+
+@register_figure('country_stacked_area')
+def build_country_stacked_area(country_area):
+    country_area = with_month_labels(country_area)
+    fig_area = px.area(
+        country_area,
+        x='YearMonth',
+        y='Amount_Abs',
+        color='Country',
+        color_discrete_sequence=VIBRANT_COLORS
+    )
+    fig_area.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#ffffff',
+        height=400,
+        margin=dict(l=0, r=0, t=30, b=0),
+        xaxis=dict(tickangle=-45)
+    )
+    return fig_area
@@ -1,12 +1,35 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import numpy as np
 from datetime import datetime, timedelta
+import functools
 import os
 import streamlit.components.v1 as components
 
+from analytics import filtered_view, filtered_rows, rollup, filter_row_ids, sort_order, order_rank, ordered_rows
+from bitmap_index import FILTER_COLUMNS, intersect_sorted
+from data_store import enable_copy_on_write
+from dataset_manager import DatasetManager
+from query_engines import QUERY_ENGINES, create_engine
+from charts import (get_figure, COLORS, health_score, category_totals, top_categories, category_expenses,
+                    category_monthly, average_by_category, hour_expenses, weekday_hour_pivot,
+                    country_metrics, country_spending_map, location_hierarchy, country_category_pivot, top_cities)
+from perf import start_trace, end_run, current_scope, span, record_miss, append_jsonl
+
+# Filtered views and chart inputs share the loaded table's memory instead of copying it
+enable_copy_on_write()
+
+# Developer panel (per-run timing spans, cache hits, row counts): ?debug=1 or DASHBOARD_DEBUG=1
+DEBUG_PANEL = os.environ.get('DASHBOARD_DEBUG') == '1' or st.query_params.get('debug') == '1'
+
+# JSONL log of run traces - written when DASHBOARD_PERF_LOG is set or the developer panel is on
+PERF_LOG = os.environ.get('DASHBOARD_PERF_LOG') or ('perf_log.jsonl' if DEBUG_PANEL else None)
+
+# Timing spans for this run - shown in the developer panel and appended to the JSONL log. Runs are only
+# traced when one of the two reads them; otherwise every span is a no-op
+TRACE_RUNS = DEBUG_PANEL or PERF_LOG is not None
+run_trace = start_trace('app', enabled=TRACE_RUNS)
+
 # Try to import Google Generative AI (optional - falls back to rule-based if not available)
 try:
     import google.generativeai as genai
@@ -700,71 +723,190 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Full runs and fragment reruns listed in the developer panel
+PERF_HISTORY_SIZE = 20
+
 # Configuration
-DATA_SOURCE = 'dummy'
+DATA_SOURCE = 'dummy'  # 'dummy', 'real' or 'partitioned'
+
+# Root of the account/year/month partitioned statement tree used when DATA_SOURCE = 'partitioned'
+STATEMENTS_DIR = os.environ.get('STATEMENTS_DIR', 'statements')
+
+# Months of statement history loaded from the partitioned tree, counting the current month
+# (0 loads every partition); older partitions are never read
+STATEMENTS_MONTHS = int(os.environ.get('STATEMENTS_MONTHS', '0'))
+
+# Aggregation engine: 'pandas' (in-memory cube), 'duckdb' (SQL over the Parquet copies) or 'polars'
+# (lazy Polars queries over the Parquet copies); falls back to pandas when the package is missing
+QUERY_ENGINE = os.environ.get('QUERY_ENGINE', 'pandas')
+
+# DuckDB and Polars aggregate straight from the Parquet copies, so the table itself is only loaded
+# when a row-level page (Transactions, AI Advisor) or a multi-select filter needs it
+SCAN_DATASET = QUERY_ENGINE in ('duckdb', 'polars') and QUERY_ENGINES[QUERY_ENGINE]
 
-# Load data - cache includes file modification time to auto-refresh
-@st.cache_data(ttl=60, show_spinner=False)
-def load_data(file_mtime=0):
-    import os
+# One dataset manager per data file, shared by all sessions: concurrent loads are coalesced and a
+# changed file is reloaded in the background while the previous version keeps being served
+@st.cache_resource(show_spinner=False)
+def get_dataset_manager(data_file, start_date=None):
+    return DatasetManager(data_file, start_date=start_date, scan=SCAN_DATASET)
+
+# Load data - returns the manager of the configured data file (or statement tree) and the dataset
+# version it currently serves
+def load_data():
     if DATA_SOURCE == 'dummy':
         data_file = 'Dataset - Dummy Data.csv'
+    elif DATA_SOURCE == 'partitioned':
+        data_file = STATEMENTS_DIR
     else:
         data_file = 'Dataset - Sara Saad.csv'
     
+    # First day of the loaded history window; a month start, so the manager only changes monthly
+    start_date = None
+    if DATA_SOURCE == 'partitioned' and STATEMENTS_MONTHS > 0:
+        start_date = (pd.Timestamp.today().to_period('M') - (STATEMENTS_MONTHS - 1)).start_time.date()
+    
     try:
-        df = pd.read_csv(data_file)
-        df['Date'] = pd.to_datetime(df[['Year', 'Month', 'Day']])
-        df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
-        df['Balance'] = pd.to_numeric(df['Balance'], errors='coerce')
-        df['Amount_Abs'] = pd.to_numeric(df['Amount_Abs'], errors='coerce')
-        
-        # Ensure Weekday and Hour columns exist (create from Date if missing)
-        if 'Weekday' not in df.columns:
-            df['Weekday'] = df['Date'].dt.day_name()
-        if 'Hour' not in df.columns:
-            df['Hour'] = df['Date'].dt.hour
-        
-        if 'Country' not in df.columns:
-            df['Country'] = 'Unknown'
-        if 'City' not in df.columns:
-            df['City'] = 'Unknown'
-        return df
+        manager = get_dataset_manager(data_file, start_date)
+        return manager, manager.get()
     except FileNotFoundError:
         try:
-            fallback_file = 'Dataset - Dummy Data.csv' if DATA_SOURCE == 'real' else 'Dataset - Sara Saad.csv'
-            df = pd.read_csv(fallback_file)
-            df['Date'] = pd.to_datetime(df[['Year', 'Month', 'Day']])
-            df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
-            df['Balance'] = pd.to_numeric(df['Balance'], errors='coerce')
-            df['Amount_Abs'] = pd.to_numeric(df['Amount_Abs'], errors='coerce')
-            
-            # Ensure Weekday and Hour columns exist (create from Date if missing)
-            if 'Weekday' not in df.columns:
-                df['Weekday'] = df['Date'].dt.day_name()
-            if 'Hour' not in df.columns:
-                df['Hour'] = df['Date'].dt.hour
-            
-            if 'Country' not in df.columns:
-                df['Country'] = 'Unknown'
-            if 'City' not in df.columns:
-                df['City'] = 'Unknown'
+            fallback_file = 'Dataset - Sara Saad.csv' if DATA_SOURCE == 'dummy' else 'Dataset - Dummy Data.csv'
+            manager = get_dataset_manager(fallback_file)
+            dataset = manager.get()
             st.info("Using fallback data file")
-            return df
+            return manager, dataset
         except Exception as e2:
             st.error("Error: Could not find data file.")
-            return None
+            return None, None
     except Exception as e:
         st.error(f"Error loading data: {e}")
-        return None
-
-# Load data - include file modification time to auto-refresh cache when file changes
-import os
-data_file = 'Dataset - Dummy Data.csv' if DATA_SOURCE == 'dummy' else 'Dataset - Sara Saad.csv'
-file_mtime = int(os.path.getmtime(data_file)) if os.path.exists(data_file) else 0
-df = load_data(file_mtime=file_mtime)
-
-if df is not None:
+        return None, None
+
+# Query backend for one dataset version, chosen by QUERY_ENGINE - the pandas cube, or DuckDB/Polars
+# reading the Parquet copies (or scanning the loaded table when the copies are out of date)
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_query_engine(data_file, file_mtime, _df, _cube, _kpi_index):
+    record_miss('get_query_engine')
+    return create_engine(QUERY_ENGINE, data_file, _df, _cube, _kpi_index)
+
+# Filter results - LRU-cached per (dataset version, date range, filters) so reruns that don't
+# touch the filters (chat messages, country selection, search) skip filtering and KPI math.
+# The leading underscore keeps Streamlit from hashing the frames; file_mtime identifies the version
+# and rows_mtime the one of its table (a scan version's lags it while the rows are rebuilt).
+# cache_resource hands back the cached objects without a pickle round-trip - treat them as read-only.
+# The view itself is computed by analytics.filtered_view, which the benchmark runs as well.
+@st.cache_resource(max_entries=32, show_spinner=False)
+def compute_filtered_view(_df, _cube, _balances, _engine, _row_index, _cube_index, file_mtime, rows_mtime, start_date,
+                          end_date, selected_category, filters, amount_range, monthly_budget):
+    record_miss('compute_filtered_view')
+    return filtered_view(_df, _cube, _balances, _engine, _row_index, _cube_index, start_date, end_date,
+                         selected_category, filters, amount_range, monthly_budget)
+
+# Selected rows for the row-level pages when the view was answered without the table (scan versions)
+@st.cache_resource(max_entries=8, show_spinner=False)
+def compute_filtered_rows(_df, _row_index, file_mtime, start_date, end_date, selected_category, filters, amount_range):
+    record_miss('compute_filtered_rows')
+    return filtered_rows(_df, _row_index, start_date, end_date, selected_category, filters, amount_range)
+
+# The table and the filtered rows behind the current view: a scan version loads them here, on
+# first use by a row-level page, otherwise the view already holds them
+def load_row_level():
+    if view['filtered_df'] is not None:
+        return view_rows, view
+    with span('load_rows'):
+        # Possibly the previous version's rows while they are rebuilt in the background
+        rows = dataset_manager.rows(dataset)
+        return rows, compute_filtered_rows(rows['df'], rows['bitmap_index'], rows['file_mtime'], start_date, end_date,
+                                           selected_category, filters, amount_range)
+
+# Sort order of the full table by one column (and each row's rank in it) - computed once per
+# dataset version and column, then reused by every page request of the Transaction Explorer
+@st.cache_resource(max_entries=16, show_spinner=False)
+def load_sort_order(_df, file_mtime, column):
+    record_miss('load_sort_order')
+    order = sort_order(_df, column)
+    return order, order_rank(order)
+
+# Render a registered chart (built through the shared figure cache) as one timing span
+def show_chart(name, data, key=None, **params):
+    with span(f"chart:{key or name}"):
+        st.plotly_chart(get_figure(name, data, **params), use_container_width=True, key=key)
+
+# Session-state keys and labels of the multi-select filters
+MULTI_FILTER_KEYS = {col: f"filter_{col.lower()}" for col in FILTER_COLUMNS}
+MULTI_FILTER_LABELS = {'Merchant_Category': 'Category', 'Hour': 'Hour of day'}
+
+# Close a full run or fragment rerun: keep its summary for the developer panel and append it to the JSONL log
+def finish_run(trace):
+    end_run()
+    if trace is None:
+        return
+    trace.finish()
+    if DEBUG_PANEL:
+        history = st.session_state.setdefault('perf_history', [])
+        history.append({'Scope': trace.scope, 'Started': datetime.fromtimestamp(trace.started_at).strftime('%H:%M:%S'),
+                        'ms': trace.total_ms, 'Spans': len(trace.spans)})
+        del history[:-PERF_HISTORY_SIZE]
+    if PERF_LOG:
+        append_jsonl(PERF_LOG, trace)
+
+# Render a section as a Streamlit fragment: its widgets rerun only this function, not the whole script.
+# During a full run its spans belong to the run's trace; a fragment rerun is traced (and logged) on its
+# own with scope 'fragment:<name>', and the developer panel notes its timing at the end of the section.
+def traced_fragment(name):
+    def decorate(body):
+        @st.fragment
+        @functools.wraps(body)
+        def fragment():
+            if current_scope() == 'app':
+                with span(f'tab:{name}'):
+                    return body()
+            trace = start_trace(f'fragment:{name}', enabled=TRACE_RUNS)
+            try:
+                with span(f'tab:{name}'):
+                    body()
+            finally:
+                finish_run(trace)
+                if DEBUG_PANEL:
+                    st.caption(f"Scope: {trace.scope} · {len(trace.spans)} spans · total: {trace.total_ms:,.1f} ms")
+        return fragment
+    return decorate
+
+# Rerun after a state change inside a fragment: just the fragment on a fragment rerun, otherwise the
+# app (Streamlit rejects fragment-scoped reruns during a full run)
+def rerun_section():
+    scope = current_scope()
+    st.rerun(scope='fragment' if scope is not None and scope.startswith('fragment:') else 'app')
+
+# Widgets inside tabs whose values must survive while their tab is hidden
+TAB_WIDGET_KEYS = ['country_selector', 'transaction_search', 'explorer_sort_col', 'explorer_sort_dir',
+                   'explorer_page_size', 'explorer_page']
+
+# Transaction Explorer page sizes (rows sent to the browser per page)
+EXPLORER_PAGE_SIZES = [50, 100, 200, 500]
+
+# Explorer money cells; a missing amount or balance shows as a dash, not as €0.00
+def format_euro(value):
+    return f"-€{-value:,.2f}" if value < 0 else f"€{value:,.2f}"
+
+# A new search starts the Transaction Explorer at its first page
+def reset_explorer_page():
+    st.session_state['explorer_page'] = 1
+
+# Load data - file_mtime identifies the version being served (it can lag the file while a refresh runs)
+with span('load_data') as load_span:
+    dataset_manager, dataset = load_data()
+    if dataset is not None:
+        load_span.rows = dataset['row_count']
+df = dataset['df'] if dataset is not None else None
+cube = dataset['cube'] if dataset is not None else None
+balances = dataset['balances'] if dataset is not None else None
+file_mtime = dataset['file_mtime'] if dataset is not None else 0
+
+if dataset is not None and dataset['date_bounds'] is None:
+    # A STATEMENTS_MONTHS window with no statements in it
+    st.info("No transactions in the loaded date window.")
+elif dataset is not None:
     # Inject JavaScript to create custom sidebar toggle button - MUST execute
     # Use components.v1.html to force sidebar visible and create toggle button
     import streamlit.components.v1 as components
@@ -951,18 +1093,22 @@ if df is not None:
 
     # Note: removed the floating "Filters" toggle to keep the UI minimal
     
-    # Inline Filters (no sidebar) — simple time range + category
-    min_date = df['Date'].min().date()
-    max_date = df['Date'].max().date()
-
-    # Inline filters: three inputs on one line with a slightly shadowed background
-    if 'Merchant_Category' in df.columns:
-        categories = ['All'] + sorted(df['Merchant_Category'].unique().tolist())
-    else:
-        categories = ['All']
-    current_category = st.session_state.get('category_filter_main', 'All')
-    if current_category not in categories:
-        current_category = 'All'
+    # Inline Filters (no sidebar) — time range + categories, with the other multi-select filters below
+    # Data is kept sorted by Date, so the bounds are the first and last rows
+    min_date = dataset['date_bounds'][0].date()
+    max_date = dataset['date_bounds'][1].date()
+
+    # Filter options are the values present in the bitmap index, so every pick has a bitmap
+    filter_options = dataset['filter_options']
+    # Drop picks that are gone from a reloaded dataset before the widgets see them
+    for col in FILTER_COLUMNS:
+        key = MULTI_FILTER_KEYS[col]
+        if key in st.session_state:
+            st.session_state[key] = [v for v in st.session_state[key] if v in filter_options.values.get(col, [])]
+    amount_low, amount_high = float(np.floor(filter_options.amount_range[0])), float(np.ceil(filter_options.amount_range[1]))
+    amount_state = st.session_state.get('amount_filter')
+    if amount_state is not None and not amount_low <= amount_state[0] <= amount_state[1] <= amount_high:
+        del st.session_state['amount_filter']
 
     # Inline filter-bar styles: subtle shadow, dark translucent background, white inputs
     st.markdown(
@@ -1077,7 +1223,7 @@ if df is not None:
         unsafe_allow_html=True,
     )
 
-    cols = st.columns([2, 2, 1])
+    cols = st.columns([2, 2, 2])
     # Render custom labels attached to each control (hides Streamlit's native labels)
     # This puts the title directly above/control, improving styling consistency across browsers
     with cols[0]:
@@ -1102,94 +1248,94 @@ if df is not None:
         )
     with cols[2]:
         st.markdown('<div class="filter-label">Category</div>', unsafe_allow_html=True)
-        selected_category = st.selectbox(
+        st.multiselect(
             "",
-            categories,
-            index=categories.index(current_category),
-            key="category_filter_main",
+            filter_options.values.get('Merchant_Category', []),
+            placeholder="All",
+            key=MULTI_FILTER_KEYS['Merchant_Category'],
             label_visibility="collapsed"
         )
 
     st.markdown("</div>", unsafe_allow_html=True)
-    
+
+    # Remaining filters: values picked within a column are OR-ed, the columns AND-ed
+    n_active = sum(bool(st.session_state.get(MULTI_FILTER_KEYS[col])) for col in FILTER_COLUMNS
+                   if col != 'Merchant_Category')
+    amount_state = st.session_state.get('amount_filter')
+    if amount_state is not None and tuple(amount_state) != (amount_low, amount_high):
+        n_active += 1
+    with st.expander(f"More filters ({n_active} active)" if n_active else "More filters"):
+        filter_cols = st.columns(3)
+        for i, col in enumerate(['Type', 'Product', 'Country', 'City', 'Hour']):
+            with filter_cols[i % 3]:
+                st.multiselect(
+                    MULTI_FILTER_LABELS.get(col, col),
+                    filter_options.values.get(col, []),
+                    placeholder="All",
+                    key=MULTI_FILTER_KEYS[col],
+                    format_func=(lambda hour: f"{hour:02d}:00") if col == 'Hour' else str,
+                )
+        with filter_cols[2]:
+            amount_value = st.slider("Amount (€)", min_value=amount_low, max_value=amount_high,
+                                     value=(amount_low, amount_high), step=1.0, key="amount_filter")
+
+    # Picked filters as hashable (column, values) pairs; the full amount range means no amount filter
+    filters = tuple((col, tuple(st.session_state.get(MULTI_FILTER_KEYS[col], [])))
+                    for col in FILTER_COLUMNS if st.session_state.get(MULTI_FILTER_KEYS[col]))
+    amount_range = None if tuple(amount_value) == (amount_low, amount_high) else tuple(amount_value)
+    selected_category = 'All'
+    # A single category on its own is served by the query engine (cube + KPI index)
+    if amount_range is None and len(filters) == 1 and filters[0][0] == 'Merchant_Category' \
+            and len(filters[0][1]) == 1:
+        selected_category, filters = filters[0][1][0], ()
+
     # Budget variable (for use in dashboard)
     monthly_budget = 1000
     
-    # Apply simple filters sequentially (date range + category)
-    filtered_df = df.copy()
-
-    if len(filtered_df) > 0:
-        filtered_df = filtered_df[
-            (filtered_df['Date'].dt.date >= start_date) &
-            (filtered_df['Date'].dt.date <= end_date)
-        ]
-
-        if selected_category != 'All':
-            filtered_df = filtered_df[filtered_df['Merchant_Category'] == selected_category]
-    
-    # Calculate metrics with error handling
-    if len(filtered_df) > 0:
-        # Sort by date to ensure last balance is correct
-        filtered_df = filtered_df.sort_values('Date').reset_index(drop=True)
-        # Get the most recent balance (last row after sorting by date)
-        current_balance = float(filtered_df['Balance'].iloc[-1]) if len(filtered_df) > 0 else 0.0
-        # Safety check: if balance seems unreasonably high (>50k), recalculate from unfiltered data
-        # This handles cases where cached data might have incorrect values
-        if current_balance > 50000:
-            # Recalculate from the full dataset, sorted by date
-            df_sorted = df.sort_values('Date').reset_index(drop=True)
-            current_balance = float(df_sorted['Balance'].iloc[-1]) if len(df_sorted) > 0 else 0.0
-        total_income = filtered_df[filtered_df['Amount'] > 0]['Amount'].sum()
-        total_expenses = abs(filtered_df[filtered_df['Amount'] < 0]['Amount'].sum())
-        date_range_days = (filtered_df['Date'].max() - filtered_df['Date'].min()).days
-    else:
-        current_balance = 0
-        total_income = 0
-        total_expenses = 0
-        date_range_days = 1
-    
-    net_flow = total_income - total_expenses
-    expenses_df = filtered_df[filtered_df['Amount'] < 0].copy() if len(filtered_df) > 0 else pd.DataFrame()
-    income_df = filtered_df[filtered_df['Amount'] > 0].copy() if len(filtered_df) > 0 else pd.DataFrame()
-    
-    # Date range calculations
-    date_range_months = date_range_days / 30.44 if date_range_days > 0 else 1
-    
-    # Monthly calculations
-    # Monthly income is fixed at €1000 (monthly stipend)
-    avg_monthly_income = 1000.0
-    
-    avg_monthly_expenses = total_expenses / max(date_range_months, 1)
-    savings_rate = ((total_income - total_expenses) / total_income * 100) if total_income > 0 else 0
-    
-    # Additional KPIs
-    total_transactions = len(filtered_df) if len(filtered_df) > 0 else 0
-    avg_transaction_size = abs(filtered_df['Amount'].mean()) if len(filtered_df) > 0 else 0
-    avg_daily_spending = total_expenses / max(date_range_days, 1) if date_range_days > 0 else 0
-    largest_expense = abs(filtered_df[filtered_df['Amount'] < 0]['Amount'].min()) if len(expenses_df) > 0 else 0
-    largest_income = filtered_df[filtered_df['Amount'] > 0]['Amount'].max() if len(income_df) > 0 else 0
-    unique_days = filtered_df['Date'].nunique() if len(filtered_df) > 0 else 0
-    transactions_per_day = total_transactions / max(unique_days, 1) if unique_days > 0 else 0
-    
-    # Budget calculations - use the most recent month in filtered data, not the actual current month
-    if len(expenses_df) > 0:
-        # Get the most recent month from the filtered data
-        expenses_df_sorted = expenses_df.sort_values('Date')
-        most_recent_date = expenses_df_sorted['Date'].iloc[-1]
-        current_month = most_recent_date.strftime('%Y-%m')
-        current_month_expenses = expenses_df[expenses_df['Date'].dt.to_period('M').astype(str) == current_month]['Amount_Abs'].sum()
-    else:
-        current_month = datetime.now().strftime('%Y-%m')
-        current_month_expenses = 0
-    budget_used_pct = (current_month_expenses / monthly_budget * 100) if monthly_budget > 0 else 0
-    budget_remaining = monthly_budget - current_month_expenses
+    # Filtered views, KPIs and monthly summary - memoized per (dataset version, filters)
+    with span('query_engine', cache='get_query_engine'):
+        query_engine = get_query_engine(dataset['data_file'], file_mtime, df, cube, dataset['kpi_index'])
+    # The multi-select and amount filters run on the row bitmaps, so they need the table
+    view_rows = dataset
+    if df is None and (filters or amount_range is not None):
+        with span('load_rows'):
+            view_rows = dataset_manager.rows(dataset)
+    with span('filtered_view', cache='compute_filtered_view') as view_span:
+        view = compute_filtered_view(view_rows['df'], view_rows['cube'], balances, query_engine,
+                                     view_rows['bitmap_index'], view_rows['cube_bitmap_index'], file_mtime,
+                                     view_rows['file_mtime'], start_date, end_date, selected_category, filters,
+                                     amount_range, monthly_budget)
+        view_span.rows = view['kpis']['total_transactions']
+    filtered_df = view['filtered_df']
+    expenses_df = view['expenses_df']
+    income_df = view['income_df']
+    cube_view = view['cube_view']
+    expense_cube = view['expense_cube']
+    monthly_summary = view['monthly_summary']
+    
+    kpis = view['kpis']
+    current_balance = kpis['current_balance']
+    balance_divergences = kpis['balance_divergences']
+    total_income = kpis['total_income']
+    total_expenses = kpis['total_expenses']
+    net_flow = kpis['net_flow']
+    date_range_days = kpis['date_range_days']
+    date_range_months = kpis['date_range_months']
+    avg_monthly_income = kpis['avg_monthly_income']
+    avg_monthly_expenses = kpis['avg_monthly_expenses']
+    savings_rate = kpis['savings_rate']
+    avg_daily_spending = kpis['avg_daily_spending']
+    largest_expense = kpis['largest_expense']
+    current_month_expenses = kpis['current_month_expenses']
+    budget_used_pct = kpis['budget_used_pct']
+    budget_remaining = kpis['budget_remaining']
     
     # Key Metrics - Modern Card Layout
     st.markdown("## My Financial Overview")
     
     # Calculate date range description for context
-    if len(filtered_df) > 0:
-        date_range_str = f"{filtered_df['Date'].min().strftime('%b %Y')} to {filtered_df['Date'].max().strftime('%b %Y')}"
+    if kpis['total_transactions'] > 0:
+        date_range_str = f"{kpis['first_date'].strftime('%b %Y')} to {kpis['last_date'].strftime('%b %Y')}"
         period_months = date_range_months
         if period_months < 1:
             period_description = f"({date_range_days} days)"
@@ -1199,6 +1345,7 @@ if df is not None:
             period_description = f"(~{period_months:.1f} months)"
     else:
         date_range_str = "No data"
+        period_months = date_range_months
         period_description = ""
     
     # Main metrics row - 4 columns (no background grouping)
@@ -1212,6 +1359,9 @@ if df is not None:
             <div style="font-size: 0.7rem; color: #a0a0a0; margin-top: 0.25rem; line-height: 1.3;">As of latest transaction</div>
         </div>
         """, unsafe_allow_html=True)
+        if balance_divergences > 0:
+            # Reported balances that don't add up with the transaction amounts
+            st.markdown(f"<div style='font-size: 0.7rem; color: #ffaa00; margin-top: 0.25rem;'>⚠ {balance_divergences:,} reported balances differ from the running total</div>", unsafe_allow_html=True)
     
     with col2:
         st.markdown(f"""
@@ -1319,35 +1469,19 @@ if df is not None:
         </div>
         """, unsafe_allow_html=True)
     
-    # Calculate monthly summary (needed for waterfall chart)
-    if len(filtered_df) > 0:
-        monthly_df = filtered_df.copy()
-        monthly_df['YearMonth'] = monthly_df['Date'].dt.to_period('M').astype(str)
-        income_monthly = monthly_df[monthly_df['Amount'] > 0].groupby('YearMonth')['Amount'].sum().reset_index()
-        income_monthly.columns = ['Month', 'Income']
-        expenses_monthly = monthly_df[monthly_df['Amount'] < 0].groupby('YearMonth')['Amount_Abs'].sum().reset_index()
-        expenses_monthly.columns = ['Month', 'Expenses']
-        monthly_summary = pd.merge(income_monthly, expenses_monthly, on='Month', how='outer').fillna(0)
-        monthly_summary = monthly_summary.sort_values('Month')
-        monthly_summary['Net'] = monthly_summary['Income'] - monthly_summary['Expenses']
-    else:
-        monthly_summary = pd.DataFrame(columns=['Month', 'Income', 'Expenses', 'Net'])
-    
-    # Color palette - vibrant neon colors (needed for charts)
-    colors = {
-        'primary': '#00f5ff',
-        'secondary': '#ff00ff',
-        'accent': '#ffd700',
-        'income': '#00f5ff',
-        'expense': '#ff00ff',
-        'positive': '#00f5ff',
-        'negative': '#ff00ff'
-    }
+    # Color palette - vibrant neon colors (shared with the chart builders)
+    colors = COLORS
     
     # Reduced spacing divider
     st.markdown("<div style='margin: 0.25rem 0;'></div>", unsafe_allow_html=True)
     
-    # Main Tabs
+    # Keep widget values of hidden tabs alive - Streamlit drops the state of widgets not rendered in a run
+    for widget_key in TAB_WIDGET_KEYS:
+        if widget_key in st.session_state:
+            st.session_state[widget_key] = st.session_state[widget_key]
+    
+    # Main Tabs - the active tab is tracked in session state (key) and only the open tab's body runs;
+    # switching tabs triggers a rerun that renders the newly selected tab
     tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         "Dashboard", 
         "Spending Analysis", 
@@ -1355,1064 +1489,445 @@ if df is not None:
         "Transactions",
         "Your AI Financial Advisor",
         "Methodology"
-    ])
-    
-    # Weekday mapping for visualizations
-    weekday_map = {'Monday': 1, 'Tuesday': 2, 'Wednesday': 3, 'Thursday': 4, 
-                   'Friday': 5, 'Saturday': 6, 'Sunday': 7}
-    
-    # Vibrant color palette for charts
-    vibrant_colors = px.colors.qualitative.Vivid + px.colors.qualitative.Set3
+    ], key="main_tab", on_change="rerun")
     
     with tab1:
-        # Dashboard header - first thing in Dashboard tab
-        st.markdown("## My Financial Dashboard")
-        st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>View your account balance over time and see where your money goes.</p>", unsafe_allow_html=True)
-        
-        # Financial Health Score and Waterfall
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("### My Financial Health Score")
-            st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>A visual indicator of your financial health based on your savings rate and spending patterns.</p>", unsafe_allow_html=True)
-            if total_income > 0:
-                health_score = min(100, max(0, (savings_rate + 50)))
-                fig_gauge = go.Figure(go.Indicator(
-                    mode="gauge+number+delta",
-                    value=health_score,
-                    domain={'x': [0, 1], 'y': [0, 1]},
-                    title={'text': "Financial Health Score", 'font': {'color': '#ffffff', 'size': 16}},
-                    delta={'reference': 50, 'font': {'color': '#ffffff'}},
-                    gauge={
-                        'axis': {'range': [None, 100], 'tickcolor': '#ffffff'},
-                        'bar': {'color': colors['primary']},
-                        'steps': [
-                            {'range': [0, 33], 'color': 'rgba(255, 0, 255, 0.2)'},
-                            {'range': [33, 66], 'color': 'rgba(255, 215, 0, 0.2)'},
-                            {'range': [66, 100], 'color': 'rgba(0, 245, 255, 0.2)'}
-                        ],
-                        'threshold': {
-                            'line': {'color': colors['secondary'], 'width': 4},
-                            'thickness': 0.75,
-                            'value': 90
-                        }
-                    }
-                ))
-                fig_gauge.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#ffffff',
-                    height=350,
-                    margin=dict(l=0, r=0, t=0, b=0)
-                    )
-                st.plotly_chart(fig_gauge, use_container_width=True, key="gauge_chart_dashboard")
-            
-        with col2:
-            st.markdown("### Monthly Income vs Expenses Waterfall")
-            st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>This chart shows how your monthly income and expenses add up over time. Each month's net amount (income minus expenses) is displayed.</p>", unsafe_allow_html=True)
-            if len(monthly_summary) > 0:
-                waterfall_data = monthly_summary.copy()
-                waterfall_data['Net_Flow'] = waterfall_data['Net']
-                
-                fig_waterfall = go.Figure(go.Waterfall(
-                    name="Income Minus Expenses",
-                    orientation="v",
-                    measure=["relative"] * (len(waterfall_data) - 1) + ["total"],
-                    x=waterfall_data['Month'],
-                    textposition="outside",
-                    text=waterfall_data['Net_Flow'].apply(lambda x: f"€{x:,.0f}"),
-                    y=waterfall_data['Net_Flow'],
-                    connector={"line": {"color": colors['accent']}},
-                    increasing={"marker": {"color": colors['income']}},
-                    decreasing={"marker": {"color": colors['expense']}},
-                    totals={"marker": {"color": colors['accent']}}
-                ))
-                fig_waterfall.update_layout(
-                    title="",
-                    xaxis_title="Month",
-                    yaxis_title="Amount (€) - Income Minus Expenses",
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#ffffff',
-                    showlegend=False,
-                    height=350,
-                    margin=dict(l=0, r=0, t=0, b=0),
-                    xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
-                    yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
-                )
-                st.plotly_chart(fig_waterfall, use_container_width=True, key="waterfall_chart_dashboard")
-        
-        # Balance Over Time and Top Categories - Side by Side
-        col1, col2 = st.columns([2, 1])
-        
-        with col1:
-            st.markdown("### My Account Balance Over Time")
-            st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Track how your account balance changes with each transaction. The dashed line shows your current balance.</p>", unsafe_allow_html=True)
-            if len(filtered_df) > 0:
-                balance_df = filtered_df.groupby('Date')['Balance'].last().reset_index().sort_values('Date')
-            else:
-                balance_df = pd.DataFrame(columns=['Date', 'Balance'])
-            if len(balance_df) > 0:
-                fig_balance = px.area(
-                    balance_df, 
-                    x='Date', 
-                    y='Balance',
-                    title="",
-                    labels={'Balance': 'Balance (€)', 'Date': 'Date'},
-                    color_discrete_sequence=[colors['primary']]
-                )
-                fig_balance.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#ffffff',
-                    hovermode='x unified',
-                    height=300,
-                    showlegend=False,
-                    margin=dict(l=0, r=0, t=0, b=0),
-                    xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
-                    yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
-                )
-                fig_balance.add_hline(y=current_balance, line_dash="dash", line_color=colors['secondary'], 
-                                     annotation_text=f"Current: €{current_balance:,.0f}")
-                st.plotly_chart(fig_balance, use_container_width=True, key="balance_trend")
-            else:
-                st.info("No data available for the selected filters.")
-        
-        with col2:
-            st.markdown("### My Top Spending Categories")
-            st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>See which categories account for most of your expenses.</p>", unsafe_allow_html=True)
-            if len(expenses_df) > 0:
-                top_cats = expenses_df.groupby('Merchant_Category')['Amount_Abs'].sum().reset_index()
-                top_cats = top_cats.sort_values('Amount_Abs', ascending=False).head(5)
-                top_cats['Percentage'] = (top_cats['Amount_Abs'] / top_cats['Amount_Abs'].sum() * 100).round(1)
-                
-                fig_categories = px.bar(
-                    top_cats,
-                    x='Amount_Abs',
-                    y='Merchant_Category',
-                    orientation='h',
-                    title="",
-                    labels={'Amount_Abs': 'Amount (€)', 'Merchant_Category': 'Category'},
-                    color='Amount_Abs',
-                    color_continuous_scale='Plasma',
-                    text='Amount_Abs'
-                )
-                fig_categories.update_traces(
-                    texttemplate='€%{text:,.0f}',
-                    textposition='outside',
-                    textfont_color='#ffffff'
-                )
-                fig_categories.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#ffffff',
-                    height=300,
-                    showlegend=False,
-                    margin=dict(l=0, r=0, t=0, b=0),
-                    xaxis=dict(gridcolor='rgba(255,255,255,0.1)', showgrid=True),
-                    yaxis=dict(gridcolor='rgba(255,255,255,0.1)', showgrid=False, categoryorder='total ascending')
-                )
-                st.plotly_chart(fig_categories, use_container_width=True, key="top_categories_bar")
-            else:
-                st.info("No expense data available.")
-        
-        # Income vs Expenses Chart
-        st.markdown("### My Monthly Income vs Expenses")
-        st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Compare your monthly income and expenses side by side. The line shows your net amount (income minus expenses) each month.</p>", unsafe_allow_html=True)
-        if len(monthly_summary) > 0:
-            fig_monthly = go.Figure()
-            fig_monthly.add_trace(go.Bar(
-                x=monthly_summary['Month'],
-                y=monthly_summary['Income'],
-                name='Income',
-                marker_color=colors['income']
-            ))
-            fig_monthly.add_trace(go.Bar(
-                x=monthly_summary['Month'],
-                y=monthly_summary['Expenses'],
-                name='Expenses',
-                marker_color=colors['expense']
-            ))
-            fig_monthly.add_trace(go.Scatter(
-                x=monthly_summary['Month'],
-                y=monthly_summary['Net'],
-                name='Income Minus Expenses',
-                mode='lines+markers',
-                line=dict(color=colors['accent'], width=3),
-                marker=dict(size=8)
-            ))
-            fig_monthly.update_layout(
-                title="",
-                xaxis_title="Month",
-                yaxis_title="Amount (€)",
-                barmode='group',
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font_color='#ffffff',
-                hovermode='x unified',
-                height=400,
-                margin=dict(l=0, r=0, t=0, b=0),
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(color='#ffffff', size=11)),
-                xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
-                yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
-            )
-            st.plotly_chart(fig_monthly, use_container_width=True, key="income_expenses")
-        else:
-            st.info("No monthly data available for the selected filters.")
-        
-        # Expenses by Category - Bar Chart
-        st.markdown("### My Expenses by Category")
-        st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>A detailed breakdown of all your spending categories. Hover over bars to see exact amounts.</p>", unsafe_allow_html=True)
-        if len(expenses_df) > 0:
-            category_expenses = expenses_df.groupby('Merchant_Category')['Amount_Abs'].sum().reset_index()
-            category_expenses = category_expenses.sort_values('Amount_Abs', ascending=False)
-            
-            fig_category = px.bar(
-                category_expenses,
-                x='Merchant_Category',
-                y='Amount_Abs',
-                title="",
-                labels={'Amount_Abs': 'Amount (€)', 'Merchant_Category': 'Category'},
-                color='Amount_Abs',
-                color_continuous_scale='Plasma',
-                text='Amount_Abs'
-            )
-            fig_category.update_traces(
-                texttemplate='€%{text:,.0f}',
-                textposition='outside',
-                textfont=dict(color='#ffffff', size=12, family='Inter')
-            )
-            fig_category.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-                font_color='#ffffff',
-                height=400,
-                margin=dict(l=0, r=0, t=0, b=0),
-                showlegend=False,
-                xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
-                yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
-            )
-            st.plotly_chart(fig_category, use_container_width=True, key="category_bar_spending_tab")
-        
-        # Advanced Transaction Visualizations
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("#### Transaction Size vs Balance")
-            st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>See how individual transaction amounts relate to your account balance at that time.</p>", unsafe_allow_html=True)
-            if len(filtered_df) > 0:
-                scatter_df = filtered_df[filtered_df['Amount'] != 0].copy()
-                if len(scatter_df) > 0:
-                    scatter_df['Transaction_Type'] = scatter_df['Amount'].apply(lambda x: 'Income' if x > 0 else 'Expense')
-                    fig_scatter = px.scatter(
-                        scatter_df.head(500),
-                        x='Amount_Abs',
-                        y='Balance',
-                        color='Transaction_Type',
-                        size='Amount_Abs',
-                        hover_data=['Merchant_Category', 'Date'],
-                        title="",
-                        labels={'Amount_Abs': 'Transaction Amount (€)', 'Balance': 'Account Balance (€)'},
-                        color_discrete_map={'Income': colors['income'], 'Expense': colors['expense']}
-                    )
-                    fig_scatter.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='#ffffff',
-                        height=300,
-                        margin=dict(l=0, r=0, t=0, b=0),
-                        xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
-                        yaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
-                        legend=dict(font=dict(color='#ffffff', size=11))
-                    )
-                    st.plotly_chart(fig_scatter, use_container_width=True, key="scatter_balance")
-        
-        with col2:
-            st.markdown("#### 3D Scatter: Amount vs Hour vs Day")
-            st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Explore spending patterns across different times of day and days of the week.</p>", unsafe_allow_html=True)
-            if len(expenses_df) > 0:
-                scatter_3d_data = expenses_df.head(300).copy()
-                scatter_3d_data['Weekday_Num'] = scatter_3d_data['Weekday'].map(weekday_map)
+        if tab1.open:
+            with span('tab:Dashboard'):
+                # Dashboard header - first thing in Dashboard tab
+                st.markdown("## My Financial Dashboard")
+                st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>View your account balance over time and see where your money goes.</p>", unsafe_allow_html=True)
+            
+                # Financial Health Score and Waterfall
+                col1, col2 = st.columns(2)
+            
+                with col1:
+                    st.markdown("### My Financial Health Score")
+                    st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>A visual indicator of your financial health based on your savings rate and spending patterns.</p>", unsafe_allow_html=True)
+                    if total_income > 0:
+                        show_chart('health_gauge', health_score(savings_rate), key="gauge_chart_dashboard")
                 
-                if len(scatter_3d_data) > 0:
-                    fig_3d = px.scatter_3d(
-                        scatter_3d_data,
-                        x='Hour',
-                        y='Weekday_Num',
-                        z='Amount_Abs',
-                        color='Merchant_Category',
-                        size='Amount_Abs',
-                        hover_data=['Date'],
-                        title="",
-                        labels={'Hour': 'Hour of Day', 'Weekday_Num': 'Day of Week', 'Amount_Abs': 'Amount (€)'},
-                        color_discrete_sequence=vibrant_colors
-                    )
-                    fig_3d.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='#ffffff',
-                        height=300,
-                        margin=dict(l=0, r=0, t=0, b=0),
-                        legend=dict(font=dict(color='#ffffff', size=11)),
-                        scene=dict(
-                            xaxis_title="Hour",
-                            yaxis_title="Day of Week",
-                            zaxis_title="Amount (€)",
-                            bgcolor='rgba(0,0,0,0)',
-                            xaxis=dict(gridcolor='rgba(255,255,255,0.1)', backgroundcolor='rgba(0,0,0,0)'),
-                            yaxis=dict(gridcolor='rgba(255,255,255,0.1)', backgroundcolor='rgba(0,0,0,0)'),
-                            zaxis=dict(gridcolor='rgba(255,255,255,0.1)', backgroundcolor='rgba(0,0,0,0)')
-                        )
-                    )
-                    st.plotly_chart(fig_3d, use_container_width=True, key="3d_scatter")
-        
-    with tab2:
-        st.markdown("## My Spending Analysis")
-        st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.5rem; margin-top: 0.1rem;'>Analyze your spending patterns by category, time, and location to understand where your money goes.</p>", unsafe_allow_html=True)
-        
-        if len(expenses_df) > 0:
-            # Key Insights - At the top for quick summary
+                with col2:
+                    st.markdown("### Monthly Income vs Expenses Waterfall")
+                    st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>This chart shows how your monthly income and expenses add up over time. Each month's net amount (income minus expenses) is displayed.</p>", unsafe_allow_html=True)
+                    if len(monthly_summary) > 0:
+                        show_chart('monthly_waterfall', monthly_summary, key="waterfall_chart_dashboard")
+            
+                # Balance Over Time and Top Categories - Side by Side
+                col1, col2 = st.columns([2, 1])
+            
+                with col1:
+                    st.markdown("### My Account Balance Over Time")
+                    st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Track how your account balance changes with each transaction. The dashed line shows your current balance.</p>", unsafe_allow_html=True)
+                    # End-of-day totals of the reconstructed ledger - the same source as the Current Balance KPI
+                    balance_df = view['daily_balances']
+                    if len(balance_df) > 0:
+                        show_chart('balance_trend', balance_df, current_balance=current_balance, key="balance_trend")
+                    else:
+                        st.info("No data available for the selected filters.")
+            
+                with col2:
+                    st.markdown("### My Top Spending Categories")
+                    st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>See which categories account for most of your expenses.</p>", unsafe_allow_html=True)
+                    if len(expense_cube) > 0:
+                        show_chart('top_categories_bar', top_categories(expense_cube), key="top_categories_bar")
+                    else:
+                        st.info("No expense data available.")
             
-            insight_col1, insight_col2, insight_col3 = st.columns(3)
+                # Income vs Expenses Chart
+                st.markdown("### My Monthly Income vs Expenses")
+                st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Compare your monthly income and expenses side by side. The line shows your net amount (income minus expenses) each month.</p>", unsafe_allow_html=True)
+                if len(monthly_summary) > 0:
+                    show_chart('income_expenses', monthly_summary, key="income_expenses")
+                else:
+                    st.info("No monthly data available for the selected filters.")
+            
+                # Expenses by Category - Bar Chart
+                st.markdown("### My Expenses by Category")
+                st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>A detailed breakdown of all your spending categories. Hover over bars to see exact amounts.</p>", unsafe_allow_html=True)
+                if len(expense_cube) > 0:
+                    show_chart('category_bar', category_expenses(category_totals(expense_cube)), text_size=12,
+                               text_family='Inter', key="category_bar_spending_tab")
+            
+                # Advanced Transaction Visualizations
+                col1, col2 = st.columns(2)
+            
+                with col1:
+                    st.markdown("#### Transaction Size vs Balance")
+                    st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>See how individual transaction amounts relate to your account balance at that time.</p>", unsafe_allow_html=True)
+                    scatter_df = view['scatter_rows']
+                    if len(scatter_df) > 0:
+                        show_chart('scatter_balance', scatter_df, key="scatter_balance")
+            
+                with col2:
+                    st.markdown("#### 3D Scatter: Amount vs Hour vs Day")
+                    st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Explore spending patterns across different times of day and days of the week.</p>", unsafe_allow_html=True)
+                    scatter_3d_data = view['expense_rows']
+                    if len(scatter_3d_data) > 0:
+                        show_chart('scatter_3d', scatter_3d_data, key="3d_scatter")
             
-            with insight_col1:
-                top_category = expenses_df.groupby('Merchant_Category')['Amount_Abs'].sum().idxmax()
-                top_category_amount = expenses_df.groupby('Merchant_Category')['Amount_Abs'].sum().max()
-                st.markdown(f"""
+    with tab2:
+        if tab2.open:
+            with span('tab:Spending Analysis'):
+                st.markdown("## My Spending Analysis")
+                st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 0.5rem; margin-top: 0.1rem;'>Analyze your spending patterns by category, time, and location to understand where your money goes.</p>", unsafe_allow_html=True)
+            
+                if len(expense_cube) > 0:
+                    # Category totals rolled up once and reused by the insights and charts below
+                    spending_by_category = category_totals(expense_cube)
+                    spending_by_hour = hour_expenses(expense_cube)
+                
+                    # Key Insights - At the top for quick summary
+                
+                    insight_col1, insight_col2, insight_col3 = st.columns(3)
+                
+                    with insight_col1:
+                        top_category = spending_by_category.idxmax()
+                        top_category_amount = spending_by_category.max()
+                        st.markdown(f"""
                 <div style="background: rgba(255, 255, 255, 0.05); backdrop-filter: blur(10px); padding: 1.5rem; border-radius: 12px; border: 1px solid rgba(255, 255, 255, 0.1);">
                     <div style="font-size: 0.875rem; color: #a0a0a0; margin-bottom: 0.5rem;">Top Spending Category</div>
                     <div style="font-size: 1.5rem; font-weight: 700; color: #ffffff;">{top_category}</div>
                     <div style="font-size: 1rem; color: {colors['primary']}; margin-top: 0.5rem;">€{top_category_amount:,.2f}</div>
                 </div>
                 """, unsafe_allow_html=True)
-            
-            with insight_col2:
-                peak_hour = expenses_df.groupby('Hour')['Amount_Abs'].sum().idxmax()
-                peak_hour_amount = expenses_df.groupby('Hour')['Amount_Abs'].sum().max()
-                st.markdown(f"""
+                
+                    with insight_col2:
+                        peak_hour_amount = spending_by_hour['Amount_Abs'].max()
+                        peak_hour = spending_by_hour.loc[spending_by_hour['Amount_Abs'].idxmax(), 'Hour']
+                        st.markdown(f"""
                 <div style="background: rgba(255, 255, 255, 0.05); backdrop-filter: blur(10px); padding: 1.5rem; border-radius: 12px; border: 1px solid rgba(255, 255, 255, 0.1);">
                     <div style="font-size: 0.875rem; color: #a0a0a0; margin-bottom: 0.5rem;">Peak Spending Hour</div>
                     <div style="font-size: 1.5rem; font-weight: 700; color: #ffffff;">{peak_hour}:00</div>
                     <div style="font-size: 1rem; color: {colors['primary']}; margin-top: 0.5rem;">€{peak_hour_amount:,.2f}</div>
                 </div>
                 """, unsafe_allow_html=True)
-            
-            with insight_col3:
-                avg_expense = expenses_df['Amount_Abs'].mean()
-                st.markdown(f"""
+                
+                    with insight_col3:
+                        avg_expense = expense_cube['Amount_Abs'].sum() / expense_cube['Count'].sum()
+                        st.markdown(f"""
                 <div style="background: rgba(255, 255, 255, 0.05); backdrop-filter: blur(10px); padding: 1.5rem; border-radius: 12px; border: 1px solid rgba(255, 255, 255, 0.1);">
                     <div style="font-size: 0.875rem; color: #a0a0a0; margin-bottom: 0.5rem;">Average Transaction</div>
                     <div style="font-size: 1.5rem; font-weight: 700; color: #ffffff;">€{avg_expense:,.2f}</div>
                     <div style="font-size: 1rem; color: {colors['primary']}; margin-top: 0.5rem;">per transaction</div>
                 </div>
                 """, unsafe_allow_html=True)
-            
-            # Category Analysis Section
-            st.markdown("### Category Analysis")
-            st.markdown("<p style='font-size: 0.75rem; color: #a0a0a0; margin-bottom: 0.5rem; margin-top: 0.1rem;'>Understand how your spending is distributed across different categories and how it evolves over time.</p>", unsafe_allow_html=True)
-            
-            st.markdown("#### Spending by Category")
-            st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Compare spending amounts across different categories. Hover to see exact values.</p>", unsafe_allow_html=True)
-            category_expenses = expenses_df.groupby('Merchant_Category')['Amount_Abs'].sum().reset_index()
-            category_expenses = category_expenses.sort_values('Amount_Abs', ascending=False)
-            
-            fig_category = px.bar(
-                category_expenses,
-                x='Merchant_Category',
-                y='Amount_Abs',
-                title="",
-                labels={'Amount_Abs': 'Amount (€)', 'Merchant_Category': 'Category'},
-                color='Amount_Abs',
-                color_continuous_scale='Plasma',
-                text='Amount_Abs'
-            )
-            fig_category.update_traces(
-                texttemplate='€%{text:,.0f}',
-                textposition='outside',
-                textfont=dict(color='#ffffff', size=11)
-            )
-            fig_category.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font_color='#ffffff',
-                height=400,
-                margin=dict(l=0, r=0, t=0, b=0),
-                showlegend=False,
-                xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
-                yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
-            )
-            st.plotly_chart(fig_category, use_container_width=True, key="category_bar_spending")
-            
-            # Category Trends Section
-            col_cat1, col_cat2 = st.columns(2)
-            
-            with col_cat1:
-                st.markdown("#### Category Trends Over Time")
-                st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Track how your top spending categories change month by month.</p>", unsafe_allow_html=True)
-                if len(expenses_df) > 0 and 'Date' in expenses_df.columns:
-                    top_categories = expenses_df.groupby('Merchant_Category')['Amount_Abs'].sum().nlargest(5).index
-                    category_trends = expenses_df[expenses_df['Merchant_Category'].isin(top_categories)].copy()
-                    if len(category_trends) > 0:
-                        category_trends['YearMonth'] = category_trends['Date'].dt.to_period('M').astype(str)
-                        category_monthly = category_trends.groupby(['YearMonth', 'Merchant_Category'])['Amount_Abs'].sum().reset_index()
-                    else:
-                        category_monthly = pd.DataFrame(columns=['YearMonth', 'Merchant_Category', 'Amount_Abs'])
-                else:
-                    category_monthly = pd.DataFrame(columns=['YearMonth', 'Merchant_Category', 'Amount_Abs'])
                 
-                if len(category_monthly) > 0:
-                    fig_trends = px.line(
-                        category_monthly,
-                        x='YearMonth',
-                        y='Amount_Abs',
-                        color='Merchant_Category',
-                        title="",
-                        labels={'Amount_Abs': 'Spending (€)', 'YearMonth': 'Month'},
-                        markers=True,
-                        color_discrete_sequence=vibrant_colors
-                    )
-                    fig_trends.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='#ffffff',
-                        hovermode='x unified',
-                        height=300,
-                        margin=dict(l=0, r=0, t=0, b=0),
-                        xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
-                        yaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
-                        legend=dict(font=dict(color='#ffffff', size=11))
-                    )
-                    st.plotly_chart(fig_trends, use_container_width=True, key="category_trends")
-                else:
-                    st.info("No trend data available.")
-            
-            with col_cat2:
-                st.markdown("#### Average Spending per Transaction by Category")
-                st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>See which categories typically have higher transaction amounts.</p>", unsafe_allow_html=True)
-                if len(expenses_df) > 0:
-                    avg_by_category = expenses_df.groupby('Merchant_Category').agg({
-                        'Amount_Abs': ['mean', 'count']
-                    }).reset_index()
-                    avg_by_category.columns = ['Category', 'Avg_Amount', 'Count']
-                    avg_by_category = avg_by_category[avg_by_category['Count'] >= 3]  # Only categories with at least 3 transactions
-                    avg_by_category = avg_by_category.sort_values('Avg_Amount', ascending=False).head(8)
-                    
-                    fig_avg_cat = px.bar(
-                        avg_by_category,
-                        x='Category',
-                        y='Avg_Amount',
-                        title="",
-                        labels={'Avg_Amount': 'Average Amount (€)', 'Category': 'Category'},
-                        color='Avg_Amount',
-                        color_continuous_scale='Plasma',
-                        text='Avg_Amount'
-                    )
-                    fig_avg_cat.update_traces(
-                        texttemplate='€%{text:,.0f}',
-                        textposition='outside',
-                        textfont=dict(color='#ffffff', size=10)
-                    )
-                    fig_avg_cat.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='#ffffff',
-                        height=300,
-                        margin=dict(l=0, r=0, t=0, b=0),
-                        showlegend=False,
-                        xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
-                        yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
-                    )
-                    st.plotly_chart(fig_avg_cat, use_container_width=True, key="avg_category_spending")
-            
-            # Stacked Area Chart
-            st.markdown("#### Stacked Area: Category Trends")
-            st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Visualize cumulative spending by category over time.</p>", unsafe_allow_html=True)
-            if len(expenses_df) > 0 and 'Date' in expenses_df.columns:
-                expenses_df_copy = expenses_df.copy()
-                expenses_df_copy['YearMonth'] = expenses_df_copy['Date'].dt.to_period('M').astype(str)
-                top_cats_area = expenses_df_copy.groupby('Merchant_Category')['Amount_Abs'].sum().nlargest(6).index
-                area_data = expenses_df_copy[expenses_df_copy['Merchant_Category'].isin(top_cats_area)]
+                    # Category Analysis Section
+                    st.markdown("### Category Analysis")
+                    st.markdown("<p style='font-size: 0.75rem; color: #a0a0a0; margin-bottom: 0.5rem; margin-top: 0.1rem;'>Understand how your spending is distributed across different categories and how it evolves over time.</p>", unsafe_allow_html=True)
+                
+                    st.markdown("#### Spending by Category")
+                    st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Compare spending amounts across different categories. Hover to see exact values.</p>", unsafe_allow_html=True)
+                    show_chart('category_bar', category_expenses(spending_by_category), text_size=11, key="category_bar_spending")
+                
+                    # Category Trends Section
+                    col_cat1, col_cat2 = st.columns(2)
                 
-                if len(area_data) > 0:
-                    area_monthly = area_data.groupby(['YearMonth', 'Merchant_Category'])['Amount_Abs'].sum().reset_index()
+                    with col_cat1:
+                        st.markdown("#### Category Trends Over Time")
+                        st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Track how your top spending categories change month by month.</p>", unsafe_allow_html=True)
+                        trends_monthly = category_monthly(expense_cube, spending_by_category, 5)
                     
-                    fig_area = px.area(
-                        area_monthly,
-                        x='YearMonth',
-                        y='Amount_Abs',
-                        color='Merchant_Category',
-                        title="",
-                        labels={'Amount_Abs': 'Spending (€)', 'YearMonth': 'Month'},
-                        color_discrete_sequence=vibrant_colors
-                    )
-                    fig_area.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='#ffffff',
-                        height=300,
-                        margin=dict(l=0, r=0, t=0, b=0),
-                        xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
-                        yaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
-                        legend=dict(font=dict(color='#ffffff', size=11))
-                    )
-                    st.plotly_chart(fig_area, use_container_width=True, key="stacked_area")
-            
-            # Temporal Patterns Section
-            st.markdown("### Temporal Patterns")
-            st.markdown("<p style='font-size: 0.75rem; color: #a0a0a0; margin-bottom: 0.5rem; margin-top: 0.1rem;'>Explore when during the day and week you tend to spend the most.</p>", unsafe_allow_html=True)
-            
-            col_temp1, col_temp2 = st.columns(2)
-            
-            with col_temp1:
-                st.markdown("#### Spending by Day of Week")
-                st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Discover which days of the week you spend the most.</p>", unsafe_allow_html=True)
-                weekday_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-                weekday_expenses = expenses_df.groupby('Weekday')['Amount_Abs'].sum().reset_index()
-                weekday_expenses['Weekday'] = pd.Categorical(weekday_expenses['Weekday'], categories=weekday_order, ordered=True)
-                weekday_expenses = weekday_expenses.sort_values('Weekday')
+                        if len(trends_monthly) > 0:
+                            show_chart('category_trends', trends_monthly, key="category_trends")
+                        else:
+                            st.info("No trend data available.")
                 
-                fig_weekday = px.bar(
-                    weekday_expenses,
-                    x='Weekday',
-                    y='Amount_Abs',
-                    title="",
-                    labels={'Amount_Abs': 'Spending (€)', 'Weekday': 'Day'},
-                    color='Amount_Abs',
-                    color_continuous_scale='Plasma',
-                    text='Amount_Abs'
-                )
-                fig_weekday.update_traces(
-                    texttemplate='€%{text:,.0f}',
-                    textposition='outside',
-                    textfont=dict(color='#ffffff', size=11)
-                )
-                fig_weekday.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#ffffff',
-                    height=350,
-                    margin=dict(l=0, r=0, t=0, b=0),
-                    showlegend=False,
-                    xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
-                    yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
-                )
-                st.plotly_chart(fig_weekday, use_container_width=True, key="weekday_spending")
-            
-            with col_temp2:
-                st.markdown("#### Spending by Hour of Day")
-                st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Track your spending patterns throughout the day to identify peak spending hours.</p>", unsafe_allow_html=True)
-                hour_expenses = expenses_df.groupby('Hour')['Amount_Abs'].sum().reset_index()
-                hour_expenses = hour_expenses.sort_values('Hour')
+                    with col_cat2:
+                        st.markdown("#### Average Spending per Transaction by Category")
+                        st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>See which categories typically have higher transaction amounts.</p>", unsafe_allow_html=True)
+                        if len(expense_cube) > 0:
+                            # Only categories with at least 3 transactions
+                            show_chart('avg_category_spending', average_by_category(expense_cube), key="avg_category_spending")
                 
-                fig_hour = px.line(
-                    hour_expenses,
-                    x='Hour',
-                    y='Amount_Abs',
-                    title="",
-                    labels={'Amount_Abs': 'Spending (€)', 'Hour': 'Hour'},
-                    color_discrete_sequence=[colors['secondary']],
-                    markers=True
-                )
-                fig_hour.update_traces(
-                    line=dict(width=3),
-                    marker=dict(size=6),
-                    fill='tonexty',
-                    fillcolor=f'rgba(255, 0, 255, 0.1)'
-                )
-                fig_hour.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#ffffff',
-                    hovermode='x unified',
-                    height=350,
-                    margin=dict(l=0, r=0, t=0, b=0),
-                    xaxis=dict(tickmode='linear', dtick=2, gridcolor='rgba(255,255,255,0.1)'),
-                    yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
-                )
-                st.plotly_chart(fig_hour, use_container_width=True, key="hour_spending")
-            
-            # Spending Heatmap
-            st.markdown("#### Spending Heatmap: Day vs Hour")
-            st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Visualize spending intensity across days and hours. Darker colors indicate higher spending.</p>", unsafe_allow_html=True)
-            if len(expenses_df) > 0:
-                weekday_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-                heatmap_data = expenses_df.groupby(['Weekday', 'Hour'])['Amount_Abs'].sum().reset_index()
-                heatmap_data['Weekday'] = pd.Categorical(heatmap_data['Weekday'], categories=weekday_order, ordered=True)
-                heatmap_pivot = heatmap_data.pivot(index='Weekday', columns='Hour', values='Amount_Abs').fillna(0)
+                    # Stacked Area Chart
+                    st.markdown("#### Stacked Area: Category Trends")
+                    st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Visualize cumulative spending by category over time.</p>", unsafe_allow_html=True)
+                    if len(expense_cube) > 0:
+                        area_monthly = category_monthly(expense_cube, spending_by_category, 6)
+                    
+                        if len(area_monthly) > 0:
+                            show_chart('category_stacked_area', area_monthly, key="stacked_area")
                 
-                fig_heatmap = px.imshow(
-                    heatmap_pivot,
-                    labels=dict(x="Hour", y="Day", color="Spending (€)"),
-                    title="",
-                    color_continuous_scale='Plasma',
-                    aspect="auto"
-                )
-                fig_heatmap.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#ffffff',
-                    height=350,
-                    margin=dict(l=0, r=0, t=0, b=0)
-                )
-                st.plotly_chart(fig_heatmap, use_container_width=True, key="spending_heatmap_trends_tab")
-            
-            # Top Merchants
-            st.markdown("### Top Merchants")
-            st.markdown("<p style='font-size: 0.75rem; color: #a0a0a0; margin-bottom: 0.5rem; margin-top: 0.1rem;'>See which merchants and locations account for most of your spending.</p>", unsafe_allow_html=True)
-            top_merchants = expenses_df.groupby('Description_Anon')['Amount_Abs'].sum().reset_index()
-            top_merchants = top_merchants.sort_values('Amount_Abs', ascending=False).head(15)
-            top_merchants.columns = ['Merchant', 'Total Spent']
-            
-            fig_merchants = px.bar(
-                top_merchants,
-                x='Total Spent',
-                y='Merchant',
-                orientation='h',
-                title="",
-                labels={'Total Spent': 'Total Spent (€)', 'Merchant': 'Merchant'},
-                color='Total Spent',
-                color_continuous_scale='Plasma',
-                text='Total Spent'
-            )
-            fig_merchants.update_traces(
-                texttemplate='€%{text:,.0f}',
-                textposition='outside',
-                textfont=dict(color='#ffffff', size=10)
-            )
-            fig_merchants.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font_color='#ffffff',
-                height=450,
-                margin=dict(l=0, r=0, t=0, b=0),
-                showlegend=False,
-                yaxis={'categoryorder': 'total ascending'},
-                xaxis=dict(gridcolor='rgba(255,255,255,0.1)')
-            )
-            st.plotly_chart(fig_merchants, use_container_width=True, key="top_merchants")
-    
-    with tab3:
-        st.markdown("## Location-Based Spending Analysis")
-        st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 1rem;'>Explore your spending patterns across different countries and cities with interactive visualizations.</p>", unsafe_allow_html=True)
-        
-        if 'Country' in filtered_df.columns and filtered_df['Country'].nunique() > 1:
-            if len(expenses_df) > 0 and 'Country' in expenses_df.columns:
-                country_metrics = expenses_df.groupby('Country').agg({
-                    'Amount_Abs': ['sum', 'mean', 'count']
-                }).reset_index()
-                country_metrics.columns = ['Country', 'Total_Spending', 'Avg_Transaction', 'Transaction_Count']
-                country_metrics = country_metrics.sort_values('Total_Spending', ascending=False)
+                    # Temporal Patterns Section
+                    st.markdown("### Temporal Patterns")
+                    st.markdown("<p style='font-size: 0.75rem; color: #a0a0a0; margin-bottom: 0.5rem; margin-top: 0.1rem;'>Explore when during the day and week you tend to spend the most.</p>", unsafe_allow_html=True)
                 
-                # Interactive Country Selector
-                st.markdown("### Interactive Country Explorer")
-                selected_countries = st.multiselect(
-                    "Select countries to analyze (leave empty for all)",
-                    options=country_metrics['Country'].tolist(),
-                    default=[],
-                    key="country_selector"
-                )
+                    col_temp1, col_temp2 = st.columns(2)
                 
-                if selected_countries:
-                    filtered_expenses = expenses_df[expenses_df['Country'].isin(selected_countries)]
-                    country_metrics_filtered = country_metrics[country_metrics['Country'].isin(selected_countries)]
-                else:
-                    filtered_expenses = expenses_df
-                    country_metrics_filtered = country_metrics
+                    with col_temp1:
+                        st.markdown("#### Spending by Day of Week")
+                        st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Discover which days of the week you spend the most.</p>", unsafe_allow_html=True)
+                        # Weekday codes sort Monday-first; the chart shows the day names
+                        weekday_expenses = rollup(expense_cube, 'WeekdayCode')
+                    
+                        show_chart('weekday_spending', weekday_expenses, key="weekday_spending")
+                
+                    with col_temp2:
+                        st.markdown("#### Spending by Hour of Day")
+                        st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Track your spending patterns throughout the day to identify peak spending hours.</p>", unsafe_allow_html=True)
+                        show_chart('hour_spending', spending_by_hour, key="hour_spending")
                 
-                # Key Metrics
-                metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+                    # Spending Heatmap
+                    st.markdown("#### Spending Heatmap: Day vs Hour")
+                    st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.1rem; margin-top: 0.1rem;'>Visualize spending intensity across days and hours. Darker colors indicate higher spending.</p>", unsafe_allow_html=True)
+                    if len(expense_cube) > 0:
+                        show_chart('weekday_hour_heatmap', weekday_hour_pivot(expense_cube), key="spending_heatmap_trends_tab")
                 
-                with metric_col1:
-                    total_countries = len(country_metrics_filtered)
-                    st.markdown(f"""
+                    # Top Merchants
+                    st.markdown("### Top Merchants")
+                    st.markdown("<p style='font-size: 0.75rem; color: #a0a0a0; margin-bottom: 0.5rem; margin-top: 0.1rem;'>See which merchants and locations account for most of your spending.</p>", unsafe_allow_html=True)
+                    show_chart('top_merchants', view['top_merchants'], key="top_merchants")
+        
+    with tab3:
+        if tab3.open:
+            # The country selector reruns only this tab (st.fragment); the filter bar, KPIs and other tabs stay as drawn
+            @traced_fragment('Locations')
+            def locations_tab():
+                st.markdown("## Location-Based Spending Analysis")
+                st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 1rem;'>Explore your spending patterns across different countries and cities with interactive visualizations.</p>", unsafe_allow_html=True)
+            
+                if 'Country' in cube_view.columns and cube_view['Country'].nunique() > 1:
+                    # Without expenses in view (e.g. only income types picked) the sections below stay empty
+                    filtered_expense_cube, country_metrics_filtered = expense_cube, expense_cube.iloc[:0]
+                    if len(expense_cube) > 0:
+                        metrics = country_metrics(expense_cube)
+                    
+                        # Interactive Country Selector
+                        st.markdown("### Interactive Country Explorer")
+                        selected_countries = st.multiselect(
+                            "Select countries to analyze (leave empty for all)",
+                            options=metrics['Country'].tolist(),
+                            default=[],
+                            key="country_selector"
+                        )
+                    
+                        if selected_countries:
+                            filtered_expense_cube = expense_cube[expense_cube['Country'].isin(selected_countries)]
+                            country_metrics_filtered = metrics[metrics['Country'].isin(selected_countries)]
+                        else:
+                            filtered_expense_cube = expense_cube
+                            country_metrics_filtered = metrics
+                    
+                        # Key Metrics
+                        metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+                    
+                        with metric_col1:
+                            total_countries = len(country_metrics_filtered)
+                            st.markdown(f"""
                     <div class="metric-card" style="border-left: 4px solid #00f5ff;">
                         <div class="metric-label">Countries</div>
                         <div class="metric-value">{total_countries}</div>
                     </div>
                     """, unsafe_allow_html=True)
-                
-                with metric_col2:
-                    top_country = country_metrics_filtered.iloc[0]['Country'] if len(country_metrics_filtered) > 0 else 'N/A'
-                    st.markdown(f"""
+                    
+                        with metric_col2:
+                            top_country = country_metrics_filtered.iloc[0]['Country'] if len(country_metrics_filtered) > 0 else 'N/A'
+                            st.markdown(f"""
                     <div class="metric-card" style="border-left: 4px solid #00f5ff;">
                         <div class="metric-label">Top Country</div>
                         <div class="metric-value" style="font-size: 1.5rem;">{top_country}</div>
                     </div>
                     """, unsafe_allow_html=True)
-                
-                with metric_col3:
-                    top_spending = country_metrics_filtered.iloc[0]['Total_Spending'] if len(country_metrics_filtered) > 0 else 0
-                    st.markdown(f"""
+                    
+                        with metric_col3:
+                            top_spending = country_metrics_filtered.iloc[0]['Total_Spending'] if len(country_metrics_filtered) > 0 else 0
+                            st.markdown(f"""
                     <div class="metric-card" style="border-left: 4px solid #ff00ff;">
                         <div class="metric-label">Highest Spending</div>
                         <div class="metric-value">€{top_spending:,.2f}</div>
                     </div>
                     """, unsafe_allow_html=True)
-                
-                with metric_col4:
-                    total_spending_filtered = filtered_expenses['Amount_Abs'].sum() if len(filtered_expenses) > 0 else 0
-                    st.markdown(f"""
+                    
+                        with metric_col4:
+                            total_spending_filtered = filtered_expense_cube['Amount_Abs'].sum() if len(filtered_expense_cube) > 0 else 0
+                            st.markdown(f"""
                     <div class="metric-card" style="border-left: 4px solid #ff00ff;">
                         <div class="metric-label">Total Selected</div>
                         <div class="metric-value">€{total_spending_filtered:,.2f}</div>
                     </div>
                     """, unsafe_allow_html=True)
-            
-            # World Map Visualization - Keep the cool map!
-            st.markdown("### 🌍 Interactive World Map")
-            st.markdown("<p style='font-size: 0.75rem; color: #a0a0a0; margin-bottom: 0.5rem;'>Click on countries to see detailed spending information. Hover for more details.</p>", unsafe_allow_html=True)
-            if len(filtered_expenses) > 0 and 'Country' in filtered_expenses.columns:
-                country_spending_map = filtered_expenses.groupby('Country')['Amount_Abs'].sum().reset_index()
-                country_spending_map.columns = ['Country', 'Spending']
                 
-                # Country name to ISO code mapping (common countries)
-                country_to_iso = {
-                    'France': 'FRA',
-                    'United States': 'USA',
-                    'United Kingdom': 'GBR',
-                    'Germany': 'DEU',
-                    'Spain': 'ESP',
-                    'Italy': 'ITA',
-                    'Netherlands': 'NLD',
-                    'Belgium': 'BEL',
-                    'Switzerland': 'CHE',
-                    'Portugal': 'PRT',
-                    'Austria': 'AUT',
-                    'Poland': 'POL',
-                    'Sweden': 'SWE',
-                    'Denmark': 'DNK',
-                    'Norway': 'NOR',
-                    'Finland': 'FIN',
-                    'Ireland': 'IRL',
-                    'Greece': 'GRC',
-                    'Czech Republic': 'CZE',
-                    'Romania': 'ROU',
-                    'Hungary': 'HUN',
-                    'Canada': 'CAN',
-                    'Australia': 'AUS',
-                    'Japan': 'JPN',
-                    'China': 'CHN',
-                    'India': 'IND',
-                    'Brazil': 'BRA',
-                    'Mexico': 'MEX',
-                    'Argentina': 'ARG',
-                    'South Korea': 'KOR',
-                    'Singapore': 'SGP',
-                    'Thailand': 'THA',
-                    'Indonesia': 'IDN',
-                    'Malaysia': 'MYS',
-                    'Philippines': 'PHL',
-                    'Vietnam': 'VNM',
-                    'New Zealand': 'NZL',
-                    'South Africa': 'ZAF',
-                    'Turkey': 'TUR',
-                    'Israel': 'ISR',
-                    'United Arab Emirates': 'ARE',
-                    'Saudi Arabia': 'SAU',
-                    'Egypt': 'EGY',
-                    'Morocco': 'MAR',
-                    'Tunisia': 'TUN',
-                    'Algeria': 'DZA',
-                    'Russia': 'RUS',
-                    'Ukraine': 'UKR',
-                    'Croatia': 'HRV',
-                    'Serbia': 'SRB',
-                    'Bulgaria': 'BGR',
-                    'Slovakia': 'SVK',
-                    'Slovenia': 'SVN',
-                    'Estonia': 'EST',
-                    'Latvia': 'LVA',
-                    'Lithuania': 'LTU',
-                    'Luxembourg': 'LUX',
-                    'Iceland': 'ISL',
-                    'Cyprus': 'CYP',
-                    'Malta': 'MLT'
-                }
-                
-                # Add ISO codes
-                country_spending_map['ISO'] = country_spending_map['Country'].map(country_to_iso)
-                country_spending_map = country_spending_map.dropna(subset=['ISO'])
+                    # World Map Visualization - Keep the cool map!
+                    st.markdown("### 🌍 Interactive World Map")
+                    st.markdown("<p style='font-size: 0.75rem; color: #a0a0a0; margin-bottom: 0.5rem;'>Click on countries to see detailed spending information. Hover for more details.</p>", unsafe_allow_html=True)
+                    if len(filtered_expense_cube) > 0:
+                        # Countries without an ISO code cannot be placed on the map
+                        spending_map = country_spending_map(filtered_expense_cube)
+                    
+                        if len(spending_map) > 0:
+                            show_chart('world_map', spending_map, key="world_map")
+                        else:
+                            st.info("Country data not available in ISO format for world map visualization.")
                 
-                if len(country_spending_map) > 0:
-                    fig_map = px.choropleth(
-                        country_spending_map,
-                        locations='ISO',
-                        color='Spending',
-                        hover_name='Country',
-                        hover_data={'ISO': False, 'Spending': ':,.2f'},
-                        color_continuous_scale='Plasma',
-                        title="",
-                        labels={'Spending': 'Spending (€)'}
-                    )
-                    fig_map.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='#ffffff',
-                        geo=dict(
-                            bgcolor='rgba(0,0,0,0)',
-                            lakecolor='rgba(0,0,0,0)',
-                            landcolor='rgba(255,255,255,0.1)',
-                            showlakes=False,
-                            showland=True,
-                            showocean=True,
-                            oceancolor='rgba(0,0,0,0.3)',
-                            projection_type='natural earth'
-                        ),
-                        height=350,
-                        margin=dict(l=0, r=0, t=0, b=0)
-                    )
-                    fig_map.update_geos(
-                        showcountries=True,
-                        countrycolor='rgba(255,255,255,0.3)',
-                        showcoastlines=True,
-                        coastlinecolor='rgba(255,255,255,0.2)'
-                    )
-                    st.plotly_chart(fig_map, use_container_width=True, key="world_map")
-                else:
-                    st.info("Country data not available in ISO format for world map visualization.")
-            
-            # Cool Visualizations Section
-            # Cool Visualizations Section
-
-            # =======================
-            # Row 1: Bubble + Sunburst
-            # =======================
-            col1, col2 = st.columns(2)
-
-            with col1:
-                st.markdown("#### Bubble Chart: Country Comparison")
-                st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>Bubble size = transaction count, Color = total spending</p>", unsafe_allow_html=True)
-                if len(country_metrics_filtered) > 0:
-                    fig_bubble = px.scatter(
-                        country_metrics_filtered,
-                        x='Avg_Transaction',
-                        y='Total_Spending',
-                        size='Transaction_Count',
-                        color='Total_Spending',
-                        hover_name='Country',
-                        hover_data=['Avg_Transaction', 'Transaction_Count'],
-                        color_continuous_scale='Plasma',
-                        title="",
-                        labels={'Avg_Transaction': 'Avg Transaction (€)', 'Total_Spending': 'Total Spending (€)'}
-                    )
-                    fig_bubble.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='#ffffff',
-                        height=400,
-                        margin=dict(l=0, r=0, t=0, b=0),
-                        xaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
-                        yaxis=dict(gridcolor='rgba(255,255,255,0.1)')
-                    )
-                    st.plotly_chart(fig_bubble, use_container_width=True, key="country_bubble")
-
-
-            with col2:
-                if 'City' in filtered_expenses.columns and filtered_expenses['City'].nunique() > 1:
-                    st.markdown("#### Sunburst: Country → City → Category Hierarchy")
-                    st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>Interactive hierarchy: Click segments to explore deeper levels.</p>", unsafe_allow_html=True)
-                    if len(filtered_expenses) > 0:
-                        hierarchy_data = filtered_expenses.groupby(['Country', 'City', 'Merchant_Category'])['Amount_Abs'].sum().reset_index()
-                        hierarchy_data = hierarchy_data.sort_values('Amount_Abs', ascending=False).head(100)
-
-                        fig_sunburst = px.sunburst(
-                            hierarchy_data,
-                            path=['Country', 'City', 'Merchant_Category'],
-                            values='Amount_Abs',
-                            color='Amount_Abs',
-                            color_continuous_scale='Plasma',
-                            title=""
-                        )
-                        fig_sunburst.update_layout(
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            font_color='#ffffff',
-                            height=400,
-                            margin=dict(l=0, r=0, t=0, b=0)
-                        )
-                        st.plotly_chart(fig_sunburst, use_container_width=True, key="sunburst_hierarchy")
+                    # Cool Visualizations Section
+                    # Cool Visualizations Section
 
+                    # =======================
+                    # Row 1: Bubble + Sunburst
+                    # =======================
+                    col1, col2 = st.columns(2)
 
-            # =======================
-            # Row 2: Trends + Heatmap
-            # =======================
-            st.markdown("### 📈 Country Comparison & Trends")
+                    with col1:
+                        st.markdown("#### Bubble Chart: Country Comparison")
+                        st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>Bubble size = transaction count, Color = total spending</p>", unsafe_allow_html=True)
+                        if len(country_metrics_filtered) > 0:
+                            show_chart('country_bubble', country_metrics_filtered, key="country_bubble")
 
-            col_trend1, col_trend2 = st.columns(2)
 
-            with col_trend1:
-                st.markdown("#### Monthly Trends by Country")
-                st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>Track spending evolution over time. Click legend to toggle countries.</p>", unsafe_allow_html=True)
+                    with col2:
+                        if filtered_expense_cube['City'].nunique() > 1:
+                            st.markdown("#### Sunburst: Country → City → Category Hierarchy")
+                            st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>Interactive hierarchy: Click segments to explore deeper levels.</p>", unsafe_allow_html=True)
+                            if len(filtered_expense_cube) > 0:
+                                show_chart('sunburst_hierarchy', location_hierarchy(filtered_expense_cube), key="sunburst_hierarchy")
 
-                if len(filtered_expenses) > 0 and 'Date' in filtered_expenses.columns:
-                    expenses_trend = filtered_expenses.copy()
-                    expenses_trend['YearMonth'] = expenses_trend['Date'].dt.to_period('M').astype(str)
-                    country_monthly = expenses_trend.groupby(['YearMonth', 'Country'])['Amount_Abs'].sum().reset_index()
 
-                    if len(country_monthly) > 0:
-                        fig_trend = px.line(
-                            country_monthly,
-                            x='YearMonth',
-                            y='Amount_Abs',
-                            color='Country',
-                            markers=True,
-                            color_discrete_sequence=vibrant_colors
-                        )
-                        fig_trend.update_traces(line=dict(width=3), marker=dict(size=8))
-                        fig_trend.update_layout(
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            font_color='#ffffff',
-                            hovermode='x unified',
-                            height=400,
-                            margin=dict(l=0, r=0, t=0, b=0),
-                            xaxis=dict(gridcolor='rgba(255,255,255,0.1)', tickangle=-45),
-                            yaxis=dict(gridcolor='rgba(255,255,255,0.1)'),
-                            legend=dict(font=dict(color='#ffffff', size=11), bgcolor='rgba(0,0,0,0.5)')
-                        )
-                        st.plotly_chart(fig_trend, use_container_width=True, key="country_trends")
+                    # =======================
+                    # Row 2: Trends + Heatmap
+                    # =======================
+                    st.markdown("### 📈 Country Comparison & Trends")
 
+                    col_trend1, col_trend2 = st.columns(2)
 
-            with col_trend2:
-                st.markdown("#### Category Heatmap by Country")
-                st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>See which categories dominate in each country.</p>", unsafe_allow_html=True)
+                    with col_trend1:
+                        st.markdown("#### Monthly Trends by Country")
+                        st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>Track spending evolution over time. Click legend to toggle countries.</p>", unsafe_allow_html=True)
 
-                if len(filtered_expenses) > 0:
-                    heatmap_data = filtered_expenses.groupby(['Country', 'Merchant_Category'])['Amount_Abs'].sum().reset_index()
-                    if len(heatmap_data) > 0:
-                        heatmap_pivot = heatmap_data.pivot(index='Merchant_Category', columns='Country', values='Amount_Abs').fillna(0)
+                        if len(filtered_expense_cube) > 0:
+                            country_monthly = rollup(filtered_expense_cube, ['MonthKey', 'Country'])
 
-                        fig_heatmap = px.imshow(
-                            heatmap_pivot,
-                            labels=dict(x="Country", y="Category", color="Spending (€)"),
-                            color_continuous_scale='Plasma',
-                            aspect="auto",
-                            text_auto=True
-                        )
-                        fig_heatmap.update_layout(
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            font_color='#ffffff',
-                            height=400,
-                            margin=dict(l=0, r=0, t=0, b=0)
-                        )
-                        st.plotly_chart(fig_heatmap, use_container_width=True, key="heatmap_country_category")
-
-
-            # =======================
-            # Row 3: City Bar + Area
-            # =======================
-            col_city, col_area = st.columns(2)
-
-            with col_city:
-                st.markdown("#### City Spending Comparison")
-                st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>Horizontal bar chart for easy comparison.</p>", unsafe_allow_html=True)
-
-                city_spending_bar = filtered_expenses.groupby('City')['Amount_Abs'].sum().reset_index()
-                city_spending_bar = city_spending_bar.sort_values('Amount_Abs', ascending=True).tail(10)
-
-                if len(city_spending_bar) > 0:
-                    fig_city_bar = px.bar(
-                        city_spending_bar,
-                        x='Amount_Abs',
-                        y='City',
-                        orientation='h',
-                        color='Amount_Abs',
-                        color_continuous_scale='Plasma',
-                        text='Amount_Abs'
-                    )
-                    fig_city_bar.update_traces(
-                        texttemplate='€%{text:,.0f}',
-                        textposition='outside',
-                        textfont=dict(color='#ffffff', size=10)
-                    )
-                    fig_city_bar.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='#ffffff',
-                        height=400,
-                        margin=dict(l=0, r=0, t=30, b=0),
-                        showlegend=False
-                    )
-                    st.plotly_chart(fig_city_bar, use_container_width=True)
+                            if len(country_monthly) > 0:
+                                show_chart('country_trends', country_monthly, key="country_trends")
 
 
-            with col_area:
-                st.markdown("#### Stacked Area: Cumulative Spending by Country")
-                st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>See how spending accumulates over time across countries.</p>", unsafe_allow_html=True)
+                    with col_trend2:
+                        st.markdown("#### Category Heatmap by Country")
+                        st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>See which categories dominate in each country.</p>", unsafe_allow_html=True)
 
-                if len(filtered_expenses) > 0 and 'Date' in filtered_expenses.columns:
-                    expenses_area = filtered_expenses.copy()
-                    expenses_area['YearMonth'] = expenses_area['Date'].dt.to_period('M').astype(str)
-                    country_area = expenses_area.groupby(['YearMonth', 'Country'])['Amount_Abs'].sum().reset_index()
+                        if len(filtered_expense_cube) > 0:
+                            show_chart('country_category_heatmap', country_category_pivot(filtered_expense_cube),
+                                       key="heatmap_country_category")
 
-                    if len(country_area) > 0:
-                        fig_area = px.area(
-                            country_area,
-                            x='YearMonth',
-                            y='Amount_Abs',
-                            color='Country',
-                            color_discrete_sequence=vibrant_colors
-                        )
-                        fig_area.update_layout(
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            font_color='#ffffff',
-                            height=400,
-                            margin=dict(l=0, r=0, t=30, b=0),
-                            xaxis=dict(tickangle=-45)
-                        )
-                        st.plotly_chart(fig_area, use_container_width=True)
 
-            
-            
-           
+                    # =======================
+                    # Row 3: City Bar + Area
+                    # =======================
+                    col_city, col_area = st.columns(2)
+
+                    with col_city:
+                        st.markdown("#### City Spending Comparison")
+                        st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>Horizontal bar chart for easy comparison.</p>", unsafe_allow_html=True)
+
+                        city_spending_bar = top_cities(filtered_expense_cube)
+
+                        if len(city_spending_bar) > 0:
+                            show_chart('city_bar', city_spending_bar)
+
+
+                    with col_area:
+                        st.markdown("#### Stacked Area: Cumulative Spending by Country")
+                        st.markdown("<p style='font-size: 0.7rem; color: #a0a0a0; margin-bottom: 0.5rem;'>See how spending accumulates over time across countries.</p>", unsafe_allow_html=True)
+
+                        if len(filtered_expense_cube) > 0:
+                            country_area = rollup(filtered_expense_cube, ['MonthKey', 'Country'])
+
+                            if len(country_area) > 0:
+                                show_chart('country_stacked_area', country_area)
+            locations_tab()
+        
+                    
+               
                 
-    
+                
+
     with tab4:
-        st.markdown("## Transaction Details")
-        
-        st.markdown("""
+        if tab4.open:
+            rows, row_level = load_row_level()
+            df, filtered_df = rows['df'], row_level['filtered_df']
+
+            # Search, sorting and paging rerun only this tab
+            @traced_fragment('Transactions')
+            def transactions_tab():
+                st.markdown("## Transaction Details")
+            
+                st.markdown("""
         <style>
         div[data-testid="stTextInput"] label {
             color: white !important;
         }
         </style>
         """, unsafe_allow_html=True)
-        
-        search_term = st.text_input("Search transactions", placeholder="Search by merchant, category, or description...")
-        
-        display_df = filtered_df.copy()
-        if search_term and len(display_df) > 0:
-            if 'Description_Anon' in display_df.columns and 'Merchant_Category' in display_df.columns:
-                display_df = display_df[
-                    display_df['Description_Anon'].str.contains(search_term, case=False, na=False) |
-                    display_df['Merchant_Category'].str.contains(search_term, case=False, na=False)
-                ]
-        
-        if len(display_df) > 0:
-            required_cols = ['Date', 'Type', 'Merchant_Category', 'Description_Anon', 'Amount', 'Balance']
-            available_cols = [col for col in required_cols if col in display_df.columns]
-            
-            if len(available_cols) > 0:
-                display_df = display_df[available_cols].copy()
-            if 'Date' in display_df.columns:
-                display_df = display_df.sort_values('Date', ascending=False)
-                display_df['Date'] = pd.to_datetime(display_df['Date']).dt.strftime('%Y-%m-%d')
-            if 'Amount' in display_df.columns:
-                display_df['Amount'] = display_df['Amount'].apply(lambda x: f"€{float(x):,.2f}" if pd.notna(x) else "€0.00")
-            if 'Balance' in display_df.columns:
-                display_df['Balance'] = display_df['Balance'].apply(lambda x: f"€{float(x):,.2f}" if pd.notna(x) else "€0.00")
-            
-            st.dataframe(
-                display_df,
-                use_container_width=True,
-                hide_index=True,
-                height=600
-            )
-            
-            csv = display_df.to_csv(index=False)
-            st.markdown("""
+            
+                search_term = st.text_input("Search transactions", placeholder="Search by merchant, description, category, country, or city...", key="transaction_search",
+                                            on_change=reset_explorer_page)
+            
+                # Row ids of the filtered period; a search resolves through the token index and is then
+                # restricted to the active filters, so its cost follows the number of matches
+                row_ids = filtered_df.index.to_numpy()
+                if search_term and len(row_ids) > 0:
+                    with span('search') as search_span:
+                        match_ids = rows['search_index'].search(search_term)
+                        if match_ids is not None and row_level['row_ids'] is not None:
+                            row_ids = intersect_sorted(match_ids, row_level['row_ids'])
+                        elif match_ids is not None:
+                            row_ids = filter_row_ids(df, match_ids, start_date, end_date, selected_category)
+                        elif 'Description_Anon' in filtered_df.columns and 'Merchant_Category' in filtered_df.columns:
+                            # No word characters in the query (e.g. "&") - fall back to a substring scan
+                            row_ids = filtered_df.index[
+                                filtered_df['Description_Anon'].str.contains(search_term, case=False, na=False, regex=False) |
+                                filtered_df['Merchant_Category'].astype(str).str.contains(search_term, case=False, na=False, regex=False)
+                            ].to_numpy()
+                        search_span.rows = len(row_ids)
+            
+                if len(row_ids) > 0:
+                    required_cols = ['Date', 'Type', 'Merchant_Category', 'Description_Anon', 'Amount', 'Balance']
+                    available_cols = [col for col in required_cols if col in df.columns]
+                
+                    # Sorting and paging run server-side over row ids; only the current page is sent to the browser
+                    ctrl_col1, ctrl_col2, ctrl_col3 = st.columns([2, 1, 1])
+                    with ctrl_col1:
+                        sort_col = st.selectbox("Sort by", available_cols, key="explorer_sort_col",
+                                                format_func=lambda col: col.replace('_', ' '))
+                    with ctrl_col2:
+                        sort_dir = st.selectbox("Order", ['Descending', 'Ascending'], key="explorer_sort_dir")
+                    with ctrl_col3:
+                        page_size = st.selectbox("Rows per page", EXPLORER_PAGE_SIZES, index=2, key="explorer_page_size")
+                
+                    # Row ids of the search result, arranged by the cached sort order of the full table
+                    with span('explorer_sort', cache='load_sort_order') as sort_span:
+                        order, rank = load_sort_order(df, rows['file_mtime'], sort_col)
+                        row_order = ordered_rows(order, row_ids, len(df), ascending=sort_dir == 'Ascending', rank=rank)
+                        sort_span.rows = len(row_order)
+                    total_rows = len(row_order)
+                    total_pages = max(1, -(-total_rows // page_size))
+                    if st.session_state.get('explorer_page', 1) > total_pages:
+                        st.session_state['explorer_page'] = total_pages
+                    page = st.number_input(f"Page (of {total_pages:,})", min_value=1, max_value=total_pages, step=1,
+                                           key="explorer_page")
+                    page_start = (page - 1) * page_size
+                    page_ids = row_order[page_start:page_start + page_size]
+                
+                    # Amount and Balance stay numeric (the grid sorts them as numbers); only the page's display
+                    # values are formatted, with missing ones as a dash
+                    page_df = df.iloc[page_ids][available_cols]
+                    money_cols = [col for col in ['Amount', 'Balance'] if col in page_df.columns]
+                
+                    st.dataframe(
+                        page_df.style.format(format_euro, subset=money_cols, na_rep='—'),
+                        use_container_width=True,
+                        hide_index=True,
+                        height=600,
+                        column_config={
+                            'Date': st.column_config.DateColumn('Date', format='YYYY-MM-DD'),
+                            'Amount': st.column_config.NumberColumn('Amount'),
+                            'Balance': st.column_config.NumberColumn('Balance'),
+                        }
+                    )
+                    st.markdown(f"<p style='font-size: 0.8rem; color: #a0a0a0; margin-top: 0.1rem;'>Showing {page_start + 1:,}–{page_start + len(page_ids):,} of {total_rows:,} transactions</p>", unsafe_allow_html=True)
+                
+                    st.markdown("""
             <style>
             div[data-testid="stDownloadButton"] button {
                 color: black !important;
@@ -2431,18 +1946,28 @@ if df is not None:
             }
             </style>
             """, unsafe_allow_html=True)
-            st.download_button(
-                label="Download Filtered Data",
-                data=csv,
-                file_name=f"transactions_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
-        else:
-            st.info("No transactions found matching your search criteria.")
-    
+                    # The CSV is only built when the download is actually requested
+                    st.download_button(
+                        label="Download Filtered Data",
+                        data=lambda frame=df, ids=row_order, cols=available_cols: frame.iloc[ids][cols].to_csv(
+                            index=False, date_format='%Y-%m-%d', float_format='%.2f'),
+                        file_name=f"transactions_{datetime.now().strftime('%Y%m%d')}.csv",
+                        mime="text/csv"
+                    )
+                else:
+                    st.info("No transactions found matching your search criteria.")
+            transactions_tab()
+        
     with tab5:
-        # Add CSS for white bubbles at the start
-        st.markdown("""
+        if tab5.open:
+            _, row_level = load_row_level()
+            filtered_df, expenses_df, income_df = row_level['filtered_df'], row_level['expenses_df'], row_level['income_df']
+
+            # Chat questions and the Quick Question buttons rerun only this tab
+            @traced_fragment('AI Advisor')
+            def advisor_tab():
+                # Add CSS for white bubbles at the start
+                st.markdown("""
         <style>
         .assistant-bubble {
             background-color: #ffffff !important;
@@ -2460,93 +1985,93 @@ if df is not None:
         }
         </style>
         """, unsafe_allow_html=True)
-        
-        st.markdown("## 🤖 Your AI Financial Advisor")
-        st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 1rem;'>Ask me anything about your financial data! I can help you understand your spending patterns, identify trends, and provide insights.</p>", unsafe_allow_html=True)
-        
-        # API Key setup for Gemini
-        use_ai = False
-        if GEMINI_AVAILABLE:
-            # Check for API key in environment or session state
-            api_key = os.getenv("GEMINI_API_KEY") or st.session_state.get("gemini_api_key", "")
-            
-           
-            if api_key:
-                try:
-                    genai.configure(api_key=api_key)
-                    use_ai = True
-                except Exception as e:
-                    st.warning(f"⚠️ Error configuring Gemini: {e}. Using rule-based responses.")
-        
-        # Initialize chat history
-        if "advisor_messages" not in st.session_state:
-            st.session_state.advisor_messages = []
-        
-        # Display chat history
-        for message in st.session_state.advisor_messages:
-            with st.chat_message(message["role"]):
-                if message["role"] == "assistant":
-                    # Use st.markdown with HTML for white bubble background
-                    import html
-                    import re
-                    content = message["content"]
-                    # Escape HTML first
-                    escaped_content = html.escape(content)
-                    # Convert markdown bold (**text**) to HTML bold
-                    def replace_bold(match):
-                        return f'<strong style="font-weight: bold;">{match.group(1)}</strong>'
-                    formatted_content = re.sub(r'\*\*(.+?)\*\*', replace_bold, escaped_content)
-                    # Replace newlines with <br>
-                    formatted_content = formatted_content.replace('\n', '<br>')
-                    # White bubble background with rounded corners - use class for CSS targeting
-                    bubble_html = f'<div class="assistant-bubble" style="background-color: #ffffff; color: #000000; padding: 1rem 1.5rem; border-radius: 20px; margin: 0.5rem 0; box-shadow: 0 2px 8px rgba(0,0,0,0.15); display: inline-block; max-width: 90%;">{formatted_content}</div>'
-                    st.markdown(bubble_html, unsafe_allow_html=True)
-                else:
-                    st.markdown(message["content"])
-        
-        # Function to prepare financial data context
-        def prepare_financial_context(expenses_df, income_df, monthly_summary):
-            """Prepare a comprehensive financial data summary for AI context"""
-            total_expenses = expenses_df['Amount_Abs'].sum() if len(expenses_df) > 0 else 0
-            total_income = income_df['Amount'].sum() if len(income_df) > 0 else 0
-            net_flow = total_income - total_expenses
-            savings_rate = ((total_income - total_expenses) / total_income * 100) if total_income > 0 else 0
-            
-            context = f"""Financial Data Summary:
+            
+                st.markdown("## 🤖 Your AI Financial Advisor")
+                st.markdown("<p style='font-size: 0.8rem; color: #a0a0a0; margin-bottom: 1rem;'>Ask me anything about your financial data! I can help you understand your spending patterns, identify trends, and provide insights.</p>", unsafe_allow_html=True)
+            
+                # API Key setup for Gemini
+                use_ai = False
+                if GEMINI_AVAILABLE:
+                    # Check for API key in environment or session state
+                    api_key = os.getenv("GEMINI_API_KEY") or st.session_state.get("gemini_api_key", "")
+                
+               
+                    if api_key:
+                        try:
+                            genai.configure(api_key=api_key)
+                            use_ai = True
+                        except Exception as e:
+                            st.warning(f"⚠️ Error configuring Gemini: {e}. Using rule-based responses.")
+            
+                # Initialize chat history
+                if "advisor_messages" not in st.session_state:
+                    st.session_state.advisor_messages = []
+            
+                # Display chat history
+                for message in st.session_state.advisor_messages:
+                    with st.chat_message(message["role"]):
+                        if message["role"] == "assistant":
+                            # Use st.markdown with HTML for white bubble background
+                            import html
+                            import re
+                            content = message["content"]
+                            # Escape HTML first
+                            escaped_content = html.escape(content)
+                            # Convert markdown bold (**text**) to HTML bold
+                            def replace_bold(match):
+                                return f'<strong style="font-weight: bold;">{match.group(1)}</strong>'
+                            formatted_content = re.sub(r'\*\*(.+?)\*\*', replace_bold, escaped_content)
+                            # Replace newlines with <br>
+                            formatted_content = formatted_content.replace('\n', '<br>')
+                            # White bubble background with rounded corners - use class for CSS targeting
+                            bubble_html = f'<div class="assistant-bubble" style="background-color: #ffffff; color: #000000; padding: 1rem 1.5rem; border-radius: 20px; margin: 0.5rem 0; box-shadow: 0 2px 8px rgba(0,0,0,0.15); display: inline-block; max-width: 90%;">{formatted_content}</div>'
+                            st.markdown(bubble_html, unsafe_allow_html=True)
+                        else:
+                            st.markdown(message["content"])
+            
+                # Function to prepare financial data context
+                def prepare_financial_context(expenses_df, income_df, monthly_summary):
+                    """Prepare a comprehensive financial data summary for AI context"""
+                    total_expenses = expenses_df['Amount_Abs'].sum() if len(expenses_df) > 0 else 0
+                    total_income = income_df['Amount'].sum() if len(income_df) > 0 else 0
+                    net_flow = total_income - total_expenses
+                    savings_rate = ((total_income - total_expenses) / total_income * 100) if total_income > 0 else 0
+                
+                    context = f"""Financial Data Summary:
 - Total Expenses: €{total_expenses:,.2f} ({len(expenses_df)} transactions)
 - Total Income: €{total_income:,.2f} ({len(income_df)} transactions)
 - Net Flow: €{net_flow:,.2f}
 - Savings Rate: {savings_rate:.1f}%
 
 """
-            
-            # Top spending categories
-            if len(expenses_df) > 0:
-                category_spending = expenses_df.groupby('Merchant_Category')['Amount_Abs'].sum().sort_values(ascending=False)
-                context += "Top Spending Categories:\n"
-                for i, (cat, amt) in enumerate(category_spending.head(10).items(), 1):
-                    context += f"{i}. {cat}: €{amt:,.2f}\n"
-                context += "\n"
-            
-            # Monthly summary
-            if len(monthly_summary) > 0:
-                context += "Monthly Breakdown:\n"
-                for _, row in monthly_summary.iterrows():
-                    context += f"- {row['Month']}: Income €{row['Income']:,.2f}, Expenses €{row['Expenses']:,.2f}, Net €{row['Net']:,.2f}\n"
-                context += "\n"
-            
-            return context
-        
-        # Function to analyze data and generate response (AI-powered or rule-based)
-        def analyze_financial_question(question, filtered_df, expenses_df, income_df, monthly_summary):
-            # Try AI first if available
-            if use_ai and GEMINI_AVAILABLE:
-                try:
-                    # Prepare financial context
-                    context = prepare_financial_context(expenses_df, income_df, monthly_summary)
-                    
-                    # Create prompt for Gemini
-                    prompt = f"""You are a helpful financial advisor analyzing a user's financial data. 
+                
+                    # Top spending categories
+                    if len(expenses_df) > 0:
+                        category_spending = expenses_df.groupby('Merchant_Category', observed=True)['Amount_Abs'].sum().sort_values(ascending=False)
+                        context += "Top Spending Categories:\n"
+                        for i, (cat, amt) in enumerate(category_spending.head(10).items(), 1):
+                            context += f"{i}. {cat}: €{amt:,.2f}\n"
+                        context += "\n"
+                
+                    # Monthly summary
+                    if len(monthly_summary) > 0:
+                        context += "Monthly Breakdown:\n"
+                        for _, row in monthly_summary.iterrows():
+                            context += f"- {row['Month']}: Income €{row['Income']:,.2f}, Expenses €{row['Expenses']:,.2f}, Net €{row['Net']:,.2f}\n"
+                        context += "\n"
+                
+                    return context
+            
+                # Function to analyze data and generate response (AI-powered or rule-based)
+                def analyze_financial_question(question, filtered_df, expenses_df, income_df, monthly_summary):
+                    # Try AI first if available
+                    if use_ai and GEMINI_AVAILABLE:
+                        try:
+                            # Prepare financial context
+                            context = prepare_financial_context(expenses_df, income_df, monthly_summary)
+                        
+                            # Create prompt for Gemini
+                            prompt = f"""You are a helpful financial advisor analyzing a user's financial data. 
 Answer their question based on the following financial data summary. Be concise, friendly, and use markdown formatting for numbers and emphasis.
 
 Financial Data:
@@ -2555,97 +2080,97 @@ Financial Data:
 User Question: {question}
 
 Provide a clear, helpful answer based on the data above. Use **bold** for important numbers and insights."""
-                    
-                    # Generate response using Gemini
-                    model = genai.GenerativeModel('gemini-pro')
-                    response = model.generate_content(prompt)
-                    return response.text
-                    
-                except Exception as e:
-                    # Fall back to rule-based if AI fails
-                    st.warning(f"AI error: {e}. Using rule-based response.")
-            
-            # Rule-based fallback (original logic)
-            question_lower = question.lower()
-            
-            # Calculate key metrics
-            total_expenses = expenses_df['Amount_Abs'].sum() if len(expenses_df) > 0 else 0
-            total_income = income_df['Amount'].sum() if len(income_df) > 0 else 0
-            avg_expense = expenses_df['Amount_Abs'].mean() if len(expenses_df) > 0 else 0
-            largest_expense = expenses_df['Amount_Abs'].max() if len(expenses_df) > 0 else 0
-            
-            # Category analysis
-            if len(expenses_df) > 0:
-                category_spending = expenses_df.groupby('Merchant_Category')['Amount_Abs'].sum().sort_values(ascending=False)
-                top_category = category_spending.index[0] if len(category_spending) > 0 else "N/A"
-                top_category_amount = category_spending.iloc[0] if len(category_spending) > 0 else 0
-            else:
-                top_category = "N/A"
-                top_category_amount = 0
-            
-            # Monthly analysis
-            if len(monthly_summary) > 0:
-                best_month = monthly_summary.loc[monthly_summary['Net'].idxmax(), 'Month'] if len(monthly_summary) > 0 else "N/A"
-                worst_month = monthly_summary.loc[monthly_summary['Net'].idxmin(), 'Month'] if len(monthly_summary) > 0 else "N/A"
-            else:
-                best_month = "N/A"
-                worst_month = "N/A"
-            
-            # Answer generation based on question keywords
-            if any(word in question_lower for word in ["spend", "expense", "cost", "money"]):
-                if "category" in question_lower or "where" in question_lower:
-                    response = f"Based on your data, you've spent **€{total_expenses:,.2f}** in the selected period. "
-                    if top_category != "N/A":
-                        response += f"Your top spending category is **{top_category}** with **€{top_category_amount:,.2f}**. "
-                    if len(category_spending) > 1:
-                        response += f"Here are your top 5 categories:\n"
-                        for i, (cat, amt) in enumerate(category_spending.head(5).items(), 1):
-                            response += f"{i}. {cat}: €{amt:,.2f}\n"
-                elif "average" in question_lower or "avg" in question_lower:
-                    response = f"Your average transaction amount is **€{avg_expense:,.2f}**. "
-                    response += f"You have **{len(expenses_df)}** expense transactions in the selected period."
-                elif "largest" in question_lower or "biggest" in question_lower or "most" in question_lower:
-                    response = f"Your largest single expense is **€{largest_expense:,.2f}**. "
+                        
+                            # Generate response using Gemini
+                            model = genai.GenerativeModel('gemini-pro')
+                            response = model.generate_content(prompt)
+                            return response.text
+                        
+                        except Exception as e:
+                            # Fall back to rule-based if AI fails
+                            st.warning(f"AI error: {e}. Using rule-based response.")
+                
+                    # Rule-based fallback (original logic)
+                    question_lower = question.lower()
+                
+                    # Calculate key metrics
+                    total_expenses = expenses_df['Amount_Abs'].sum() if len(expenses_df) > 0 else 0
+                    total_income = income_df['Amount'].sum() if len(income_df) > 0 else 0
+                    avg_expense = expenses_df['Amount_Abs'].mean() if len(expenses_df) > 0 else 0
+                    largest_expense = expenses_df['Amount_Abs'].max() if len(expenses_df) > 0 else 0
+                
+                    # Category analysis
                     if len(expenses_df) > 0:
-                        largest_row = expenses_df.loc[expenses_df['Amount_Abs'].idxmax()]
-                        response += f"This was in the **{largest_row.get('Merchant_Category', 'Unknown')}** category."
-                else:
-                    response = f"You've spent a total of **€{total_expenses:,.2f}** in the selected period. "
-                    response += f"This is based on **{len(expenses_df)}** expense transactions."
-            
-            elif any(word in question_lower for word in ["income", "earn", "revenue"]):
-                response = f"Your total income in the selected period is **€{total_income:,.2f}**. "
-                response += f"This comes from **{len(income_df)}** income transactions."
-            
-            elif any(word in question_lower for word in ["save", "saving", "net", "balance"]):
-                net_flow = total_income - total_expenses
-                savings_rate = ((total_income - total_expenses) / total_income * 100) if total_income > 0 else 0
-                response = f"Your net flow (income minus expenses) is **€{net_flow:,.2f}**. "
-                response += f"Your savings rate is **{savings_rate:.1f}%**. "
-                if net_flow > 0:
-                    response += "Great job! You're saving money. 💰"
-                else:
-                    response += "You're spending more than you earn. Consider reviewing your expenses. 💡"
-            
-            elif any(word in question_lower for word in ["month", "monthly", "best", "worst"]):
-                if best_month != "N/A" and worst_month != "N/A":
-                    best_net = monthly_summary.loc[monthly_summary['Month'] == best_month, 'Net'].iloc[0]
-                    worst_net = monthly_summary.loc[monthly_summary['Month'] == worst_month, 'Net'].iloc[0]
-                    response = f"Your best month was **{best_month}** with a net of **€{best_net:,.2f}**. "
-                    response += f"Your worst month was **{worst_month}** with a net of **€{worst_net:,.2f}**. "
-                else:
-                    response = "I need more monthly data to compare months. Try adjusting your date range filter."
-            
-            elif any(word in question_lower for word in ["trend", "pattern", "over time", "change"]):
-                if len(monthly_summary) > 0:
-                    response = f"Looking at your monthly trends:\n"
-                    for _, row in monthly_summary.tail(6).iterrows():
-                        response += f"- **{row['Month']}**: Income €{row['Income']:,.2f}, Expenses €{row['Expenses']:,.2f}, Net €{row['Net']:,.2f}\n"
-                else:
-                    response = "I need more data to analyze trends. Try adjusting your date range filter."
-            
-            elif any(word in question_lower for word in ["help", "what can", "how", "advice", "recommend"]):
-                response = """I can help you understand:
+                        category_spending = expenses_df.groupby('Merchant_Category', observed=True)['Amount_Abs'].sum().sort_values(ascending=False)
+                        top_category = category_spending.index[0] if len(category_spending) > 0 else "N/A"
+                        top_category_amount = category_spending.iloc[0] if len(category_spending) > 0 else 0
+                    else:
+                        top_category = "N/A"
+                        top_category_amount = 0
+                
+                    # Monthly analysis
+                    if len(monthly_summary) > 0:
+                        best_month = monthly_summary.loc[monthly_summary['Net'].idxmax(), 'Month'] if len(monthly_summary) > 0 else "N/A"
+                        worst_month = monthly_summary.loc[monthly_summary['Net'].idxmin(), 'Month'] if len(monthly_summary) > 0 else "N/A"
+                    else:
+                        best_month = "N/A"
+                        worst_month = "N/A"
+                
+                    # Answer generation based on question keywords
+                    if any(word in question_lower for word in ["spend", "expense", "cost", "money"]):
+                        if "category" in question_lower or "where" in question_lower:
+                            response = f"Based on your data, you've spent **€{total_expenses:,.2f}** in the selected period. "
+                            if top_category != "N/A":
+                                response += f"Your top spending category is **{top_category}** with **€{top_category_amount:,.2f}**. "
+                            if len(category_spending) > 1:
+                                response += f"Here are your top 5 categories:\n"
+                                for i, (cat, amt) in enumerate(category_spending.head(5).items(), 1):
+                                    response += f"{i}. {cat}: €{amt:,.2f}\n"
+                        elif "average" in question_lower or "avg" in question_lower:
+                            response = f"Your average transaction amount is **€{avg_expense:,.2f}**. "
+                            response += f"You have **{len(expenses_df)}** expense transactions in the selected period."
+                        elif "largest" in question_lower or "biggest" in question_lower or "most" in question_lower:
+                            response = f"Your largest single expense is **€{largest_expense:,.2f}**. "
+                            if len(expenses_df) > 0:
+                                largest_row = expenses_df.loc[expenses_df['Amount_Abs'].idxmax()]
+                                response += f"This was in the **{largest_row.get('Merchant_Category', 'Unknown')}** category."
+                        else:
+                            response = f"You've spent a total of **€{total_expenses:,.2f}** in the selected period. "
+                            response += f"This is based on **{len(expenses_df)}** expense transactions."
+                
+                    elif any(word in question_lower for word in ["income", "earn", "revenue"]):
+                        response = f"Your total income in the selected period is **€{total_income:,.2f}**. "
+                        response += f"This comes from **{len(income_df)}** income transactions."
+                
+                    elif any(word in question_lower for word in ["save", "saving", "net", "balance"]):
+                        net_flow = total_income - total_expenses
+                        savings_rate = ((total_income - total_expenses) / total_income * 100) if total_income > 0 else 0
+                        response = f"Your net flow (income minus expenses) is **€{net_flow:,.2f}**. "
+                        response += f"Your savings rate is **{savings_rate:.1f}%**. "
+                        if net_flow > 0:
+                            response += "Great job! You're saving money. 💰"
+                        else:
+                            response += "You're spending more than you earn. Consider reviewing your expenses. 💡"
+                
+                    elif any(word in question_lower for word in ["month", "monthly", "best", "worst"]):
+                        if best_month != "N/A" and worst_month != "N/A":
+                            best_net = monthly_summary.loc[monthly_summary['Month'] == best_month, 'Net'].iloc[0]
+                            worst_net = monthly_summary.loc[monthly_summary['Month'] == worst_month, 'Net'].iloc[0]
+                            response = f"Your best month was **{best_month}** with a net of **€{best_net:,.2f}**. "
+                            response += f"Your worst month was **{worst_month}** with a net of **€{worst_net:,.2f}**. "
+                        else:
+                            response = "I need more monthly data to compare months. Try adjusting your date range filter."
+                
+                    elif any(word in question_lower for word in ["trend", "pattern", "over time", "change"]):
+                        if len(monthly_summary) > 0:
+                            response = f"Looking at your monthly trends:\n"
+                            for _, row in monthly_summary.tail(6).iterrows():
+                                response += f"- **{row['Month']}**: Income €{row['Income']:,.2f}, Expenses €{row['Expenses']:,.2f}, Net €{row['Net']:,.2f}\n"
+                        else:
+                            response = "I need more data to analyze trends. Try adjusting your date range filter."
+                
+                    elif any(word in question_lower for word in ["help", "what can", "how", "advice", "recommend"]):
+                        response = """I can help you understand:
 - **Spending patterns**: Ask about your expenses, categories, or where your money goes
 - **Income analysis**: Questions about your earnings
 - **Savings**: Net flow, savings rate, and financial health
@@ -2659,88 +2184,91 @@ Try asking questions like:
 - "Which month was my best?"
 - "Show me my spending trends"
 """
-            else:
-                # Default response when question is not understood
-                response = "I'm sorry, I may not have fully understood your question. Could you please rephrase it? I can help you with:\n\n"
-                response += "- **Spending analysis**: Questions about expenses, categories, or where your money goes\n"
-                response += "- **Income**: Questions about your earnings\n"
-                response += "- **Savings**: Net flow, savings rate, and financial health\n"
-                response += "- **Trends**: Monthly comparisons and patterns over time\n"
-                response += "- **Categories**: Top spending categories and breakdowns\n\n"
-                response += "Try asking something like: 'Where do I spend the most?' or 'What's my savings rate?'"
-            
-            return response
-        
-        # Chat input - must be after displaying chat history
-        if prompt := st.chat_input("Ask me about your finances..."):
-            # Add user message to chat history FIRST
-            st.session_state.advisor_messages.append({"role": "user", "content": prompt})
-            
-            # Generate response
-            response = analyze_financial_question(
-                prompt, 
-                filtered_df, 
-                expenses_df, 
-                income_df, 
-                monthly_summary
-            )
-            
-            # Add assistant response to chat history
-            st.session_state.advisor_messages.append({"role": "assistant", "content": response})
-            
-            # Rerun to display the new messages
-            st.rerun()
-        
-        # Quick question suggestions
-        st.markdown("---")
-        st.markdown("### 💡 Quick Questions")
-        col_q1, col_q2, col_q3 = st.columns(3)
-        
-        with col_q1:
-            if st.button("Where do I spend the most?", use_container_width=True, key="q1"):
-                question = "Where do I spend the most money?"
-                if question not in [msg["content"] for msg in st.session_state.advisor_messages if msg["role"] == "user"]:
-                    st.session_state.advisor_messages.append({"role": "user", "content": question})
-                    response = analyze_financial_question(question, filtered_df, expenses_df, income_df, monthly_summary)
-                    st.session_state.advisor_messages.append({"role": "assistant", "content": response})
-                    st.rerun()
-        
-        with col_q2:
-            if st.button("What's my savings rate?", use_container_width=True, key="q2"):
-                question = "What's my savings rate?"
-                if question not in [msg["content"] for msg in st.session_state.advisor_messages if msg["role"] == "user"]:
-                    st.session_state.advisor_messages.append({"role": "user", "content": question})
-                    response = analyze_financial_question(question, filtered_df, expenses_df, income_df, monthly_summary)
-                    st.session_state.advisor_messages.append({"role": "assistant", "content": response})
-                    st.rerun()
-        
-        with col_q3:
-            if st.button("Show spending trends", use_container_width=True, key="q3"):
-                question = "Show me my spending trends"
-                if question not in [msg["content"] for msg in st.session_state.advisor_messages if msg["role"] == "user"]:
-                    st.session_state.advisor_messages.append({"role": "user", "content": question})
-                    response = analyze_financial_question(question, filtered_df, expenses_df, income_df, monthly_summary)
+                    else:
+                        # Default response when question is not understood
+                        response = "I'm sorry, I may not have fully understood your question. Could you please rephrase it? I can help you with:\n\n"
+                        response += "- **Spending analysis**: Questions about expenses, categories, or where your money goes\n"
+                        response += "- **Income**: Questions about your earnings\n"
+                        response += "- **Savings**: Net flow, savings rate, and financial health\n"
+                        response += "- **Trends**: Monthly comparisons and patterns over time\n"
+                        response += "- **Categories**: Top spending categories and breakdowns\n\n"
+                        response += "Try asking something like: 'Where do I spend the most?' or 'What's my savings rate?'"
+                
+                    return response
+            
+                # Chat input - must be after displaying chat history
+                if prompt := st.chat_input("Ask me about your finances..."):
+                    # Add user message to chat history FIRST
+                    st.session_state.advisor_messages.append({"role": "user", "content": prompt})
+                
+                    # Generate response
+                    response = analyze_financial_question(
+                        prompt, 
+                        filtered_df, 
+                        expenses_df, 
+                        income_df, 
+                        monthly_summary
+                    )
+                
+                    # Add assistant response to chat history
                     st.session_state.advisor_messages.append({"role": "assistant", "content": response})
-                    st.rerun()
-        
-        # Clear chat button
-        if st.button("🗑️ Clear Chat History", key="clear_chat"):
-            st.session_state.advisor_messages = []
-            st.rerun()
-        
-        
-        
+                
+                    # Rerun to display the new messages
+                    rerun_section()
+            
+                # Quick question suggestions
+                st.markdown("---")
+                st.markdown("### 💡 Quick Questions")
+                col_q1, col_q2, col_q3 = st.columns(3)
+            
+                with col_q1:
+                    if st.button("Where do I spend the most?", use_container_width=True, key="q1"):
+                        question = "Where do I spend the most money?"
+                        if question not in [msg["content"] for msg in st.session_state.advisor_messages if msg["role"] == "user"]:
+                            st.session_state.advisor_messages.append({"role": "user", "content": question})
+                            response = analyze_financial_question(question, filtered_df, expenses_df, income_df, monthly_summary)
+                            st.session_state.advisor_messages.append({"role": "assistant", "content": response})
+                            rerun_section()
+            
+                with col_q2:
+                    if st.button("What's my savings rate?", use_container_width=True, key="q2"):
+                        question = "What's my savings rate?"
+                        if question not in [msg["content"] for msg in st.session_state.advisor_messages if msg["role"] == "user"]:
+                            st.session_state.advisor_messages.append({"role": "user", "content": question})
+                            response = analyze_financial_question(question, filtered_df, expenses_df, income_df, monthly_summary)
+                            st.session_state.advisor_messages.append({"role": "assistant", "content": response})
+                            rerun_section()
+            
+                with col_q3:
+                    if st.button("Show spending trends", use_container_width=True, key="q3"):
+                        question = "Show me my spending trends"
+                        if question not in [msg["content"] for msg in st.session_state.advisor_messages if msg["role"] == "user"]:
+                            st.session_state.advisor_messages.append({"role": "user", "content": question})
+                            response = analyze_financial_question(question, filtered_df, expenses_df, income_df, monthly_summary)
+                            st.session_state.advisor_messages.append({"role": "assistant", "content": response})
+                            rerun_section()
+            
+                # Clear chat button
+                if st.button("🗑️ Clear Chat History", key="clear_chat"):
+                    st.session_state.advisor_messages = []
+                    rerun_section()
+            advisor_tab()
         
+            
+            
 
-        
-        
-    
+            
+            
+            
+            
     with tab6:
-        st.markdown("## Methodology & Design")
-        st.markdown("<p style='font-size: 0.9rem; color: #a0a0a0; margin-bottom: 1rem;'>This page explains the design choices, visual encodings, and methodology behind this dashboard, following Munzner's nested model for visualization design.</p>", unsafe_allow_html=True)
-        
-        # Overview
-        st.markdown("""
+        if tab6.open:
+            with span('tab:Methodology'):
+                st.markdown("## Methodology & Design")
+                st.markdown("<p style='font-size: 0.9rem; color: #a0a0a0; margin-bottom: 1rem;'>This page explains the design choices, visual encodings, and methodology behind this dashboard, following Munzner's nested model for visualization design.</p>", unsafe_allow_html=True)
+            
+                # Overview
+                st.markdown("""
         ### Project Overview
         
         This interactive financial analytics dashboard transforms transaction data into actionable insights, enabling users 
@@ -2750,14 +2278,14 @@ Try asking questions like:
         
         **Target Audience**: Primary user is myself (Erasmus Mundus student), but applicable to anyone managing personal finances.
         """)
-        
-        # Research Questions
-        st.markdown("### Research Questions")
-        
-        col_q1, col_q2 = st.columns(2)
-        
-        with col_q1:
-            st.markdown("""
+            
+                # Research Questions
+                st.markdown("### Research Questions")
+            
+                col_q1, col_q2 = st.columns(2)
+            
+                with col_q1:
+                    st.markdown("""
             **1. Financial Status**
             - Current balance with trend visualization
             - Income vs expenses (monthly breakdown)
@@ -2770,9 +2298,9 @@ Try asking questions like:
             - Peak spending times
             - Merchant-level analysis
             """)
-        
-        with col_q2:
-            st.markdown("""
+            
+                with col_q2:
+                    st.markdown("""
             **3. Geographic Insights**
             - Country and city-level comparison
             - Cost of living variations
@@ -2785,11 +2313,11 @@ Try asking questions like:
             - Key insights (top category, peak hours, averages)
             - Seasonal patterns
             """)
-        
-        # Data Structure
-        st.markdown("### Data Structure")
-        
-        st.markdown("""
+            
+                # Data Structure
+                st.markdown("### Data Structure")
+            
+                st.markdown("""
         **Data Types & Variables:**
         
         - **Temporal**: Date, Year, Month, Day, Weekday, Hour (enables time-series analysis)
@@ -2801,14 +2329,14 @@ Try asking questions like:
         **Data Source**: Personal bank transaction exports (CSV format), anonymized for privacy. Dataset spans ~20 months 
         with transactions across 4 countries (Belgium, Spain, Germany, France) as part of Erasmus Mundus program.
         """)
-        
-        # Visual Representations
-        st.markdown("### Visual Representations & Encodings")
-        
-        col_v1, col_v2 = st.columns(2)
-        
-        with col_v1:
-            st.markdown("""
+            
+                # Visual Representations
+                st.markdown("### Visual Representations & Encodings")
+            
+                col_v1, col_v2 = st.columns(2)
+            
+                with col_v1:
+                    st.markdown("""
             **Chart Types & Rationale:**
             
             - **Area Chart** (Balance): Shows cumulative effect over time, area encoding emphasizes trend magnitude
@@ -2822,9 +2350,9 @@ Try asking questions like:
             - **Waterfall** (Net Flow): Cumulative changes, position encoding shows flow
             - **Gauge** (Health Score): Single metric with context, angle encoding with color zones
             """)
-        
-        with col_v2:
-            st.markdown("""
+            
+                with col_v2:
+                    st.markdown("""
             **Encoding Choices:**
             
             - **Position** (x/y axes): Most accurate for quantitative comparisons
@@ -2839,11 +2367,11 @@ Try asking questions like:
             Critical comparisons use position (bars), less critical use color (heatmaps). Color also used for 
             categorical distinction (income=cyan, expenses=magenta) following financial conventions.
             """)
-        
-        # Page Layout & Screenspace
-        st.markdown("### Page Layout & Screenspace Use")
-        
-        st.markdown("""
+            
+                # Page Layout & Screenspace
+                st.markdown("### Page Layout & Screenspace Use")
+            
+                st.markdown("""
         **Layout Structure:**
         
         - **Wide Layout** (Streamlit): Maximizes horizontal space for time-series charts, optimal for temporal data
@@ -2861,14 +2389,14 @@ Try asking questions like:
         - Removed Streamlit default headers/footers to maximize content area
         - Grouped related metrics in cards with shared backgrounds
         """)
-        
-        # Interaction
-        st.markdown("### Interaction Design")
-        
-        col_i1, col_i2 = st.columns(2)
-        
-        with col_i1:
-            st.markdown("""
+            
+                # Interaction
+                st.markdown("### Interaction Design")
+            
+                col_i1, col_i2 = st.columns(2)
+            
+                with col_i1:
+                    st.markdown("""
             **Filtering Interactions:**
             
             - **Date Range Picker**: Filter by specific time periods
@@ -2880,9 +2408,9 @@ Try asking questions like:
             
             **Impact**: Enables exploratory data analysis, answer ad-hoc questions, drill down into specific periods/categories.
             """)
-        
-        with col_i2:
-            st.markdown("""
+            
+                with col_i2:
+                    st.markdown("""
             **Chart Interactions:**
             
             - **Zoom/Pan**: Click and drag to zoom into time periods (Plotly default)
@@ -2894,11 +2422,11 @@ Try asking questions like:
             
             **Impact**: Detailed exploration without overwhelming interface, supports both overview and detail views.
             """)
-        
-        # Color Use
-        st.markdown("### Color Use & Design Aesthetics")
-        
-        st.markdown("""
+            
+                # Color Use
+                st.markdown("### Color Use & Design Aesthetics")
+            
+                st.markdown("""
         **Color Palette:**
         
         - **Primary (Cyan #00f5ff)**: Income, positive values, primary actions (financial convention: "money in")
@@ -2921,14 +2449,14 @@ Try asking questions like:
         - **Consistent Spacing**: Reduced margins for information density
         - **Typography**: Clear hierarchy, readable fonts, appropriate sizes
         """)
-        
-        # Technology & Implementation
-        st.markdown("### Technology Stack & Implementation")
-        
-        col_t1, col_t2 = st.columns(2)
-        
-        with col_t1:
-            st.markdown("""
+            
+                # Technology & Implementation
+                st.markdown("### Technology Stack & Implementation")
+            
+                col_t1, col_t2 = st.columns(2)
+            
+                with col_t1:
+                    st.markdown("""
             **Technology Choices:**
             
             - **Streamlit**: Web framework for rapid development
@@ -2945,9 +2473,9 @@ Try asking questions like:
               - Efficient aggregation and filtering
               - Time-series operations
             """)
-        
-        with col_t2:
-            st.markdown("""
+            
+                with col_t2:
+                    st.markdown("""
             **Implementation Features:**
             
             - **Data Caching**: `@st.cache_data` for performance, auto-invalidation on file change
@@ -2963,14 +2491,14 @@ Try asking questions like:
             - Methodology page documents all choices
             - README provides setup instructions
             """)
-        
-        # Use Cases & Limitations
-        st.markdown("### Use Cases & Limitations")
-        
-        col_u1, col_u2 = st.columns(2)
-        
-        with col_u1:
-            st.markdown("""
+            
+                # Use Cases & Limitations
+                st.markdown("### Use Cases & Limitations")
+            
+                col_u1, col_u2 = st.columns(2)
+            
+                with col_u1:
+                    st.markdown("""
             **Key Use Cases**
             
             - Track financial health (balance, savings rate, budget)
@@ -2982,9 +2510,9 @@ Try asking questions like:
             - Cost of living comparison across locations
             - Natural language queries via AI Financial Advisor
             """)
-        
-        with col_u2:
-            st.markdown("""
+            
+                with col_u2:
+                    st.markdown("""
         **Current Limitations**
         
         - Transaction-level data only (no investments/assets tracking)
@@ -2997,11 +2525,11 @@ Try asking questions like:
         - Trends analysis consolidated into Spending Analysis tab (no separate trends tab)
         - AI Financial Advisor uses rule-based system (optional AI integration available)
             """)
-        
-        # AI Financial Advisor Section
-        st.markdown("### AI Financial Advisor")
-        
-        st.markdown("""
+            
+                # AI Financial Advisor Section
+                st.markdown("### AI Financial Advisor")
+            
+                st.markdown("""
         **Feature Overview:**
         
         The dashboard includes an AI-powered financial advisor that allows users to ask natural language questions about their financial data. The advisor can:
@@ -3021,11 +2549,11 @@ Try asking questions like:
         
         **Design Choice**: The AI advisor is positioned as the 5th tab, before Methodology, to provide easy access to interactive querying while keeping documentation accessible at the end.
         """)
-        
-        # Methodology Summary
-        st.markdown("### Methodology Summary")
-        
-        st.markdown("""
+            
+                # Methodology Summary
+                st.markdown("### Methodology Summary")
+            
+                st.markdown("""
         This dashboard follows **Munzner's Nested Model for Visualization Design**:
         
         1. **Domain Problem**: Personal finance management, understanding spending patterns
@@ -3046,3 +2574,33 @@ Try asking questions like:
 
 else:
     st.error("Unable to load data. Please check if the data file exists.")
+
+# Developer panel and offline log of this run's spans
+finish_run(run_trace)
+if DEBUG_PANEL:
+    with st.expander("🛠️ Developer Panel: Run Timings", expanded=False):
+        st.caption(f"Scope: {run_trace.scope} · engine: {QUERY_ENGINE} · total: {run_trace.total_ms:,.1f} ms")
+        trace_total = max(run_trace.total_ms, 1e-9)
+        span_table = pd.DataFrame([
+            {
+                'Span': '\u2003' * s.depth + s.name,
+                'ms': s.duration_ms,
+                'Rows': s.rows,
+                '% of run': (s.duration_ms or 0) / trace_total * 100,
+            }
+            for s in run_trace.spans
+        ])
+        if len(span_table) > 0:
+            st.dataframe(span_table, hide_index=True, use_container_width=True,
+                         column_config={'ms': st.column_config.NumberColumn(format="%.1f"),
+                                        '% of run': st.column_config.NumberColumn(format="%.1f%%")})
+        cache_table = pd.DataFrame([
+            {'Cache': name, 'Hits': stats['hits'], 'Misses': stats['misses']}
+            for name, stats in run_trace.caches.items()
+        ])
+        if len(cache_table) > 0:
+            st.dataframe(cache_table, hide_index=True, use_container_width=True)
+        # Partial reruns (scope 'fragment:<name>') only redraw their section, so they show up here afterwards
+        st.markdown("**Recent runs**")
+        st.dataframe(pd.DataFrame(st.session_state['perf_history'][::-1]), hide_index=True, use_container_width=True,
+                     column_config={'ms': st.column_config.NumberColumn(format="%.1f")})
@@ -0,0 +1,435 @@
+"""
+Columnar storage layer for the transaction dataset.
+
+The statement CSV is converted once into a typed Parquet file (categorical
+dictionaries for the low-cardinality text columns and a precomputed Date
+column). Later loads memory-map the Parquet copy instead of re-parsing the CSV.
+
+The loaded table uses a compact schema: categoricals for every text column,
+int8/int16 calendar parts and hour, and the amounts as int64 cents
+(Amount_Cents) that the in-memory money totals are summed from, so they are
+exact; the euro floats are read for display, filters and maxima. A full load
+is also saved as an uncompressed Arrow IPC snapshot that later loads
+memory-map without copying, so every session and every server process on the
+machine reads the same read-only pages of the OS page cache instead of
+holding its own copy.
+
+Statement exports only ever grow at the end, so a tracked load remembers how
+many bytes and rows it ingested (plus a checksum of those bytes); a later
+refresh parses just the appended tail and falls back to a full reload when the
+already-ingested prefix changed.
+"""
+
+import argparse
+import io
+import os
+import sys
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Try to import PyArrow (optional - falls back to plain CSV parsing if not available)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Low-cardinality text columns stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = ['Type', 'Product', 'Weekday', 'Description_Anon', 'Merchant_Category', 'Country', 'City',
+                       'Account']
+
+# Calendar parts and hour stored in the narrowest integer type that holds them
+COMPACT_INT_COLUMNS = {'Year': 'int16', 'Month': 'int8', 'Day': 'int8', 'Hour': 'int8'}
+
+# Amounts as integer cents, added to the table next to the euro Amount
+CENTS_COLUMN = 'Amount_Cents'
+
+# Read size used when checksumming a CSV (memory stays at one block whatever the file size)
+CHECKSUM_BLOCK_SIZE = 8 << 20
+
+
+def enable_copy_on_write():
+    """
+    Switch pandas to copy-on-write (the only mode from pandas 3): column selections, slices
+    and derived frames share the loaded table's memory until they are written to, instead of
+    copying eagerly. A process-wide option, so only entry points (dashboard, benchmark) set it.
+    """
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
+
+
+def to_cents(values):
+    """Euro amounts as int64 cents (missing amounts count as 0)."""
+    return np.round(np.nan_to_num(np.asarray(values, dtype=float)) * 100).astype(np.int64)
+
+
+def amount_cents(df):
+    """The amounts of a table in int64 cents (computed for frames without the cents column)."""
+    if CENTS_COLUMN in df.columns:
+        return df[CENTS_COLUMN].to_numpy()
+    return to_cents(df['Amount'])
+
+
+def normalize_transactions(df):
+    """Build the Date column, coerce numeric columns and fill optional columns."""
+    df['Date'] = pd.to_datetime(df[['Year', 'Month', 'Day']])
+    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
+    df['Balance'] = pd.to_numeric(df['Balance'], errors='coerce')
+    df['Amount_Abs'] = pd.to_numeric(df['Amount_Abs'], errors='coerce')
+
+    # Ensure Weekday and Hour columns exist (create from Date if missing)
+    if 'Weekday' not in df.columns:
+        df['Weekday'] = df['Date'].dt.day_name()
+    if 'Hour' not in df.columns:
+        df['Hour'] = df['Date'].dt.hour
+
+    if 'Country' not in df.columns:
+        df['Country'] = 'Unknown'
+    if 'City' not in df.columns:
+        df['City'] = 'Unknown'
+    return df
+
+
+def to_columnar_schema(df, cents=True):
+    """
+    Convert the text columns to categoricals and narrow the calendar/hour integers; with
+    `cents`, add the amounts as int64 cents (query results that only need the dtypes skip it).
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col, dtype in COMPACT_INT_COLUMNS.items():
+        # Columns with missing values (parsed as float) keep their dtype
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col].dtype) and df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+    if cents and 'Amount' in df.columns and CENTS_COLUMN not in df.columns:
+        df[CENTS_COLUMN] = to_cents(df['Amount'])
+    return df
+
+
+def memory_report(before, after):
+    """Per-column dtype and memory (bytes, including string objects) of two versions of a table."""
+    rows = []
+    for col in after.columns:
+        rows.append({
+            'Column': col,
+            'Before dtype': str(before[col].dtype) if col in before.columns else '',
+            'Before bytes': int(before[col].memory_usage(index=False, deep=True)) if col in before.columns else 0,
+            'After dtype': str(after[col].dtype),
+            'After bytes': int(after[col].memory_usage(index=False, deep=True)),
+        })
+    report = pd.DataFrame(rows)
+    total = {'Column': 'Total', 'Before dtype': '', 'Before bytes': report['Before bytes'].sum(),
+             'After dtype': '', 'After bytes': report['After bytes'].sum()}
+    report = pd.concat([report, pd.DataFrame([total])], ignore_index=True)
+    report['Ratio'] = report['After bytes'] / report['Before bytes'].where(report['Before bytes'] > 0)
+    return report
+
+
+def sort_by_date(df):
+    """
+    Keep the table ordered by Date (stable, so same-day rows keep file order) with
+    a fresh RangeIndex. Date-range filters rely on this order for binary search.
+    """
+    if df['Date'].is_monotonic_increasing:
+        return df.reset_index(drop=True) if not isinstance(df.index, pd.RangeIndex) else df
+    return df.sort_values('Date', kind='stable').reset_index(drop=True)
+
+
+def parquet_path_for(csv_path):
+    """Return the Parquet cache path that sits next to a CSV file."""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def snapshot_path_for(csv_path):
+    """Return the Arrow snapshot path that sits next to a CSV file."""
+    return os.path.splitext(csv_path)[0] + '.arrow'
+
+
+def dataset_mtime(csv_path):
+    """
+    Modification time (ns) of the CSV, or of its Parquet copy when only that exists (0 if
+    neither). Nanoseconds so that appends within the same second still count as a new version.
+    """
+    for path in (csv_path, parquet_path_for(csv_path)):
+        if os.path.exists(path):
+            return os.stat(path).st_mtime_ns
+    return 0
+
+
+def is_copy_current(csv_path, copy_path):
+    """True when a derived copy (Parquet file or Arrow snapshot) exists and is at least as new as the CSV."""
+    if not os.path.exists(copy_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(copy_path) >= os.path.getmtime(csv_path)
+
+
+def is_parquet_current(csv_path, parquet_path=None):
+    """True when the Parquet copy exists and is at least as new as the CSV."""
+    return is_copy_current(csv_path, parquet_path or parquet_path_for(csv_path))
+
+
+def read_csv_transactions(csv_path):
+    """Parse and normalize a statement CSV, sorted by Date."""
+    return sort_by_date(to_columnar_schema(normalize_transactions(pd.read_csv(csv_path))))
+
+
+def write_parquet(df, parquet_path):
+    """Write a normalized frame to Parquet atomically (temp file + rename)."""
+    # Per-process temp name, so server processes loading the same file never interleave writes
+    tmp_path = f'{parquet_path}.{os.getpid()}.tmp'
+    df.to_parquet(tmp_path, engine='pyarrow', index=False)
+    os.replace(tmp_path, parquet_path)
+
+
+def read_parquet(parquet_path, columns=None):
+    """
+    Read a Parquet dataset (or only those of `columns` it has) through a memory map;
+    categoricals round-trip via pandas metadata.
+    """
+    if columns is not None:
+        present = set(pq.read_schema(parquet_path).names)
+        columns = [col for col in columns if col in present]
+    table = pq.read_table(parquet_path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def write_snapshot(df, snapshot_path):
+    """Write a normalized frame as an uncompressed Arrow IPC file atomically (temp file + rename)."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f'{snapshot_path}.{os.getpid()}.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, snapshot_path)
+
+
+def map_snapshot(snapshot_path):
+    """
+    Memory-map an Arrow snapshot as a read-only frame. Numeric, date and category
+    code columns without missing values point straight into the mapped file (no
+    copy); the pages are shared with every other process mapping the same file.
+    """
+    table = pa.ipc.open_file(pa.memory_map(snapshot_path, 'r')).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def save_snapshot(df, csv_path):
+    """Write the Arrow snapshot of a loaded table; False when it cannot be written (read-only deployments)."""
+    try:
+        write_snapshot(df, snapshot_path_for(csv_path))
+    except OSError:
+        return False
+    return True
+
+
+def convert_csv_to_parquet(csv_path, parquet_path=None):
+    """Convert a statement CSV to the typed Parquet layout and return the frame."""
+    parquet_path = parquet_path or parquet_path_for(csv_path)
+    df = read_csv_transactions(csv_path)
+    write_parquet(df, parquet_path)
+    return df
+
+
+def read_transactions(csv_path, snapshot=True):
+    """
+    Load a transaction dataset sorted by Date, preferring the shared Arrow snapshot,
+    then the Parquet copy.
+
+    The CSV is parsed only when no up-to-date Parquet file exists; in that case
+    the Parquet copy is written so the next load can skip parsing. Tables read
+    from Parquet or CSV are saved as a snapshot and served from its memory map
+    (skipped with snapshot=False, for tables that are combined in memory anyway).
+    Raises FileNotFoundError when neither file exists.
+    """
+    parquet_path = parquet_path_for(csv_path)
+    snapshot_path = snapshot_path_for(csv_path)
+    if (snapshot and PYARROW_AVAILABLE and is_copy_current(csv_path, snapshot_path)
+            and is_copy_current(parquet_path, snapshot_path)):
+        # Snapshots written before a schema change get the missing columns here
+        return to_columnar_schema(sort_by_date(map_snapshot(snapshot_path)))
+
+    if PYARROW_AVAILABLE and is_parquet_current(csv_path, parquet_path):
+        df = to_columnar_schema(sort_by_date(read_parquet(parquet_path)))
+    else:
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(csv_path)
+        df = read_csv_transactions(csv_path)
+        if PYARROW_AVAILABLE:
+            try:
+                write_parquet(df, parquet_path)
+            except OSError:
+                # Read-only deployments (e.g. Streamlit Cloud) keep serving from the CSV
+                return df
+
+    if snapshot and PYARROW_AVAILABLE and save_snapshot(df, csv_path):
+        # Serve the mapped pages rather than this process's private copy
+        return sort_by_date(map_snapshot(snapshot_path))
+    return df
+
+
+def align_categories(old, new):
+    """
+    Give the categorical columns of two frames identical dictionaries so they can be
+    concatenated. When the new frame brings no unseen values only the new frame is
+    re-coded; otherwise both switch to the sorted union of their categories.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col not in old.columns or col not in new.columns:
+            continue
+        if not isinstance(old[col].dtype, pd.CategoricalDtype) or not isinstance(new[col].dtype, pd.CategoricalDtype):
+            continue
+        old_categories = old[col].cat.categories
+        new_categories = new[col].cat.categories
+        if old_categories.equals(new_categories):
+            continue
+        if new_categories.difference(old_categories).empty:
+            new = new.assign(**{col: new[col].cat.set_categories(old_categories)})
+        else:
+            categories = old_categories.union(new_categories)
+            old = old.assign(**{col: old[col].cat.set_categories(categories)})
+            new = new.assign(**{col: new[col].cat.set_categories(categories)})
+    return old, new
+
+
+def append_rows(df, new_rows):
+    """Append normalized rows to a Date-sorted table, re-sorting only if they arrive out of order."""
+    df, new_rows = align_categories(df, sort_by_date(new_rows)[df.columns])
+    combined = pd.concat([df, new_rows], ignore_index=True)
+    if len(df) > 0 and len(new_rows) > 0 and new_rows['Date'].iloc[0] < df['Date'].iloc[-1]:
+        combined = sort_by_date(combined)
+    return combined
+
+
+def file_crc32(path, length, crc=0):
+    """CRC-32 of the first `length` bytes of a file (continuing from `crc`)."""
+    with open(path, 'rb') as f:
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(CHECKSUM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            crc = zlib.crc32(block, crc)
+            remaining -= len(block)
+    return crc
+
+
+def scan_csv(path):
+    """Size, CRC-32, newline count and whether the last byte is a newline, read block by block."""
+    size, crc, newlines, last = 0, 0, 0, b''
+    with open(path, 'rb') as f:
+        while block := f.read(CHECKSUM_BLOCK_SIZE):
+            size += len(block)
+            crc = zlib.crc32(block, crc)
+            newlines += block.count(b'\n')
+            last = block[-1:]
+    return size, crc, newlines, last == b'\n'
+
+
+class TrackedLoad:
+    """A loaded transaction table plus the CSV position needed to ingest rows appended later."""
+
+    def __init__(self, csv_path, df, byte_offset=None, row_count=0, prefix_crc=0, columns=None):
+        self.csv_path = csv_path
+        self.df = df
+        # Bytes of the CSV already ingested (None: not trackable, the next refresh reloads in full)
+        self.byte_offset = byte_offset
+        self.row_count = row_count
+        self.prefix_crc = prefix_crc
+        self.columns = columns
+
+
+def load_tracked(csv_path):
+    """Full load of a transaction dataset, recording the ingested size and checksum of its CSV."""
+    if not os.path.exists(csv_path):
+        df = read_transactions(csv_path)
+        return TrackedLoad(csv_path, df, row_count=len(df))
+
+    # Checksummed in blocks before loading, so the recorded state never runs ahead of the table
+    size, crc, newlines, ends_with_newline = scan_csv(csv_path)
+    df = read_transactions(csv_path)
+    columns = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    # Track the position only when the file ends on a complete row and every row was loaded;
+    # otherwise the next change simply triggers another full load
+    byte_offset = None
+    if ends_with_newline and newlines - 1 == len(df):
+        byte_offset = size
+    return TrackedLoad(csv_path, df, byte_offset, len(df), crc, columns)
+
+
+def load_appended(previous):
+    """
+    Refresh a tracked load by parsing only the rows appended to its CSV.
+
+    Returns (load, appended): appended is the number of rows added to the end of
+    the table, or None when the table was rebuilt - because the ingested prefix
+    changed (checksum mismatch), the file shrank, or the new rows had to be sorted
+    in among existing ones. Callers extend derived structures only in the first case.
+    """
+    csv_path = previous.csv_path
+    offset = previous.byte_offset
+    if offset is None or not os.path.exists(csv_path):
+        return load_tracked(csv_path), None
+    if os.path.getsize(csv_path) < offset or file_crc32(csv_path, offset) != previous.prefix_crc:
+        return load_tracked(csv_path), None
+
+    with open(csv_path, 'rb') as f:
+        f.seek(offset)
+        tail = f.read()
+    # A trailing partial row is left for the next refresh
+    tail = tail[:tail.rfind(b'\n') + 1]
+    if not tail.strip():
+        return previous, 0
+
+    new_rows = pd.read_csv(io.BytesIO(tail), header=None, names=previous.columns)
+    new_rows = to_columnar_schema(normalize_transactions(new_rows))
+    df = append_rows(previous.df, new_rows)
+    load = TrackedLoad(csv_path, df, offset + len(tail), len(df), zlib.crc32(tail, previous.prefix_crc),
+                       previous.columns)
+    in_order = len(previous.df) == 0 or new_rows['Date'].min() >= previous.df['Date'].iloc[-1]
+    return load, len(new_rows) if in_order else None
+
+
+def print_memory_report(csv_path):
+    """Print the memory of a statement CSV loaded as plain pandas dtypes vs. the compact schema."""
+    before = normalize_transactions(pd.read_csv(csv_path))
+    after = to_columnar_schema(normalize_transactions(pd.read_csv(csv_path)))
+    report = memory_report(before, after)
+    print(f"\n{csv_path} ({len(after):,} transactions)")
+    print(f"  {'column':<20}{'before':>16}{'MB':>10}{'after':>16}{'MB':>10}{'ratio':>8}")
+    for row in report.itertuples(index=False):
+        print(f"  {row[0]:<20}{row[1]:>16}{row[2] / 2**20:>10.2f}{row[3]:>16}{row[4] / 2**20:>10.2f}{row[5]:>8.2f}")
+
+
+def main():
+    """Convert the given CSV files (default: the dummy dataset) to Parquet and Arrow snapshots."""
+    parser = argparse.ArgumentParser(description="Convert statement CSVs to Parquet copies and Arrow snapshots.")
+    parser.add_argument('csv_files', nargs='*', default=['Dataset - Dummy Data.csv'],
+                        help="statement CSV files (default: the dummy dataset)")
+    parser.add_argument('--memory-report', action='store_true',
+                        help="only compare the in-memory size of plain vs. compact dtypes")
+    args = parser.parse_args()
+
+    if args.memory_report:
+        for csv_path in args.csv_files:
+            print_memory_report(csv_path)
+        return
+
+    if not PYARROW_AVAILABLE:
+        print("❌ pyarrow is not installed. Run: pip install pyarrow")
+        sys.exit(1)
+
+    for csv_path in args.csv_files:
+        parquet_path = parquet_path_for(csv_path)
+        df = convert_csv_to_parquet(csv_path, parquet_path)
+        save_snapshot(df, csv_path)
+        print(f"✅ {csv_path} → {parquet_path} ({len(df)} transactions)")
+
+
+if __name__ == "__main__":
+    main()
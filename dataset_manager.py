@@ -0,0 +1,226 @@
+"""
+Process-wide owner of the loaded transaction dataset.
+
+A DatasetManager serves the latest loaded version of one data file to every
+session. Loads are single-flight: concurrent first requests wait on one load,
+and when the file changes a single background thread builds the new version
+while the previous one keeps being served (stale-while-revalidate). The new
+version replaces the old one with a single reference assignment, so readers
+always see a complete version.
+
+The data source is either a single statement CSV or the root directory of a
+partitioned multi-account dataset (see partitions.py), which is reloaded in full
+- only the partitions overlapping the manager's date window, when it has one.
+
+For the Parquet-scanning query engines (DuckDB, Polars) a manager can serve scan
+versions instead: the engines aggregate straight from the Parquet copies, so a
+scan version reads only the few columns the running balances and the filter
+widgets need. The full table and its indexes are loaded on first use by a
+row-level page (rows()).
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from analytics import build_cube, extend_cube
+from balances import BalanceEngine
+from bitmap_index import FILTER_COLUMNS, BitmapIndex, FilterOptions
+from data_store import (TrackedLoad, dataset_mtime, load_appended, load_tracked, read_parquet, sort_by_date,
+                        to_columnar_schema)
+from kpi_index import KPIIndex
+from partitions import load_partitioned, parquet_sources, partitions_mtime
+from search_index import SearchIndex
+
+# Columns a scan version reads: the running balances (per account) and the filter options
+SCAN_COLUMNS = ['Date', 'Amount', 'Amount_Cents', 'Balance', 'Account', 'Amount_Abs'] + FILTER_COLUMNS
+
+
+def source_mtime(data_file):
+    """Version stamp of a data source: file mtime, or the latest mtime in a partitioned tree."""
+    return partitions_mtime(data_file) if os.path.isdir(data_file) else dataset_mtime(data_file)
+
+
+def date_bounds(df):
+    """First and last Date of a Date-sorted table (None for an empty one)."""
+    return (df['Date'].iloc[0], df['Date'].iloc[-1]) if len(df) else None
+
+
+def build_version(data_file, file_mtime, previous=None, start_date=None, end_date=None):
+    """
+    Load a dataset version: the table, its aggregation cube, search index, KPI
+    index, filter bitmaps (of the table and of the cube) and running-balance
+    engine.
+
+    With a previous version only rows appended to the CSV are parsed, and the
+    derived structures are extended with those rows; otherwise (or when the
+    earlier rows changed) everything is rebuilt. A partitioned dataset is limited
+    to the inclusive [start_date, end_date] window (either end may be open); a
+    single CSV is always loaded whole.
+    """
+    if os.path.isdir(data_file):
+        # Partitioned dataset: partitions are loaded in parallel, and each keeps its own Parquet copy
+        df = load_partitioned(data_file, start_date, end_date)
+        load, appended = TrackedLoad(data_file, df, row_count=len(df)), None
+    elif previous is None:
+        # Memory-maps the Parquet copy when present, otherwise parses the CSV once and writes it
+        load, appended = load_tracked(data_file), None
+    else:
+        load, appended = load_appended(previous['load'])
+
+    if appended is None:
+        cube = build_cube(load.df)
+        search_index = SearchIndex(load.df)
+        kpi_index = KPIIndex(load.df)
+        bitmap_index = BitmapIndex(load.df)
+        cube_bitmap_index = BitmapIndex(cube, FILTER_COLUMNS, None)
+        balances = BalanceEngine(load.df)
+    else:
+        new_rows = load.df.iloc[previous['load'].row_count:]
+        cube = extend_cube(previous['cube'], new_rows)
+        search_index = previous['search_index'].extended(load.df)
+        kpi_index = previous['kpi_index'].extended(load.df)
+        bitmap_index = previous['bitmap_index'].extended(load.df)
+        # extend_cube re-merges the cube cells from the first appended day onward
+        cube_start = len(previous['cube']) if len(new_rows) == 0 else int(np.searchsorted(
+            previous['cube']['Date'].to_numpy(), new_rows['Date'].iloc[0].to_datetime64(), side='left'))
+        cube_bitmap_index = previous['cube_bitmap_index'].extended(cube, cube_start)
+        balances = previous['balances'].extended(load.df)
+
+    return {'file_mtime': file_mtime, 'data_file': data_file, 'row_count': len(load.df), 'load': load,
+            'df': load.df, 'cube': cube, 'search_index': search_index, 'kpi_index': kpi_index,
+            'bitmap_index': bitmap_index, 'cube_bitmap_index': cube_bitmap_index, 'balances': balances,
+            'filter_options': bitmap_index, 'date_bounds': date_bounds(load.df)}
+
+
+def build_scan_version(data_file, file_mtime, previous=None, start_date=None, end_date=None):
+    """
+    Load a scan version: the running-balance engine, filter options and date bounds,
+    read from the Parquet copies (written first where missing or stale) with only
+    SCAN_COLUMNS. The table and everything built from it are None. Without writable
+    Parquet copies this is build_version (extending a previous full version).
+    """
+    sources = parquet_sources(data_file, write=True)
+    if sources is None:
+        previous = previous if previous is not None and previous['df'] is not None else None
+        return build_version(data_file, file_mtime, previous, start_date, end_date)
+    if os.path.isdir(data_file):
+        df = load_partitioned(data_file, start_date, end_date, columns=SCAN_COLUMNS)
+    else:
+        df = to_columnar_schema(sort_by_date(read_parquet(sources[0], SCAN_COLUMNS)))
+
+    return {'file_mtime': file_mtime, 'data_file': data_file, 'row_count': len(df), 'load': None, 'df': None,
+            'cube': None, 'search_index': None, 'kpi_index': None, 'bitmap_index': None, 'cube_bitmap_index': None,
+            'balances': BalanceEngine(df), 'filter_options': FilterOptions(df), 'date_bounds': date_bounds(df)}
+
+
+class DatasetManager:
+    """Serves the current version of a data file and refreshes it in the background."""
+
+    def __init__(self, data_file, start_date=None, end_date=None, scan=False):
+        self.data_file = data_file
+        self.start_date = start_date
+        self.end_date = end_date
+        self.scan = scan
+        self.last_error = None
+        self._current = None
+        self._rows = None
+        self._load_lock = threading.Lock()
+        self._rows_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+        self._rows_wanted = None
+        self._rows_thread = None
+
+    def get(self):
+        """
+        The current dataset version. Only the very first load blocks (concurrent
+        callers share it); after that a changed file triggers one background
+        refresh and the previous version is returned until it completes.
+        Raises FileNotFoundError when the initial load finds no data file.
+        """
+        current = self._current
+        if current is None:
+            with self._load_lock:
+                if self._current is None:
+                    self._current = self._build(source_mtime(self.data_file))
+                return self._current
+        if source_mtime(self.data_file) != current['file_mtime']:
+            self.refresh()
+        return current
+
+    def rows(self, version):
+        """
+        `version` with its table and indexes. A scan version's are built on the first
+        call (concurrent callers share the load); when the version changes they are
+        rebuilt in the background (extending the previous ones when rows were only
+        appended) and the previous ones are returned until that completes - check
+        their `file_mtime` against the version's.
+        """
+        if version['df'] is not None:
+            return version
+        rows = self._rows
+        if rows is None:
+            with self._rows_lock:
+                if self._rows is None:
+                    self._rows = build_version(self.data_file, version['file_mtime'],
+                                               start_date=self.start_date, end_date=self.end_date)
+                return self._rows
+        if rows['file_mtime'] != version['file_mtime']:
+            self._rows_wanted = version['file_mtime']
+            self.refresh_rows()
+        return rows
+
+    def _build(self, file_mtime, previous=None):
+        build = build_scan_version if self.scan else build_version
+        return build(self.data_file, file_mtime, previous, self.start_date, self.end_date)
+
+    def refresh(self):
+        """Start a background reload unless one is already running."""
+        with self._refresh_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return self._refresh_thread
+            self._refresh_thread = threading.Thread(target=self._refresh, name='dataset-refresh', daemon=True)
+            self._refresh_thread.start()
+            return self._refresh_thread
+
+    def refresh_rows(self):
+        """Start a background rebuild of the rows behind scan versions unless one is already running."""
+        with self._refresh_lock:
+            if self._rows_thread is not None and self._rows_thread.is_alive():
+                return self._rows_thread
+            self._rows_thread = threading.Thread(target=self._refresh_rows, name='dataset-rows-refresh', daemon=True)
+            self._rows_thread.start()
+            return self._rows_thread
+
+    def _refresh_rows(self):
+        # Rebuild for the latest version asked for until the rows catch up with it
+        while True:
+            rows, file_mtime = self._rows, self._rows_wanted
+            if file_mtime == rows['file_mtime']:
+                return
+            try:
+                rows = build_version(self.data_file, file_mtime, previous=rows,
+                                     start_date=self.start_date, end_date=self.end_date)
+            except Exception as e:
+                self.last_error = e
+                return
+            self.last_error = None
+            self._rows = rows
+
+    def _refresh(self):
+        # Keep going while the file changes underneath us, so the last write is never missed
+        while True:
+            current = self._current
+            file_mtime = source_mtime(self.data_file)
+            if file_mtime == current['file_mtime']:
+                return
+            try:
+                version = self._build(file_mtime, previous=current)
+            except Exception as e:
+                # Keep serving the previous version; the next request retries
+                self.last_error = e
+                return
+            self.last_error = None
+            self._current = version
@@ -3,11 +3,23 @@ Generate dummy financial transaction data similar to the original dataset struct
 This creates realistic but fake data for public deployment.
 """
 
+import argparse
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import random
 
+from data_store import normalize_transactions, parquet_path_for
+
+# Try to import PyArrow (optional - only needed for Parquet output in streaming mode)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Configuration
 # 20 months * ~35 transactions/month = ~700 transactions + 20 Topups = ~720 total
 NUM_TRANSACTIONS = 720  # Realistic number for budget-conscious student
@@ -114,6 +126,28 @@ AMOUNT_RANGES = {
     'Exchange': (-200, 200)     # Currency exchange between countries
 }
 
+# Cost of living adjustments for Erasmus student (applied to Card Payment amounts)
+COUNTRY_MULTIPLIERS = {
+    'Belgium': 1.2,  # Brussels is moderately expensive
+    'Spain': 0.85,   # Barcelona is cheaper - good for students
+    'Germany': 1.0,  # Berlin is moderate
+    'France': 1.15   # Paris is expensive
+}
+
+# Card Payment category weights for a realistic student lifestyle
+CARD_CATEGORY_WEIGHTS = {
+    'Food & Dining': 0.45,      # Most common - groceries, restaurants (biggest expense after rent)
+    'Transportation': 0.18,   # Public transport, travel between cities
+    'Shopping & Retail': 0.12, # Clothes, essentials
+    'Entertainment & Recreation': 0.08, # Movies, events, social activities
+    'Utilities & Bills': 0.10, # Phone, internet (monthly bills)
+    'Education': 0.04,        # Books, supplies
+    'Personal Care & Services': 0.03  # Haircut, laundry
+}
+
+# Categories a Card Refund can be booked against
+REFUND_CATEGORIES = ['Food & Dining', 'Shopping & Retail', 'Transportation']
+
 # Hour distribution (more transactions during business hours)
 HOUR_WEIGHTS = {
     0: 0.01, 1: 0.01, 2: 0.005, 3: 0.005, 4: 0.005, 5: 0.01,
@@ -261,12 +295,7 @@ def generate_transactions(num_transactions, start_date, end_date):
         
         # Determine amount based on type and country
         # Cost of living adjustments for Erasmus student
-        country_multiplier = {
-            'Belgium': 1.2,  # Brussels is moderately expensive
-            'Spain': 0.85,   # Barcelona is cheaper - good for students
-            'Germany': 1.0,  # Berlin is moderate
-            'France': 1.15   # Paris is expensive
-        }.get(country, 1.0)
+        country_multiplier = COUNTRY_MULTIPLIERS.get(country, 1.0)
         
         if transaction_type == 'Card Payment':
             # Budget-conscious student spending amounts
@@ -282,16 +311,7 @@ def generate_transactions(num_transactions, start_date, end_date):
             
             amount = round(base_amount * country_multiplier, 2)
             # Weight categories for realistic student lifestyle
-            category_weights = {
-                'Food & Dining': 0.45,      # Most common - groceries, restaurants (biggest expense after rent)
-                'Transportation': 0.18,   # Public transport, travel between cities
-                'Shopping & Retail': 0.12, # Clothes, essentials
-                'Entertainment & Recreation': 0.08, # Movies, events, social activities
-                'Utilities & Bills': 0.10, # Phone, internet (monthly bills)
-                'Education': 0.04,        # Books, supplies
-                'Personal Care & Services': 0.03  # Haircut, laundry
-            }
-            category = np.random.choice(list(category_weights.keys()), p=list(category_weights.values()))
+            category = np.random.choice(list(CARD_CATEGORY_WEIGHTS.keys()), p=list(CARD_CATEGORY_WEIGHTS.values()))
         elif transaction_type == 'Transfer':
             # Transfers: rent (large negative, once per month), utilities, occasional positive
             if random.random() < 0.90:  # 90% negative (rent, bills)
@@ -325,7 +345,7 @@ def generate_transactions(num_transactions, start_date, end_date):
             category = 'Financial Services'
         elif transaction_type == 'Card Refund':
             amount = round(random.uniform(*AMOUNT_RANGES[transaction_type]), 2)
-            category = random.choice(['Food & Dining', 'Shopping & Retail', 'Transportation'])
+            category = random.choice(REFUND_CATEGORIES)
         else:  # Exchange
             amount = round(random.uniform(*AMOUNT_RANGES[transaction_type]), 2)
             category = 'Other'
@@ -379,16 +399,323 @@ def generate_transactions(num_transactions, start_date, end_date):
     
     return pd.DataFrame(transactions)
 
+def _opening_balance(start_date):
+    """Initial balance used by both generators (includes the September 2024 lump sum head start)."""
+    if start_date.year == 2024 and start_date.month == 9:
+        return 1500.0
+    return 500.0
+
+
+def _schedule_income(start_date, end_date, rng):
+    """
+    Schedule the monthly Topups and the lump sums with the same rules as
+    generate_transactions: one Topup on day 1-5 of each of the 20 months, plus
+    the September 2024 and August 2025 lump sums when they fall in range.
+
+    Returns (dates, is_lump_sum) sorted by date.
+    """
+    events = []
+    year, month = start_date.year, start_date.month
+    for _ in range(20):
+        topup_date = datetime(year, month, int(rng.integers(1, 6)))
+        if topup_date <= end_date:
+            events.append((topup_date, False))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    for lump_sum_date in (datetime(2024, 9, int(rng.integers(1, 6))), datetime(2025, 8, int(rng.integers(1, 6)))):
+        if start_date <= lump_sum_date <= end_date:
+            events.append((lump_sum_date, True))
+
+    # Lump sums sort before a Topup on the same day, as in the loop generator
+    events.sort(key=lambda e: (e[0], not e[1]))
+    return [e[0] for e in events], np.array([e[1] for e in events], dtype=bool)
+
+
+def _build_plan(num_transactions, start_date, end_date, rng):
+    """
+    Lay out the whole timeline at day granularity: how many rows land on each day,
+    which of them are scheduled income, and the per-day country/city/calendar fields.
+    Rows are generated from this plan, so any row range can be produced on its own.
+    """
+    days = pd.date_range(start_date, end_date, freq='D')
+    num_days = len(days)
+
+    income_dates, income_is_lump = _schedule_income(start_date, end_date, rng)
+    income_day = np.array([(d - start_date).days for d in income_dates], dtype=np.int64)
+    scheduled_per_day = np.bincount(income_day, minlength=num_days)
+
+    # 70% of ordinary transactions fall on weekdays, 30% on weekends
+    is_weekday = days.dayofweek.values < 5
+    day_weights = np.where(is_weekday, 0.7 / 5, 0.3 / 2)
+    day_weights = day_weights / day_weights.sum()
+    num_random = max(num_transactions - len(income_dates), 0)
+    rows_per_day = rng.multinomial(num_random, day_weights) + scheduled_per_day
+
+    # Country index per day from COUNTRY_TIMELINE (default to last country beyond the timeline)
+    day_country = np.full(num_days, -1, dtype=np.int64)
+    for i, period in enumerate(COUNTRY_TIMELINE):
+        in_period = (days >= period['start']) & (days < period['end']) & (day_country < 0)
+        day_country[in_period] = i
+    day_country[day_country < 0] = len(COUNTRY_TIMELINE) - 1
+
+    return {
+        'days': days,
+        'rows_per_day': rows_per_day,
+        'row_offsets': np.concatenate([[0], np.cumsum(rows_per_day)]),
+        'scheduled_per_day': scheduled_per_day,
+        'scheduled_offsets': np.concatenate([[0], np.cumsum(scheduled_per_day)]),
+        'income_is_lump': income_is_lump,
+        'day_country': day_country,
+        'total_rows': int(rows_per_day.sum()),
+        'opening_balance': _opening_balance(start_date),
+    }
+
+
+def _merchant_lookup(countries, categories):
+    """Flatten the merchant lists into one array indexed by (country, category) offsets."""
+    names, offsets, sizes = [], [], []
+    for country in countries:
+        country_merchants = COUNTRY_MERCHANTS.get(country, {})
+        for category in categories:
+            merchants = country_merchants.get(category) or MERCHANTS_BY_CATEGORY.get(category, ['Merchant'])
+            offsets.append(len(names))
+            sizes.append(len(merchants))
+            names.extend(merchants)
+    return np.array(names, dtype=object), np.array(offsets), np.array(sizes)
+
+
+def _generate_rows(plan, rng, row_start, row_stop, opening_balance):
+    """Generate rows [row_start, row_stop) of a plan as a DataFrame, starting from opening_balance."""
+    n = row_stop - row_start
+    row_ids = np.arange(row_start, row_stop)
+    day = np.searchsorted(plan['row_offsets'], row_ids, side='right') - 1
+    pos_in_day = row_ids - plan['row_offsets'][day]
+
+    # Scheduled income occupies the first slots of its day
+    is_scheduled = pos_in_day < plan['scheduled_per_day'][day]
+    is_lump = np.zeros(n, dtype=bool)
+    is_lump[is_scheduled] = plan['income_is_lump'][
+        plan['scheduled_offsets'][day[is_scheduled]] + pos_in_day[is_scheduled]
+    ]
+
+    # Transaction types: Topup for scheduled income, otherwise drawn without Topup
+    type_names = list(TRANSACTION_TYPES.keys())
+    topup_code = type_names.index('Topup')
+    other_codes = np.array([i for i, t in enumerate(type_names) if t != 'Topup'])
+    other_probs = np.array([TRANSACTION_TYPES[type_names[i]] for i in other_codes])
+    type_code = other_codes[rng.choice(len(other_codes), size=n, p=other_probs / other_probs.sum())]
+    type_code[is_scheduled] = topup_code
+    is_type = {t: type_code == i for i, t in enumerate(type_names)}
+
+    # Products
+    product_code = rng.integers(0, len(PRODUCTS), size=n)
+    product_code[is_type['Interest'] | is_type['Exchange']] = PRODUCTS.index('Deposit')
+    product_code[is_scheduled] = np.where(rng.random(is_scheduled.sum()) < 0.5,
+                                          PRODUCTS.index('Current'), PRODUCTS.index('Savings'))
+
+    # Location and cost of living
+    country_code = plan['day_country'][day]
+    countries = [p['country'] for p in COUNTRY_TIMELINE]
+    multiplier = np.array([COUNTRY_MULTIPLIERS.get(c, 1.0) for c in countries])[country_code]
+
+    # Amounts and categories by type
+    category_code = np.zeros(n, dtype=np.int64)
+    cat_index = {c: i for i, c in enumerate(MERCHANT_CATEGORIES)}
+    amount = np.zeros(n)
+
+    card = is_type['Card Payment']
+    u1, u2 = rng.random(n), rng.random(n)
+    card_amount = np.where(u1 < 0.75, rng.uniform(-30, -2, n),
+                           np.where(u2 < 0.92, rng.uniform(-72, -30, n), rng.uniform(-145, -72, n)))
+    amount[card] = (card_amount * multiplier)[card]
+    card_cats = np.array([cat_index[c] for c in CARD_CATEGORY_WEIGHTS])
+    card_probs = np.array(list(CARD_CATEGORY_WEIGHTS.values()))
+    category_code[card] = card_cats[rng.choice(len(card_cats), size=card.sum(), p=card_probs / card_probs.sum())]
+
+    transfer = is_type['Transfer']
+    is_rent = (plan['days'].day.values[day] <= 5) & (rng.random(n) < 0.25)
+    transfer_amount = np.where(rng.random(n) < 0.90,
+                               np.where(is_rent, rng.uniform(-625, -618, n), rng.uniform(-112, -10, n)),
+                               rng.uniform(1, 40, n))
+    amount[transfer] = transfer_amount[transfer]
+    category_code[transfer] = cat_index['Transfers & Payments']
+
+    topup = is_type['Topup']
+    topup_amount = np.where(is_lump, rng.uniform(1995, 2005, n), rng.uniform(1000, 1005, n))
+    amount[topup] = topup_amount[topup]
+    category_code[topup] = cat_index['Income & Deposits']
+
+    simple_types = {
+        'Fee': 'Fees & Charges',
+        'Reward': 'Income & Deposits',
+        'Interest': 'Financial Services',
+        'Exchange': 'Other',
+    }
+    for transaction_type, category in simple_types.items():
+        mask = is_type[transaction_type]
+        amount[mask] = rng.uniform(*AMOUNT_RANGES[transaction_type], mask.sum())
+        category_code[mask] = cat_index[category]
+
+    refund = is_type['Card Refund']
+    amount[refund] = rng.uniform(*AMOUNT_RANGES['Card Refund'], refund.sum())
+    refund_cats = np.array([cat_index[c] for c in REFUND_CATEGORIES])
+    category_code[refund] = refund_cats[rng.integers(0, len(refund_cats), refund.sum())]
+
+    amount = np.round(amount, 2)
+
+    # Merchants by country and category
+    merchant_names, merchant_offsets, merchant_sizes = _merchant_lookup(countries, MERCHANT_CATEGORIES)
+    combo = country_code * len(MERCHANT_CATEGORIES) + category_code
+    merchant_pick = (rng.random(n) * merchant_sizes[combo]).astype(np.int64)
+    merchants = merchant_names[merchant_offsets[combo] + merchant_pick]
+
+    # Hours from HOUR_WEIGHTS
+    hour_probs = np.array(list(HOUR_WEIGHTS.values()))
+    hours = np.array(list(HOUR_WEIGHTS.keys()))[rng.choice(24, size=n, p=hour_probs / hour_probs.sum())]
+
+    # Running balance, accumulated in integer cents so it stays exact across chunks
+    balance_cents = int(round(opening_balance * 100)) + np.cumsum(np.round(amount * 100).astype(np.int64))
+
+    # Low-cardinality columns come out as categoricals to keep large chunks small
+    days = plan['days']
+    country_names = list(dict.fromkeys(countries))
+    city_names = list(dict.fromkeys(p['city'] for p in COUNTRY_TIMELINE))
+    period_country = np.array([country_names.index(p['country']) for p in COUNTRY_TIMELINE])
+    period_city = np.array([city_names.index(p['city']) for p in COUNTRY_TIMELINE])
+    return pd.DataFrame({
+        'Type': pd.Categorical.from_codes(type_code, type_names),
+        'Product': pd.Categorical.from_codes(product_code, PRODUCTS),
+        'Amount': amount,
+        'Balance': balance_cents / 100,
+        'Year': days.year.values[day],
+        'Month': days.month.values[day],
+        'Day': days.day.values[day],
+        'Weekday': days.day_name().values[day],
+        'Hour': hours,
+        'Amount_Abs': np.abs(amount),
+        'Description_Anon': merchants,
+        'Merchant_Category': pd.Categorical.from_codes(category_code, MERCHANT_CATEGORIES),
+        'Country': pd.Categorical.from_codes(period_country[country_code], country_names),
+        'City': pd.Categorical.from_codes(period_city[country_code], city_names),
+    })
+
+
+def generate_transactions_vectorized(num_transactions, start_date, end_date, seed=None):
+    """
+    Generate transactions with whole-array NumPy draws instead of a per-row loop.
+
+    Follows the same timeline rules as generate_transactions (monthly Topups,
+    lump sums, COUNTRY_TIMELINE locations and COUNTRY_MULTIPLIERS) and is
+    reproducible for a given seed.
+    """
+    rng = np.random.default_rng(seed)
+    plan = _build_plan(num_transactions, start_date, end_date, rng)
+    return _generate_rows(plan, rng, 0, plan['total_rows'], plan['opening_balance'])
+
+def stream_transactions(num_transactions, start_date, end_date, chunk_size=1_000_000, seed=None):
+    """
+    Yield the dataset as DataFrames of at most chunk_size rows, in date order.
+
+    Only the day-level plan and one chunk are held in memory at a time; the
+    running balance carries across chunk boundaries. Output is reproducible for
+    a given (seed, chunk_size).
+    """
+    plan_seed, rows_seed = np.random.SeedSequence(seed).spawn(2)
+    plan = _build_plan(num_transactions, start_date, end_date, np.random.default_rng(plan_seed))
+    chunk_seeds = rows_seed.spawn(-(-plan['total_rows'] // chunk_size))
+
+    balance = plan['opening_balance']
+    for chunk_seed, row_start in zip(chunk_seeds, range(0, plan['total_rows'], chunk_size)):
+        row_stop = min(row_start + chunk_size, plan['total_rows'])
+        chunk = _generate_rows(plan, np.random.default_rng(chunk_seed), row_start, row_stop, balance)
+        balance = float(chunk['Balance'].iloc[-1])
+        yield chunk
+
+
+def write_transactions_streaming(num_transactions, start_date, end_date, csv_path=None, parquet_path=None,
+                                 chunk_size=1_000_000, seed=None):
+    """
+    Stream generated transactions straight to CSV and/or Parquet without
+    materializing the full dataset. The Parquet file uses the same typed layout
+    as data_store (categoricals + Date column) so the dashboard can memory-map it.
+
+    Returns running totals: rows, income, expenses and final balance.
+    """
+    if parquet_path and not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is required to write Parquet output (pip install pyarrow)")
+
+    totals = {'rows': 0, 'income': 0.0, 'expenses': 0.0, 'final_balance': 0.0}
+    parquet_writer = None
+    parquet_tmp = parquet_path + '.tmp' if parquet_path else None
+    try:
+        for i, chunk in enumerate(stream_transactions(num_transactions, start_date, end_date, chunk_size, seed)):
+            if csv_path:
+                chunk.to_csv(csv_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            if parquet_path:
+                table = pa.Table.from_pandas(normalize_transactions(chunk), preserve_index=False)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(parquet_tmp, table.schema)
+                parquet_writer.write_table(table)
+
+            totals['rows'] += len(chunk)
+            totals['income'] += chunk['Amount'].clip(lower=0).sum()
+            totals['expenses'] += -chunk['Amount'].clip(upper=0).sum()
+            totals['final_balance'] = float(chunk['Balance'].iloc[-1])
+            print(f"  ... {totals['rows']:,} rows written")
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    # Finish the Parquet file last so it is never older than the CSV it mirrors
+    if parquet_writer is not None:
+        os.replace(parquet_tmp, parquet_path)
+    return totals
+
+def parse_args():
+    """Command-line options for the generator."""
+    parser = argparse.ArgumentParser(description="Generate dummy financial transaction data.")
+    parser.add_argument('--rows', type=int, default=NUM_TRANSACTIONS,
+                        help=f"number of transactions to generate (default: {NUM_TRANSACTIONS})")
+    parser.add_argument('--vectorized', action='store_true',
+                        help="use the NumPy bulk generator (recommended for large row counts)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="random seed for reproducible output (vectorized and streaming modes)")
+    parser.add_argument('--output', default='Dataset - Dummy Data.csv', help="output CSV path")
+    parser.add_argument('--stream', action='store_true',
+                        help="write in fixed-size chunks so the dataset never has to fit in memory")
+    parser.add_argument('--chunk-size', type=int, default=1_000_000,
+                        help="rows per chunk in streaming mode (default: 1,000,000)")
+    parser.add_argument('--parquet', default=None,
+                        help="also write a Parquet copy in streaming mode (default: next to the CSV if pyarrow is installed)")
+    return parser.parse_args()
+
 def main():
     """Generate and save dummy data."""
+    args = parse_args()
     print("Generating dummy transaction data...")
-    print(f"Transactions: {NUM_TRANSACTIONS}")
+    print(f"Transactions: {args.rows}")
     print(f"Date range: {START_DATE.date()} to {END_DATE.date()}")
     
-    df = generate_transactions(NUM_TRANSACTIONS, START_DATE, END_DATE)
+    if args.stream:
+        parquet_path = args.parquet or (parquet_path_for(args.output) if PYARROW_AVAILABLE else None)
+        totals = write_transactions_streaming(args.rows, START_DATE, END_DATE, csv_path=args.output,
+                                              parquet_path=parquet_path, chunk_size=args.chunk_size,
+                                              seed=args.seed)
+        print(f"\n✅ Dummy data generated successfully!")
+        print(f"📁 Saved to: {args.output}" + (f" and {parquet_path}" if parquet_path else ""))
+        print(f"📊 Total transactions: {totals['rows']:,}")
+        print(f"💰 Final balance: €{totals['final_balance']:,.2f}")
+        print(f"📈 Total income: €{totals['income']:,.2f}")
+        print(f"📉 Total expenses: €{totals['expenses']:,.2f}")
+        return
+    
+    if args.vectorized:
+        df = generate_transactions_vectorized(args.rows, START_DATE, END_DATE, seed=args.seed)
+    else:
+        df = generate_transactions(args.rows, START_DATE, END_DATE)
     
     # Save to CSV
-    output_file = 'Dataset - Dummy Data.csv'
+    output_file = args.output
     df.to_csv(output_file, index=False)
     
     print(f"\n✅ Dummy data generated successfully!")
@@ -0,0 +1,242 @@
+"""
+Prefix-sum index for the period KPIs of any date range.
+
+The Date-sorted table is reduced once per dataset version to one slot per
+calendar day (from its first to its last day), overall and per merchant
+category. Sums and counts are kept as cumulative arrays, so the total over a
+range of days is the difference of two entries; money is summed in integer
+cents, which keeps those differences exact. Largest expense/income come from
+a sparse table of per-day maxima (two overlapping power-of-two blocks cover
+any range), and the first/last active day of a range from precomputed
+next/previous pointers. Every KPI of analytics.period_totals is therefore
+answered with a fixed number of lookups, whatever the data size.
+
+Rows appended to the table are scanned on their own and folded into the
+per-day sums; only the per-day tables (days x categories, independent of the
+number of rows) are rebuilt.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from calendar_dimension import day_keys
+from data_store import amount_cents, to_cents
+
+# Per-day sums kept as prefix arrays (attribute '_<name>'), and per-day maxima kept as sparse tables
+DAILY_SUMS = ['count', 'amount_count', 'amount_cents', 'income_cents', 'expense_cents', 'expense_abs_cents',
+              'expense_count']
+DAILY_MAXIMA = ['largest_expense', 'largest_income']
+
+
+def _prefix(daily):
+    """Cumulative sums along the day axis, with a leading zero column."""
+    prefix = np.zeros((daily.shape[0], daily.shape[1] + 1), dtype=daily.dtype)
+    np.cumsum(daily, axis=1, out=prefix[:, 1:])
+    return prefix
+
+
+def _next_active(active):
+    """For every day, the first active day at or after it (n_days when there is none)."""
+    n_days = active.shape[1]
+    days = np.where(active, np.arange(n_days), n_days)
+    return np.minimum.accumulate(days[:, ::-1], axis=1)[:, ::-1]
+
+
+def _previous_active(active):
+    """For every day, the last active day at or before it (-1 when there is none)."""
+    days = np.where(active, np.arange(active.shape[1]), -1)
+    return np.maximum.accumulate(days, axis=1)
+
+
+def _sparse_table(daily_max):
+    """Level k holds the maximum of every run of 2**k consecutive days."""
+    levels = [daily_max]
+    width = 1
+    while 2 * width <= daily_max.shape[1]:
+        previous = levels[-1]
+        levels.append(np.maximum(previous[:, :-width], previous[:, width:]))
+        width *= 2
+    return levels
+
+
+def _pad(daily, n_rows, n_days):
+    """A per-day table grown (with zeros) to n_rows x n_days."""
+    padded = np.zeros((n_rows, n_days), dtype=daily.dtype)
+    padded[:daily.shape[0], :daily.shape[1]] = daily
+    return padded
+
+
+class KPIIndex:
+    """Per-day prefix sums and range-max tables of a Date-sorted transaction table."""
+
+    def __init__(self, df, category_column='Merchant_Category'):
+        self.category_column = category_column
+        column = df[category_column] if category_column in df.columns else None
+        if column is not None and isinstance(column.dtype, pd.CategoricalDtype):
+            self.categories = column.cat.categories
+            codes = column.cat.codes.to_numpy()
+        elif column is not None:
+            codes, self.categories = pd.factorize(column)
+        else:
+            self.categories, codes = pd.Index([]), np.full(len(df), -1)
+
+        days = day_keys(df['Date'].to_numpy())
+        valid_days = days[~np.isnat(df['Date'].to_numpy())]
+        self.first_day = int(valid_days[0]) if len(valid_days) else 0
+        self.n_days = int(valid_days[-1]) - self.first_day + 1 if len(valid_days) else 0
+        self.n_rows = len(df)
+        self._build(self._scan(df, codes, self.n_days))
+
+    def _scan(self, rows, codes, n_days):
+        """
+        Per-day sums and maxima of `rows` over days [first_day, first_day + n_days):
+        row 0 is 'All', row i + 1 category i (rows without a category only count in 'All').
+        """
+        dates = rows['Date'].to_numpy()
+        valid = ~np.isnat(dates)
+        day = day_keys(dates[valid]) - self.first_day
+        codes = np.asarray(codes, dtype=np.int64)[valid]
+
+        amount = rows['Amount'].to_numpy(dtype=float)[valid]
+        amount_abs = rows['Amount_Abs'].to_numpy(dtype=float)[valid]
+        expense, income = amount < 0, amount > 0
+        cents = amount_cents(rows)[valid]
+
+        n_rows = len(self.categories) + 1
+        has_category = codes >= 0
+        slot_all = day
+        slot_category = (codes[has_category] + 1) * n_days + day[has_category]
+
+        def daily_sum(weights):
+            totals = np.zeros(n_rows * n_days, dtype=np.int64)
+            for slots, keep in ((slot_all, slice(None)), (slot_category, has_category)):
+                w = None if weights is None else weights[keep]
+                totals += np.bincount(slots, weights=w, minlength=n_rows * n_days).astype(np.int64)
+            return totals.reshape(n_rows, n_days)
+
+        def daily_max(values):
+            maxima = np.zeros(n_rows * n_days)
+            np.maximum.at(maxima, slot_all, values)
+            np.maximum.at(maxima, slot_category, values[has_category])
+            return maxima.reshape(n_rows, n_days)
+
+        return {
+            'count': daily_sum(None),
+            'amount_count': daily_sum((~np.isnan(amount)).astype(float)),
+            'amount_cents': daily_sum(cents),
+            'income_cents': daily_sum(np.where(income, cents, 0)),
+            'expense_cents': daily_sum(np.where(expense, cents, 0)),
+            'expense_abs_cents': daily_sum(np.where(expense, to_cents(amount_abs), 0)),
+            'expense_count': daily_sum(expense.astype(float)),
+            # Amounts are strictly signed, so 0 doubles as "none in this range"
+            'largest_expense': daily_max(np.where(expense, -amount, 0)),
+            'largest_income': daily_max(np.where(income, amount, 0)),
+        }
+
+    def _build(self, daily):
+        """Prefix arrays, pointers and sparse tables from per-day sums and maxima."""
+        for name in DAILY_SUMS:
+            setattr(self, f'_{name}', _prefix(daily[name]))
+        for name in DAILY_MAXIMA:
+            setattr(self, f'_{name}', _sparse_table(daily[name]))
+        active = daily['count'] > 0
+        self._active_days = _prefix(active.astype(np.int64))
+        self._next_active = _next_active(active)
+        self._previous_active = _previous_active(active)
+        self._previous_expense = _previous_active(daily['expense_count'] > 0)
+
+    def _daily(self):
+        """The per-day sums and maxima the index was built from."""
+        daily = {name: np.diff(getattr(self, f'_{name}'), axis=1) for name in DAILY_SUMS}
+        daily.update({name: getattr(self, f'_{name}')[0] for name in DAILY_MAXIMA})
+        return daily
+
+    def extended(self, df):
+        """
+        Index of `df`, the indexed table with rows appended at the end (dated on or
+        after its last day). Only the new rows are scanned.
+        """
+        new_rows = df.iloc[self.n_rows:]
+        if len(new_rows) == 0:
+            return self
+        new_days = day_keys(new_rows['Date'].dropna().to_numpy())
+        if self.n_days == 0 or (len(new_days) and new_days.min() < self.first_day + self.n_days - 1):
+            return KPIIndex(df, self.category_column)
+
+        index = copy.copy(self)
+        index.n_rows = len(df)
+        if len(new_days):
+            index.n_days = max(self.n_days, int(new_days.max()) - self.first_day + 1)
+        codes = np.full(len(new_rows), -1, dtype=np.int64)
+        if self.category_column in new_rows.columns:
+            values = new_rows[self.category_column].astype(object)
+            unseen = pd.Index(values[values.notna()].unique()).difference(self.categories)
+            # New categories get rows after the existing ones, so earlier rows keep their place
+            index.categories = self.categories.append(unseen) if len(unseen) else self.categories
+            codes = index.categories.get_indexer(values)
+
+        daily = self._daily()
+        appended = index._scan(new_rows, codes, index.n_days)
+        n_rows = len(index.categories) + 1
+        for name in DAILY_SUMS:
+            daily[name] = _pad(daily[name], n_rows, index.n_days) + appended[name]
+        for name in DAILY_MAXIMA:
+            daily[name] = np.maximum(_pad(daily[name], n_rows, index.n_days), appended[name])
+        index._build(daily)
+        return index
+
+    def _row(self, category):
+        """Row of a category in the per-day arrays (None for a category without transactions)."""
+        if category == 'All':
+            return 0
+        if category not in self.categories:
+            return None
+        return self.categories.get_loc(category) + 1
+
+    def _day_range(self, start_date, end_date):
+        """Inclusive date range as day slots [lo, hi), clipped to the indexed days."""
+        start = int(day_keys([pd.Timestamp(start_date).to_datetime64()])[0]) - self.first_day
+        end = int(day_keys([pd.Timestamp(end_date).to_datetime64()])[0]) - self.first_day + 1
+        return min(max(start, 0), self.n_days), min(max(end, 0), self.n_days)
+
+    def _range_max(self, levels, row, lo, hi):
+        level = (hi - lo).bit_length() - 1
+        table = levels[level]
+        return float(max(table[row, lo], table[row, hi - (1 << level)]))
+
+    def _day(self, slot):
+        return pd.Timestamp(np.datetime64(self.first_day + int(slot), 'D'))
+
+    def totals(self, start_date, end_date, category='All'):
+        """The period aggregates of analytics.period_totals, from a fixed number of lookups."""
+        row = self._row(category)
+        lo, hi = self._day_range(start_date, end_date)
+        if row is None or lo >= hi or self._count[row, hi] == self._count[row, lo]:
+            return {'transactions': 0, 'largest_expense': 0, 'largest_income': 0}
+
+        def between(prefix, first=lo):
+            return prefix[row, hi] - prefix[row, first]
+
+        amount_count = between(self._amount_count)
+        totals = {
+            'transactions': int(between(self._count)),
+            'total_income': between(self._income_cents) / 100,
+            'total_expenses': abs(between(self._expense_cents)) / 100,
+            'first_date': self._day(self._next_active[row, lo]),
+            'last_date': self._day(self._previous_active[row, hi - 1]),
+            'unique_days': int(between(self._active_days)),
+            'mean_amount': between(self._amount_cents) / 100 / amount_count if amount_count else np.nan,
+            'largest_expense': self._range_max(self._largest_expense, row, lo, hi),
+            'largest_income': self._range_max(self._largest_income, row, lo, hi),
+        }
+        last_expense = self._previous_expense[row, hi - 1]
+        if last_expense >= lo:
+            last_expense_date = self._day(last_expense)
+            # Expenses of the most recent month in the range, not the actual current month
+            month_start = int(day_keys([last_expense_date.to_period('M').start_time.to_datetime64()])[0])
+            totals['last_expense_date'] = last_expense_date
+            totals['current_month_expenses'] = between(self._expense_abs_cents,
+                                                       max(month_start - self.first_day, lo)) / 100
+        return totals
@@ -0,0 +1,211 @@
+"""
+Partitioned multi-account dataset layout.
+
+Statement exports live in a directory tree partitioned by account, year and
+month (Hive-style directory names, so Arrow-based tools read the same tree):
+
+    statements/
+    └── account=Main/
+        └── year=2025/
+            └── month=03/
+                └── statement.csv
+
+Each partition is parsed and normalized on its own (with its own Parquet
+copy), in parallel across a process pool on cold start. Loading a date range
+only reads the partitions whose month overlaps it.
+"""
+
+import argparse
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+from data_store import (PYARROW_AVAILABLE, convert_csv_to_parquet, is_parquet_current, parquet_path_for, read_parquet,
+                        read_transactions, sort_by_date, to_columnar_schema)
+
+# Partition keys, outermost first
+PARTITION_KEYS = ['account', 'year', 'month']
+
+# Statement files picked up inside a partition directory
+STATEMENT_EXTENSIONS = ('.csv',)
+
+
+class Partition:
+    """One account/month directory and the statement files in it (year/month None when not partitioned by them)."""
+
+    def __init__(self, path, account=None, year=None, month=None, files=()):
+        self.path = path
+        self.account = account
+        self.year = year
+        self.month = month
+        self.files = list(files)
+
+    def overlaps(self, start_date=None, end_date=None):
+        """True when the partition's month intersects the inclusive [start_date, end_date] range."""
+        if self.year is None or self.month is None:
+            return True
+        period = pd.Period(year=self.year, month=self.month, freq='M')
+        if start_date is not None and period.end_time < pd.Timestamp(start_date):
+            return False
+        if end_date is not None and period.start_time > pd.Timestamp(end_date):
+            return False
+        return True
+
+
+def parse_partition_dir(name):
+    """(key, value) of a `key=value` directory name, or None."""
+    key, sep, value = name.partition('=')
+    if not sep or key not in PARTITION_KEYS:
+        return None
+    return key, value
+
+
+def discover_partitions(root):
+    """Partitions under a dataset root, ordered by (year, month, account). Raises FileNotFoundError if there are none."""
+    if not os.path.isdir(root):
+        raise FileNotFoundError(root)
+    partitions = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        files = sorted(os.path.join(dirpath, f) for f in filenames if f.lower().endswith(STATEMENT_EXTENSIONS))
+        if not files:
+            continue
+        keys = dict(filter(None, (parse_partition_dir(part) for part in os.path.relpath(dirpath, root).split(os.sep))))
+        partitions.append(Partition(
+            dirpath,
+            account=keys.get('account'),
+            year=int(keys['year']) if 'year' in keys else None,
+            month=int(keys['month']) if 'month' in keys else None,
+            files=files,
+        ))
+    if not partitions:
+        raise FileNotFoundError(f"No statement files under {root}")
+    partitions.sort(key=lambda p: (p.year or 0, p.month or 0, p.account or ''))
+    return partitions
+
+
+def partitions_mtime(root):
+    """
+    Version stamp of a dataset tree: the latest modification time (ns) of its statement
+    files, their number and a checksum of their paths, so added/removed files count
+    (0 if missing). Derived copies and directory times are left out - writing a
+    partition's Parquet copy during a load does not make the tree look changed.
+    """
+    if not os.path.isdir(root):
+        return 0
+    latest, paths = 0, []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for f in sorted(filenames):
+            if f.lower().endswith(STATEMENT_EXTENSIONS):
+                path = os.path.join(dirpath, f)
+                latest = max(latest, os.stat(path).st_mtime_ns)
+                paths.append(os.path.relpath(path, root))
+    return latest, len(paths), zlib.crc32('\n'.join(paths).encode())
+
+
+def load_partition(partition, columns=None):
+    """
+    Read and normalize the statement files of one partition (runs in a worker process).
+    With `columns`, only those columns are read from the files' up-to-date Parquet copies.
+    """
+    if columns is None:
+        frames = [read_transactions(path, snapshot=False) for path in partition.files]
+    else:
+        frames = [read_parquet(parquet_path_for(path), columns) for path in partition.files]
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if partition.account is not None and 'Account' not in df.columns:
+        df['Account'] = partition.account
+    return df
+
+
+def load_partitioned(root, start_date=None, end_date=None, max_workers=None, columns=None):
+    """
+    Load a partitioned dataset sorted by Date, reading only the partitions that
+    overlap the optional inclusive date range (rows outside it are dropped).
+    Partitions are loaded in a process pool when there is more than one. With
+    `columns` (which must include Date) only those are read, from the Parquet copies.
+    """
+    discovered = discover_partitions(root)
+    partitions = [p for p in discovered if p.overlaps(start_date, end_date)]
+    if not partitions:
+        # Nothing in the range: an empty table with the tree's schema (taken from its latest partition)
+        return to_columnar_schema(load_partition(discovered[-1], columns)).iloc[:0].reset_index(drop=True)
+
+    max_workers = min(len(partitions), max_workers or os.cpu_count() or 1)
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            frames = list(pool.map(partial(load_partition, columns=columns), partitions))
+    else:
+        frames = [load_partition(p, columns) for p in partitions]
+
+    # Categoricals with differing dictionaries concatenate as object; re-encode them once here
+    df = sort_by_date(to_columnar_schema(pd.concat(frames, ignore_index=True)))
+    if start_date is not None or end_date is not None:
+        dates = df['Date']
+        keep = pd.Series(True, index=df.index)
+        if start_date is not None:
+            keep &= dates >= pd.Timestamp(start_date)
+        if end_date is not None:
+            keep &= dates < pd.Timestamp(end_date) + pd.Timedelta(days=1)
+        df = df[keep].reset_index(drop=True)
+    return df
+
+
+def parquet_sources(data_file, write=False):
+    """
+    Up-to-date Parquet copies of a data file (or of every file in a partitioned
+    statement tree), or None when any is missing or older than its CSV. With
+    write=True missing or stale copies are converted first (None when they
+    cannot be written).
+    """
+    if os.path.isdir(data_file):
+        csv_files = [path for partition in discover_partitions(data_file) for path in partition.files]
+    else:
+        csv_files = [data_file]
+    stale = [path for path in csv_files if not is_parquet_current(path)]
+    if stale and not (write and PYARROW_AVAILABLE):
+        return None
+    try:
+        for path in stale:
+            convert_csv_to_parquet(path)
+    except OSError:
+        # Read-only deployments keep scanning the loaded table instead
+        return None
+    return [parquet_path_for(path) for path in csv_files]
+
+
+def write_partitioned(df, root, account):
+    """Split one account's statement rows into account/year/month partition files."""
+    written = []
+    for (year, month), rows in df.groupby(['Year', 'Month'], sort=True):
+        path = os.path.join(root, f'account={account}', f'year={int(year)}', f'month={int(month):02d}')
+        os.makedirs(path, exist_ok=True)
+        csv_path = os.path.join(path, 'statement.csv')
+        rows.to_csv(csv_path, index=False)
+        written.append(csv_path)
+    return written
+
+
+def main():
+    """Split statement CSVs into the partitioned layout."""
+    parser = argparse.ArgumentParser(description="Split statement CSVs into an account/year/month partitioned dataset.")
+    parser.add_argument('csv_files', nargs='+', help="statement CSV files (one account each)")
+    parser.add_argument('--root', default='statements', help="dataset root directory (default: statements)")
+    parser.add_argument('--account', action='append', default=None,
+                        help="account name per CSV file (default: the file name)")
+    args = parser.parse_args()
+
+    accounts = args.account or [os.path.splitext(os.path.basename(path))[0] for path in args.csv_files]
+    if len(accounts) != len(args.csv_files):
+        parser.error("give one --account per CSV file")
+    for csv_path, account in zip(args.csv_files, accounts):
+        written = write_partitioned(pd.read_csv(csv_path), args.root, account)
+        print(f"✅ {csv_path} → {args.root}/account={account} ({len(written)} partitions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Lightweight timing spans for dashboard reruns.
+
+Each script run gets a RunTrace; code wraps its stages in `span(name)` and the
+trace records wall time, nesting depth and optional row counts per stage, plus
+hit/miss counts of the caches consulted along the way. A partial rerun (a
+Streamlit fragment) gets a trace of its own, whose scope names the fragment. The active trace lives
+in a context variable, so concurrent sessions (one script thread each) never
+see each other's spans, and `span` is a cheap no-op when no trace is active
+(a run started with tracing disabled). The scope of the current run is known
+either way. Finished traces can be appended to a JSONL log for offline analysis.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_active_trace = ContextVar('active_trace', default=None)
+
+# Scope of the run in progress (None between runs), whether or not it is traced
+_active_scope = ContextVar('active_scope', default=None)
+
+# Serializes appends to the JSONL log across sessions
+_log_lock = threading.Lock()
+
+
+class Span:
+    """One timed stage of a run."""
+
+    __slots__ = ('name', 'depth', 'start_ms', 'duration_ms', 'rows', '_start', '_trace')
+
+    def __init__(self, trace, name, depth, start_ms):
+        self._trace = trace
+        self.name = name
+        self.depth = depth
+        self.start_ms = start_ms
+        self.duration_ms = None
+        self.rows = None
+        self._start = time.perf_counter()
+
+    def end(self):
+        if self.duration_ms is None:
+            self.duration_ms = (time.perf_counter() - self._start) * 1000
+            if self in self._trace._open:
+                self._trace._open.remove(self)
+
+    def to_dict(self):
+        return {'name': self.name, 'depth': self.depth, 'start_ms': round(self.start_ms, 3),
+                'duration_ms': None if self.duration_ms is None else round(self.duration_ms, 3), 'rows': self.rows}
+
+
+class _NullSpan:
+    """Stand-in yielded by `span` when no trace is active; attribute writes are ignored."""
+
+    def __setattr__(self, name, value):
+        pass
+
+    def end(self):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class RunTrace:
+    """Spans and cache statistics of one script run (`scope` names what was rerun)."""
+
+    def __init__(self, scope='app', **context):
+        self.scope = scope
+        self.context = context
+        self.started_at = time.time()
+        self.spans = []
+        self.caches = {}
+        self._open = []
+        self._start = time.perf_counter()
+        self._misses = {}
+        self._finished_ms = None
+
+    def begin(self, name, rows=None):
+        """Start a span that is closed explicitly with `.end()` (for stages that are not one block)."""
+        span = Span(self, name, len(self._open), (time.perf_counter() - self._start) * 1000)
+        span.rows = rows
+        self.spans.append(span)
+        self._open.append(span)
+        return span
+
+    def record_miss(self, cache):
+        """Called from inside a cached function body: the surrounding lookup was a miss."""
+        self._misses[cache] = self._misses.get(cache, 0) + 1
+
+    def record_cache(self, cache, hit):
+        stats = self.caches.setdefault(cache, {'hits': 0, 'misses': 0})
+        stats['hits' if hit else 'misses'] += 1
+
+    def finish(self):
+        """Mark the run complete; its total time is fixed and later reruns need a trace of their own."""
+        if self._finished_ms is None:
+            self._finished_ms = self.total_ms
+
+    @property
+    def finished(self):
+        return self._finished_ms is not None
+
+    @property
+    def total_ms(self):
+        if self._finished_ms is not None:
+            return self._finished_ms
+        return (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self):
+        return {
+            'ts': self.started_at,
+            'scope': self.scope,
+            **self.context,
+            'total_ms': round(self.total_ms, 3),
+            'spans': [span.to_dict() for span in self.spans],
+            'caches': self.caches,
+        }
+
+
+def start_trace(scope='app', enabled=True, **context):
+    """
+    Start a run of `scope` and make a new trace active for it; returns the trace. With
+    enabled=False no trace is kept (None is returned) and spans are no-ops.
+    """
+    trace = RunTrace(scope, **context) if enabled else None
+    _active_scope.set(scope)
+    _active_trace.set(trace)
+    return trace
+
+
+def end_run():
+    """Mark the current run complete; code running after it (a fragment rerun) starts a run of its own."""
+    _active_scope.set(None)
+
+
+def current_scope():
+    """Scope of the run in progress ('app', 'fragment:<name>', ...), None when no run is."""
+    return _active_scope.get()
+
+
+@contextmanager
+def span(name, rows=None, cache=None):
+    """
+    Time a block as a span of the active trace. With `cache`, the block is one lookup
+    of that cache: a hit unless the cached function called `record_miss(cache)`.
+    """
+    trace = _active_trace.get()
+    if trace is None:
+        yield _NULL_SPAN
+        return
+    misses_before = trace._misses.get(cache, 0) if cache else 0
+    current = trace.begin(name, rows)
+    try:
+        yield current
+    finally:
+        current.end()
+        if cache:
+            trace.record_cache(cache, hit=trace._misses.get(cache, 0) == misses_before)
+
+
+def record_miss(cache):
+    trace = _active_trace.get()
+    if trace is not None:
+        trace.record_miss(cache)
+
+
+def record_cache(cache, hit):
+    """Count one lookup of a cache that knows whether it hit (e.g. the figure cache)."""
+    trace = _active_trace.get()
+    if trace is not None:
+        trace.record_cache(cache, hit)
+
+
+def append_jsonl(path, trace):
+    """Append a finished trace to a JSONL log (one run per line)."""
+    line = json.dumps(trace.to_dict(), default=str)
+    with _log_lock:
+        with open(path, 'a') as f:
+            f.write(line + '\n')
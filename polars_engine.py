@@ -0,0 +1,168 @@
+"""
+Optional Polars backend for the dashboard aggregations.
+
+Queries are built as lazy frames over the dataset's Parquet copies (or over
+the loaded table through Arrow when no up-to-date copy exists), so Polars
+pushes the date/category predicates and column selection into the scan and
+runs the group-bys on all cores. Results are converted back to pandas with
+the same columns, dtypes and row order as the pandas backend.
+"""
+
+import pandas as pd
+
+from analytics import CUBE_KEYS, FLOW_CATEGORIES
+from calendar_dimension import add_calendar_keys
+from data_store import to_columnar_schema
+
+# Try to import Polars (optional - the pandas aggregations are used if not available)
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+# Columns the aggregate queries and the sampled rows read
+QUERY_COLUMNS = ['Date', 'Merchant_Category', 'Country', 'City', 'Type', 'Hour', 'Weekday',
+                 'Amount', 'Amount_Abs', 'Balance', 'Description_Anon']
+
+
+class PolarsEngine:
+    """Lazy Polars queries over one dataset version, answering the dashboard's aggregate queries."""
+
+    name = 'polars'
+
+    def __init__(self, parquet_files=None, df=None):
+        if parquet_files:
+            self.source = 'parquet'
+            self._frame = pl.scan_parquet(list(parquet_files))
+        else:
+            self.source = 'memory'
+            columns = [col for col in QUERY_COLUMNS if col in df.columns]
+            self._frame = pl.from_pandas(df[columns]).lazy()
+        # Text columns compared as strings whatever their stored (categorical) encoding
+        schema = self._frame.collect_schema()
+        self._frame = self._frame.with_columns(
+            [pl.col(col).cast(pl.String) for col in QUERY_COLUMNS
+             if col in schema and col not in ('Date', 'Hour', 'Amount', 'Amount_Abs', 'Balance')]
+            + [pl.col('Date').cast(pl.Datetime('ns'))]
+        )
+
+    def _filtered(self, start_date, end_date, category='All'):
+        start = pd.Timestamp(start_date).to_pydatetime()
+        end = (pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_pydatetime()
+        predicate = (pl.col('Date') >= start) & (pl.col('Date') < end)
+        if category != 'All':
+            predicate &= pl.col('Merchant_Category') == category
+        return self._frame.filter(predicate)
+
+    def _keyed(self, start_date, end_date, category='All'):
+        # Rows with a missing cube key are left out of the cube (and the monthly summary built from it)
+        keys = [key for key in CUBE_KEYS if key != 'Flow']
+        return self._filtered(start_date, end_date, category).drop_nulls(subset=keys)
+
+    def cube(self, start_date, end_date, category='All'):
+        """The aggregation cube of analytics.build_cube, restricted to the filters."""
+        amount = pl.col('Amount')
+        cube = (
+            self._keyed(start_date, end_date, category)
+            .with_columns(
+                Flow=pl.when(amount < 0).then(pl.lit('Expense')).when(amount > 0).then(pl.lit('Income'))
+                .otherwise(pl.lit('Zero')),
+            )
+            # First-appearance group order, then a stable Date sort - the row order of build_cube
+            .group_by(CUBE_KEYS, maintain_order=True)
+            .agg(
+                Amount=pl.col('Amount').sum(),
+                Amount_Abs=pl.col('Amount_Abs').sum(),
+                Max_Abs=pl.col('Amount_Abs').max(),
+                Count=pl.len(),
+            )
+            .sort('Date', maintain_order=True)
+            .collect()
+            .to_pandas()
+        )
+        cube['Flow'] = pd.Categorical(cube['Flow'], categories=FLOW_CATEGORIES)
+        return add_calendar_keys(to_columnar_schema(cube, cents=False))
+
+    def totals(self, start_date, end_date, category='All'):
+        """The period aggregates of analytics.period_totals."""
+        amount, date = pl.col('Amount'), pl.col('Date')
+        last_expense_date = date.filter(amount < 0).max()
+        row = self._filtered(start_date, end_date, category).select(
+            transactions=pl.len(),
+            total_income=amount.filter(amount > 0).sum(),
+            total_expenses=amount.filter(amount < 0).sum().abs(),
+            first_date=date.min(),
+            last_date=date.max(),
+            unique_days=date.n_unique(),
+            mean_amount=amount.mean(),
+            largest_expense=amount.filter(amount < 0).min().abs(),
+            largest_income=amount.filter(amount > 0).max(),
+            last_expense_date=last_expense_date,
+            current_month_expenses=pl.col('Amount_Abs').filter(
+                (amount < 0) & (date >= last_expense_date.dt.truncate('1mo'))).sum(),
+        ).collect().row(0, named=True)
+
+        totals = {'transactions': row['transactions']}
+        if totals['transactions'] > 0:
+            totals.update(
+                total_income=row['total_income'],
+                total_expenses=row['total_expenses'],
+                first_date=pd.Timestamp(row['first_date']),
+                last_date=pd.Timestamp(row['last_date']),
+                unique_days=row['unique_days'],
+                mean_amount=row['mean_amount'],
+            )
+        totals['largest_expense'] = row['largest_expense'] if row['largest_expense'] is not None else 0
+        totals['largest_income'] = row['largest_income'] if row['largest_income'] is not None else 0
+        if row['last_expense_date'] is not None:
+            totals['last_expense_date'] = pd.Timestamp(row['last_expense_date'])
+            totals['current_month_expenses'] = row['current_month_expenses']
+        return totals
+
+    def monthly_summary(self, start_date, end_date, category='All'):
+        """Monthly income, expenses and net flow (Month, Income, Expenses, Net)."""
+        amount = pl.col('Amount')
+        summary = (
+            self._keyed(start_date, end_date, category)
+            .filter(amount != 0)
+            .group_by(Month=pl.col('Date').dt.strftime('%Y-%m'))
+            .agg(
+                Income=amount.filter(amount > 0).sum(),
+                Expenses=pl.col('Amount_Abs').filter(amount < 0).sum(),
+            )
+            .sort('Month')
+            .with_columns(Net=pl.col('Income') - pl.col('Expenses'))
+            .collect()
+            .to_pandas()
+        )
+        return summary
+
+    def top_merchants(self, start_date, end_date, category='All', n=15):
+        """Merchants with the highest total spending (Merchant, Total Spent)."""
+        return (
+            self._filtered(start_date, end_date, category)
+            .filter((pl.col('Amount') < 0) & pl.col('Description_Anon').is_not_null())
+            .group_by(Merchant=pl.col('Description_Anon'))
+            .agg(pl.col('Amount_Abs').sum().alias('Total Spent'))
+            .sort('Total Spent', descending=True)
+            .head(n)
+            .collect()
+            .to_pandas()
+        )
+
+    def first_rows(self, start_date, end_date, category, columns, n, expenses_only=False):
+        """The first n rows (in Date order) with a non-zero or negative amount (see analytics.first_rows)."""
+        amount = pl.col('Amount')
+        schema = self._frame.collect_schema()
+        rows = (
+            self._filtered(start_date, end_date, category)
+            .filter(amount < 0 if expenses_only else amount.ne_missing(0))
+            # Stable, so same-day rows keep file order - the row order of the loaded table
+            .sort('Date', maintain_order=True)
+            .head(n)
+            .select([col for col in columns if col in schema])
+            .collect()
+            .to_pandas()
+        )
+        return to_columnar_schema(rows, cents=False)
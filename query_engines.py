@@ -0,0 +1,45 @@
+"""
+Query backends for the dashboard aggregations, selected by name (QUERY_ENGINE).
+
+Every backend answers the same filtered queries for one dataset version and
+returns pandas objects of identical shape, so the KPI cards and charts do not
+care which one ran:
+
+    cube(start_date, end_date, category)             aggregation cube (analytics.build_cube)
+    totals(start_date, end_date, category)           period aggregates (analytics.period_totals)
+    monthly_summary(start_date, end_date, category)  Month, Income, Expenses, Net
+    top_merchants(start_date, end_date, category, n) Merchant, Total Spent
+    first_rows(start_date, end_date, category, columns, n, expenses_only)
+                                                     rows sampled by the scatter charts
+
+DuckDB and Polars read the Parquet copies, so they need no loaded table (a
+dataset manager scan version); pandas answers from the in-memory structures.
+"""
+
+from analytics import PandasEngine
+from partitions import parquet_sources
+from polars_engine import POLARS_AVAILABLE, PolarsEngine
+from sql_engine import DUCKDB_AVAILABLE, SQLEngine
+
+# Backend name -> whether its optional dependency is installed
+QUERY_ENGINES = {
+    'pandas': True,
+    'duckdb': DUCKDB_AVAILABLE,
+    'polars': POLARS_AVAILABLE,
+}
+
+
+def create_engine(name, data_file, df, cube, kpi_index=None):
+    """
+    Query backend `name` over a dataset version. Unknown or unavailable backends
+    fall back to pandas; the Parquet-scanning backends read the table in place
+    when the data file has no up-to-date Parquet copy (and write the copies when
+    there is no table, `df` None). `kpi_index` is the version's prebuilt KPIIndex,
+    used by the pandas backend.
+    """
+    if not QUERY_ENGINES.get(name, False) or name == 'pandas':
+        return PandasEngine(df, cube, kpi_index)
+    parquet_files = parquet_sources(data_file, write=df is None)
+    if name == 'duckdb':
+        return SQLEngine(parquet_files, df=df)
+    return PolarsEngine(parquet_files, df=df)
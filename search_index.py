@@ -0,0 +1,135 @@
+"""
+Inverted token index for the Transaction Explorer search box.
+
+Each searchable column is factorized once; every distinct value is split into
+lowercase word tokens, and each token points at the value codes containing it.
+Rows are stored grouped by value code, so a token resolves to row ids by
+slicing. A query matches rows where every query word is a prefix of some token
+in the row; its cost depends on the number of matching tokens and rows rather
+than on the size of the table.
+
+Rows appended to the table are indexed as an extra segment instead of
+rebuilding the whole index; segments are compacted once there are too many.
+"""
+
+import re
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+# Columns covered by the search box
+SEARCH_COLUMNS = ['Description_Anon', 'Merchant_Category', 'Country', 'City']
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Appended segments kept before the index is rebuilt as a single segment
+MAX_SEGMENTS = 16
+
+
+def tokenize(text):
+    """Lowercase word tokens of a string."""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+class IndexSegment:
+    """Token postings for a contiguous block of rows starting at `row_start`."""
+
+    def __init__(self, df, columns, row_start=0):
+        self._grouped_rows = []
+        self._offsets = []
+        postings = {}
+        for slot, col in enumerate(c for c in columns if c in df.columns):
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                codes, uniques = df[col].cat.codes.to_numpy(), df[col].cat.categories
+            else:
+                codes, uniques = pd.factorize(df[col])
+            # Row ids grouped by value code (missing values, code -1, are left out)
+            order = np.argsort(codes, kind='stable')
+            n_missing = int((codes < 0).sum())
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            self._grouped_rows.append(order[n_missing:] + row_start)
+            self._offsets.append(np.concatenate([[0], np.cumsum(counts)]))
+            for code, value in enumerate(uniques):
+                if counts[code] == 0:
+                    continue
+                for token in set(tokenize(value)):
+                    postings.setdefault(token, {}).setdefault(slot, []).append(code)
+        self.tokens = sorted(postings)
+        self._postings = [postings[token] for token in self.tokens]
+
+    def prefix_parts(self, prefix):
+        """Row-id arrays of the values having a token that starts with `prefix`."""
+        lo = bisect_left(self.tokens, prefix)
+        hi = bisect_left(self.tokens, prefix + '\U0010ffff')
+        codes_by_slot = {}
+        for posting in self._postings[lo:hi]:
+            for slot, codes in posting.items():
+                codes_by_slot.setdefault(slot, set()).update(codes)
+        parts = []
+        for slot, codes in codes_by_slot.items():
+            rows, offsets = self._grouped_rows[slot], self._offsets[slot]
+            parts.extend(rows[offsets[code]:offsets[code + 1]] for code in codes)
+        return parts
+
+
+class SearchIndex:
+    """Token/prefix index from search words to sorted row ids of a RangeIndex frame."""
+
+    def __init__(self, df, columns=SEARCH_COLUMNS, segments=None):
+        self.columns = columns
+        self.n_rows = len(df)
+        self._segments = segments if segments is not None else [IndexSegment(df, columns)]
+
+    @property
+    def tokens(self):
+        return sorted(set().union(*(segment.tokens for segment in self._segments)))
+
+    def extended(self, df):
+        """
+        Index for `df`, a copy of the indexed table with rows appended at the end.
+        Only the new rows are tokenized; the existing segments are shared.
+        """
+        if len(df) == self.n_rows:
+            return self
+        if len(self._segments) >= MAX_SEGMENTS:
+            return SearchIndex(df, self.columns)
+        segment = IndexSegment(df.iloc[self.n_rows:], self.columns, row_start=self.n_rows)
+        return SearchIndex(df, self.columns, self._segments + [segment])
+
+    def prefix_rows(self, prefix):
+        """Sorted row ids having a token that starts with `prefix`."""
+        parts = [part for segment in self._segments for part in segment.prefix_parts(prefix)]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate(parts)
+        if len(rows) > self.n_rows // 16:
+            # Large hit lists: a membership mask beats sorting
+            member = np.zeros(self.n_rows, dtype=bool)
+            member[rows] = True
+            return np.flatnonzero(member)
+        return np.unique(rows)
+
+    def intersect(self, left, right):
+        """Intersection of two sorted row-id arrays."""
+        if min(len(left), len(right)) > self.n_rows // 16:
+            member = np.zeros(self.n_rows, dtype=bool)
+            member[left] = True
+            return right[member[right]]
+        return np.intersect1d(left, right, assume_unique=True)
+
+    def search(self, query):
+        """
+        Sorted row ids matching every word of the query as a token prefix, or None
+        when the query has no word characters (callers fall back to a substring scan).
+        """
+        words = tokenize(query)
+        if not words:
+            return None
+        matches = None
+        for word in sorted(set(words), key=len, reverse=True):
+            rows = self.prefix_rows(word)
+            matches = rows if matches is None else self.intersect(matches, rows)
+            if len(matches) == 0:
+                break
+        return matches
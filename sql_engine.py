@@ -0,0 +1,177 @@
+"""
+Optional embedded SQL backend (DuckDB) for the dashboard aggregations.
+
+The aggregation cube, KPI totals, monthly summary and top merchants are
+answered by SQL pushed down to the Parquet copies of the dataset: DuckDB
+reads only the needed columns and row groups, aggregates on all cores and
+spills to disk instead of requiring the data to fit in memory. When no
+up-to-date Parquet copy exists (no pyarrow, read-only deployment, rows
+appended since the last conversion) the loaded table is scanned in place.
+
+Results have the same shape as the pandas helpers in analytics.py, so the
+charts and KPI cards consume either backend unchanged.
+"""
+
+import threading
+
+import pandas as pd
+
+from analytics import CUBE_KEYS, FLOW_CATEGORIES
+from calendar_dimension import add_calendar_keys
+from data_store import to_columnar_schema
+
+# Try to import DuckDB (optional - the pandas aggregations are used if not available)
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+# Sign of a transaction, matching analytics.FLOW_CATEGORIES
+FLOW_SQL = "CASE WHEN Amount < 0 THEN 'Expense' WHEN Amount > 0 THEN 'Income' ELSE 'Zero' END"
+
+# Rows with a missing cube key are left out of the cube (and the monthly summary built from it)
+KEYS_PRESENT_SQL = ' AND '.join(f'"{key}" IS NOT NULL' for key in CUBE_KEYS if key != 'Flow')
+
+CUBE_SQL = f"""
+SELECT "Date", Merchant_Category, Country, City, "Type", Hour, Weekday,
+       {FLOW_SQL} AS Flow,
+       sum(Amount) AS Amount, sum(Amount_Abs) AS Amount_Abs, max(Amount_Abs) AS Max_Abs, count(*) AS Count
+FROM transactions WHERE {{where}} AND {KEYS_PRESENT_SQL}
+GROUP BY ALL
+ORDER BY "Date"
+"""
+
+TOTALS_SQL = """
+WITH filtered AS (SELECT "Date", Amount, Amount_Abs FROM transactions WHERE {where}),
+     last_expense AS (SELECT max("Date") AS last_expense_date FROM filtered WHERE Amount < 0)
+SELECT count(*) AS transactions,
+       coalesce(sum(Amount) FILTER (WHERE Amount > 0), 0) AS total_income,
+       coalesce(-sum(Amount) FILTER (WHERE Amount < 0), 0) AS total_expenses,
+       min("Date") AS first_date,
+       max("Date") AS last_date,
+       count(DISTINCT "Date") AS unique_days,
+       avg(Amount) AS mean_amount,
+       coalesce(-min(Amount) FILTER (WHERE Amount < 0), 0) AS largest_expense,
+       coalesce(max(Amount) FILTER (WHERE Amount > 0), 0) AS largest_income,
+       any_value(last_expense_date) AS last_expense_date,
+       coalesce(sum(Amount_Abs) FILTER (WHERE Amount < 0 AND "Date" >= date_trunc('month', last_expense_date)), 0)
+           AS current_month_expenses
+FROM filtered, last_expense
+"""
+
+MONTHLY_SQL = f"""
+SELECT strftime("Date", '%Y-%m') AS Month,
+       coalesce(sum(Amount) FILTER (WHERE Amount > 0), 0) AS Income,
+       coalesce(sum(Amount_Abs) FILTER (WHERE Amount < 0), 0) AS Expenses
+FROM transactions WHERE {{where}} AND {KEYS_PRESENT_SQL}
+GROUP BY 1
+HAVING count(*) FILTER (WHERE Amount <> 0) > 0
+ORDER BY 1
+"""
+
+TOP_MERCHANTS_SQL = """
+SELECT Description_Anon AS Merchant, sum(Amount_Abs) AS "Total Spent"
+FROM transactions WHERE {where} AND Amount < 0 AND Description_Anon IS NOT NULL
+GROUP BY 1
+ORDER BY "Total Spent" DESC
+LIMIT ?
+"""
+
+# The file order breaks Date ties, so rows come in the (stable) order of the loaded table
+FIRST_ROWS_SQL = """
+SELECT {columns}
+FROM transactions WHERE {{where}} AND {condition}
+{order}
+LIMIT ?
+"""
+
+
+class SQLEngine:
+    """DuckDB connection over one dataset version, answering the dashboard's aggregate queries."""
+
+    name = 'duckdb'
+
+    def __init__(self, parquet_files=None, df=None, threads=None, memory_limit=None):
+        self._con = duckdb.connect()
+        self._lock = threading.Lock()
+        if threads:
+            self._con.execute(f"SET threads = {int(threads)}")
+        if memory_limit:
+            self._con.execute(f"SET memory_limit = '{memory_limit}'")
+        if parquet_files:
+            self.source = 'parquet'
+            paths = ', '.join("'" + path.replace("'", "''") + "'" for path in parquet_files)
+            self._con.execute(f"CREATE VIEW transactions AS SELECT * FROM read_parquet([{paths}], union_by_name = true, "
+                              "filename = true, file_row_number = true)")
+            self._row_order = 'ORDER BY "Date", filename, file_row_number'
+
+        else:
+            # Scan the in-memory table directly (no copy)
+            self.source = 'memory'
+            self._con.register('transactions_frame', df)
+            self._con.execute("CREATE VIEW transactions AS SELECT * FROM transactions_frame")
+            # The table is already in Date order, which DuckDB preserves for a plain scan
+            self._row_order = ''
+        self._columns = set(self._con.execute("SELECT * FROM transactions LIMIT 0").df().columns)
+
+    def _query(self, sql, start_date, end_date, category='All', params=()):
+        where = '"Date" >= ? AND "Date" < ?'
+        args = [pd.Timestamp(start_date).to_pydatetime(),
+                (pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_pydatetime()]
+        if category != 'All':
+            where += ' AND Merchant_Category = ?'
+            args.append(category)
+        # Sessions share the connection (the registered frame is connection-local), one query at
+        # a time; each query is itself parallelized across DuckDB's worker threads
+        with self._lock:
+            return self._con.execute(sql.format(where=where), args + list(params)).df()
+
+    def cube(self, start_date, end_date, category='All'):
+        """The aggregation cube of analytics.build_cube, restricted to the filters."""
+        cube = self._query(CUBE_SQL, start_date, end_date, category)
+        cube['Date'] = cube['Date'].astype('datetime64[ns]')
+        cube['Flow'] = pd.Categorical(cube['Flow'], categories=FLOW_CATEGORIES)
+        return add_calendar_keys(to_columnar_schema(cube, cents=False))
+
+    def totals(self, start_date, end_date, category='All'):
+        """The period aggregates of analytics.period_totals."""
+        row = self._query(TOTALS_SQL, start_date, end_date, category).iloc[0].to_dict()
+        totals = {'transactions': int(row['transactions'])}
+        if totals['transactions'] > 0:
+            totals.update(
+                total_income=row['total_income'],
+                total_expenses=row['total_expenses'],
+                first_date=pd.Timestamp(row['first_date']),
+                last_date=pd.Timestamp(row['last_date']),
+                unique_days=int(row['unique_days']),
+                mean_amount=row['mean_amount'],
+            )
+        totals['largest_expense'] = row['largest_expense']
+        totals['largest_income'] = row['largest_income']
+        if not pd.isna(row['last_expense_date']):
+            totals['last_expense_date'] = pd.Timestamp(row['last_expense_date'])
+            totals['current_month_expenses'] = row['current_month_expenses']
+        return totals
+
+    def monthly_summary(self, start_date, end_date, category='All'):
+        """Monthly income, expenses and net flow (Month, Income, Expenses, Net)."""
+        summary = self._query(MONTHLY_SQL, start_date, end_date, category)
+        summary['Net'] = summary['Income'] - summary['Expenses']
+        return summary
+
+    def top_merchants(self, start_date, end_date, category='All', n=15):
+        """Merchants with the highest total spending (Merchant, Total Spent)."""
+        return self._query(TOP_MERCHANTS_SQL, start_date, end_date, category, params=[n])
+
+    def first_rows(self, start_date, end_date, category, columns, n, expenses_only=False):
+        """The first n rows (in Date order) with a non-zero or negative amount (see analytics.first_rows)."""
+        columns = [col for col in columns if col in self._columns]
+        sql = FIRST_ROWS_SQL.format(
+            columns=', '.join(f'"{col}"' for col in columns),
+            condition='Amount < 0' if expenses_only else 'Amount IS DISTINCT FROM 0',
+            order=self._row_order,
+        )
+        rows = self._query(sql, start_date, end_date, category, params=[n])
+        rows['Date'] = rows['Date'].astype('datetime64[ns]')
+        return to_columnar_schema(rows, cents=False)
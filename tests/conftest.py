@@ -0,0 +1,65 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The modules live at the repository root, next to dashboard.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Days without transactions in the generated table
+GAP = ('2024-03-10', '2024-03-20')
+
+
+@pytest.fixture
+def transactions():
+    """
+    A small Date-sorted transaction table: a gap of days without rows, a category
+    without rows ('Unused'), missing amounts and a few zero amounts.
+    """
+    rng = np.random.default_rng(7)
+    days = pd.date_range('2024-01-01', '2024-04-30', freq='D')
+    days = days[(days < GAP[0]) | (days > GAP[1])]
+    n = 600
+    dates = np.sort(rng.choice(days.to_numpy(), n))
+    amount = np.round(rng.choice([-1, -1, -1, 1], n) * rng.gamma(2.0, 40.0, n), 2)
+    amount[::53] = np.nan
+    amount[5::97] = 0.0
+    categories = ['Food & Dining', 'Transport', 'Shopping', 'Unused']
+    return pd.DataFrame({
+        'Date': dates,
+        'Amount': amount,
+        'Amount_Abs': np.abs(amount),
+        'Merchant_Category': pd.Categorical(rng.choice(categories[:3], n), categories=categories),
+        'Type': pd.Categorical(rng.choice(['Card Payment', 'Transfer', 'Top-Up'], n)),
+        'Product': pd.Categorical(rng.choice(['Current', 'Savings'], n)),
+        'Country': pd.Categorical(rng.choice(['Spain', 'Belgium', 'France'], n)),
+        'City': pd.Categorical(rng.choice(['Madrid', 'Brussels', 'Paris', 'Lyon'], n)),
+        'Hour': rng.integers(0, 24, n).astype('int8'),
+    })
+
+
+@pytest.fixture
+def statement():
+    """Raw statement export rows (the CSV columns), Date-ordered over three months with a running balance."""
+    rng = np.random.default_rng(11)
+    n = 300
+    dates = pd.DatetimeIndex(np.sort(rng.choice(pd.date_range('2024-01-01', '2024-03-31', freq='D').to_numpy(), n)))
+    amount = np.round(rng.choice([-1, -1, -1, 1], n) * rng.gamma(2.0, 40.0, n), 2)
+    return pd.DataFrame({
+        'Type': rng.choice(['Card Payment', 'Transfer', 'Topup'], n),
+        'Product': rng.choice(['Current', 'Savings'], n),
+        'Amount': amount,
+        'Balance': np.round(1000 + np.cumsum(amount), 2),
+        'Year': dates.year,
+        'Month': dates.month,
+        'Day': dates.day,
+        'Weekday': dates.day_name(),
+        'Hour': rng.integers(0, 24, n),
+        'Amount_Abs': np.abs(amount),
+        'Description_Anon': rng.choice(['Grocer', 'Metro', 'Bookshop', 'Salary'], n),
+        'Merchant_Category': rng.choice(['Food & Dining', 'Transport', 'Shopping'], n),
+        'Country': rng.choice(['Spain', 'Belgium'], n),
+        'City': rng.choice(['Madrid', 'Brussels'], n),
+    })
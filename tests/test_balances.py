@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from balances import BalanceEngine
+
+OPENING = {'Main': 1000.0, 'Savings': 5000.0}
+SAVINGS_START = pd.Timestamp('2024-02-01')
+
+
+@pytest.fixture
+def ledgers(statement):
+    """Two accounts in one Date-sorted table; Savings starts in February, each reports its own balance."""
+    df = statement.assign(Date=pd.to_datetime(statement[['Year', 'Month', 'Day']]))
+    df['Account'] = np.where((df['Date'] >= SAVINGS_START) & (np.arange(len(df)) % 3 == 0), 'Savings', 'Main')
+    df.loc[7, 'Amount'] = np.nan
+    df['Balance'] = df.groupby('Account')['Amount'].transform(lambda amount: amount.fillna(0).cumsum()) + \
+        df['Account'].map(OPENING)
+    return df.round({'Balance': 2})
+
+
+def reference_daily(df, start_date, end_date):
+    # End-of-day balance of every account started so far, summed over accounts
+    per_account = df.groupby(['Date', 'Account'])['Balance'].last().unstack().ffill()
+    total = per_account.sum(axis=1)
+    total = total[(total.index >= start_date) & (total.index <= end_date)]
+    return pd.DataFrame({'Date': total.index.to_numpy(), 'Balance': total.to_numpy()})
+
+
+def test_running_balances_per_account(ledgers):
+    engine = BalanceEngine(ledgers)
+    np.testing.assert_allclose(engine.running, ledgers['Balance'].to_numpy())
+    assert engine.divergence_count == 0
+
+
+@pytest.mark.parametrize('window', [('2024-01-01', '2024-03-31'), ('2024-01-20', '2024-02-10'),
+                                    ('2024-03-15', '2024-03-15'), ('2024-05-01', '2024-05-31')])
+def test_daily_balances_match_pandas(ledgers, window):
+    actual = BalanceEngine(ledgers).daily_balances(*window)
+    expected = reference_daily(ledgers, *window)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_balance_as_of(ledgers):
+    engine = BalanceEngine(ledgers)
+    expected = reference_daily(ledgers, ledgers['Date'].min(), ledgers['Date'].max()).set_index('Date')['Balance']
+    for date in expected.index[::7]:
+        assert engine.balance_as_of(date) == pytest.approx(expected[date])
+    # Before any row nothing is known; before Savings starts only Main counts
+    assert engine.balance_as_of('2023-12-31') == 0.0
+    main = ledgers[(ledgers['Account'] == 'Main') & (ledgers['Date'] < SAVINGS_START)]
+    assert engine.balance_as_of(SAVINGS_START - pd.Timedelta(days=1)) == pytest.approx(main['Balance'].iloc[-1])
+    # After the last row the balance stays where it ended
+    assert engine.balance_as_of('2024-06-30') == pytest.approx(expected.iloc[-1])
+
+
+def test_reported_balance_that_disagrees_is_flagged(ledgers):
+    ledgers.loc[40, 'Balance'] += 0.05
+    engine = BalanceEngine(ledgers)
+    assert engine.divergence_count == 1
+    assert engine.diverged[40]
+
+
+@pytest.mark.parametrize('split', [0, 1, 100, 150, 299])
+def test_extended_matches_a_fresh_engine(ledgers, split):
+    # Savings first appears before or after the split
+    extended = BalanceEngine(ledgers.iloc[:split]).extended(ledgers)
+    fresh = BalanceEngine(ledgers)
+    np.testing.assert_array_equal(extended.running_cents, fresh.running_cents)
+    np.testing.assert_array_equal(extended.cumulative_cents, fresh.cumulative_cents)
+    pd.testing.assert_frame_equal(extended.daily_balances('2024-01-01', '2024-03-31'),
+                                  fresh.daily_balances('2024-01-01', '2024-03-31'))
+    assert extended.balance_as_of(SAVINGS_START - pd.Timedelta(days=1)) == \
+        fresh.balance_as_of(SAVINGS_START - pd.Timedelta(days=1))
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from analytics import date_range_bounds
+from bitmap_index import FILTER_COLUMNS, BitmapIndex, FilterOptions
+
+from conftest import GAP
+
+WINDOWS = [
+    ('2024-01-01', '2024-04-30'),
+    ('2024-02-03', '2024-02-03'),
+    ('2024-02-10', '2024-03-25'),
+    (GAP[0], GAP[1]),              # no rows
+    ('2024-05-01', '2024-06-30'),  # after the data
+]
+
+FILTERS = [
+    (),
+    (('Merchant_Category', ('Transport',)),),
+    (('Merchant_Category', ('Transport', 'Shopping')), ('Country', ('Spain',))),
+    (('Merchant_Category', ('Unused',)),),                     # a category without rows
+    (('Merchant_Category', ('Unused', 'Food & Dining')),),
+    (('Type', ('Card Payment',)), ('Hour', (0, 12, 23)), ('City', ('Paris', 'Lyon'))),
+    (('Product', ()),),                                        # nothing picked: no restriction
+    (('Account', ('Main',)),),                                 # not an indexed column: ignored
+]
+
+
+def expected_rows(df, start_date, end_date, filters=(), amount_range=None):
+    lo, hi = date_range_bounds(df, start_date, end_date)
+    keep = np.zeros(len(df), dtype=bool)
+    keep[lo:hi] = True
+    for col, picked in filters:
+        if picked and col in df.columns:
+            keep &= df[col].isin(picked).to_numpy()
+    if amount_range is not None:
+        # Missing amounts never fall inside a range
+        keep &= df['Amount_Abs'].between(*amount_range).to_numpy()
+    return np.flatnonzero(keep).tolist()
+
+
+def select(index, df, start_date, end_date, filters=(), amount_range=None):
+    lo, hi = date_range_bounds(df, start_date, end_date)
+    return index.select(lo, hi, filters, amount_range).tolist()
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('window', WINDOWS)
+def test_select_matches_pandas(transactions, window, filters):
+    index = BitmapIndex(transactions)
+    assert select(index, transactions, *window, filters) == expected_rows(transactions, *window, filters)
+
+
+def test_amount_bounds_on_bin_edges(transactions):
+    index = BitmapIndex(transactions, amount_bins=8)
+    edges = index._amount_edges
+    window = ('2024-01-01', '2024-04-30')
+    bounds = [(edges[0], edges[-1]), (edges[1], edges[2]), (edges[2], edges[2]), (edges[3], edges[-2]),
+              (edges[-1], edges[-1]), (edges[0], edges[0]), (edges[1] - 0.01, edges[1] + 0.01)]
+    # Bounds equal to amounts that occur, and bounds outside every amount
+    amounts = np.sort(transactions['Amount_Abs'].dropna().unique())
+    bounds += [(amounts[10], amounts[10]), (amounts[5], amounts[40]), (-5.0, -1.0), (edges[-1] + 1, edges[-1] + 2)]
+    for amount_range in bounds:
+        amount_range = (float(amount_range[0]), float(amount_range[1]))
+        assert select(index, transactions, *window, (), amount_range) == \
+            expected_rows(transactions, *window, (), amount_range), amount_range
+        filters = (('Merchant_Category', ('Transport',)),)
+        assert select(index, transactions, *('2024-02-10', '2024-03-25'), filters, amount_range) == \
+            expected_rows(transactions, '2024-02-10', '2024-03-25', filters, amount_range), amount_range
+
+
+def test_values_and_amount_range(transactions):
+    index = BitmapIndex(transactions)
+    # Only values that occur are offered, in category order
+    assert index.values['Merchant_Category'] == ['Food & Dining', 'Transport', 'Shopping']
+    assert index.values['Hour'] == sorted(transactions['Hour'].unique().tolist())
+    assert index.amount_range == (transactions['Amount_Abs'].min(), transactions['Amount_Abs'].max())
+    options = FilterOptions(transactions)
+    assert options.columns == index.columns == FILTER_COLUMNS
+    assert options.values == index.values
+    assert options.amount_range == index.amount_range
+
+
+def test_all_amounts_missing(transactions):
+    df = transactions.assign(Amount_Abs=np.nan)
+    index = BitmapIndex(df)
+    assert index.amount_range == FilterOptions(df).amount_range == (0.0, 0.0)
+    assert select(index, df, '2024-01-01', '2024-04-30', (), (0.0, 100.0)) == []
+
+
+@pytest.mark.parametrize('split', [0, 1, 7, 8, 9, 300, 599])
+def test_extended_matches_a_fresh_index(transactions, split):
+    extended = BitmapIndex(transactions.iloc[:split]).extended(transactions)
+    fresh = BitmapIndex(transactions)
+    assert extended.values == fresh.values
+    assert extended.amount_range == fresh.amount_range
+    for window in WINDOWS:
+        for filters in FILTERS:
+            assert select(extended, transactions, *window, filters) == expected_rows(transactions, *window, filters)
+        assert select(extended, transactions, *window, (), (20.0, 60.0)) == \
+            expected_rows(transactions, *window, (), (20.0, 60.0))
+
+
+def test_extended_from_a_row_inside_the_index(transactions):
+    # Rows from `start` on were rewritten (as extend_cube does with re-merged cube cells)
+    df = transactions.copy()
+    index = BitmapIndex(df)
+    df['Country'] = df['Country'].cat.add_categories(['Portugal'])
+    df.loc[300:, 'Country'] = 'Portugal'
+    extended = index.extended(df, start=300)
+    assert extended.values['Country'] == BitmapIndex(df).values['Country']
+    filters = (('Country', ('Portugal', 'Spain')),)
+    assert select(extended, df, '2024-01-01', '2024-04-30', filters) == \
+        expected_rows(df, '2024-01-01', '2024-04-30', filters)
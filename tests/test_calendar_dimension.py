@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from calendar_dimension import CALENDAR_KEYS, add_calendar_keys, calendar_keys, day_keys, month_labels, weekday_labels
+
+DATES = pd.Series(pd.to_datetime([
+    '1969-12-29', '1969-12-31', '1970-01-01', '1970-01-05', '2023-12-31', '2024-01-01',
+    '2024-02-29 23:59:00', '2024-03-31', '2024-04-01', '2024-12-30', '2025-01-05',
+], format='ISO8601'))
+
+
+def test_keys_match_pandas_calendar():
+    keys = calendar_keys(DATES)
+    epoch = pd.Timestamp('1970-01-01')
+    assert keys['DayKey'].tolist() == (DATES.dt.normalize() - epoch).dt.days.tolist()
+    assert keys['WeekdayCode'].tolist() == DATES.dt.weekday.tolist()
+    assert keys['MonthKey'].tolist() == ((DATES.dt.year - 1970) * 12 + DATES.dt.month - 1).tolist()
+    assert keys['QuarterKey'].tolist() == ((DATES.dt.year - 1970) * 4 + DATES.dt.quarter - 1).tolist()
+    # Weeks start on Monday: one key per Monday-Sunday week, counted from the week of 1970-01-01 (a Thursday)
+    mondays = DATES.dt.normalize() - pd.to_timedelta(DATES.dt.weekday, unit='D')
+    assert (keys['WeekKey'].astype(int) * 7 - 3).tolist() == (mondays - epoch).dt.days.tolist()
+    assert day_keys(DATES).tolist() == keys['DayKey'].tolist()
+
+
+def test_labels_match_pandas_calendar():
+    keys = calendar_keys(DATES)
+    assert month_labels(keys['MonthKey']).tolist() == DATES.dt.strftime('%Y-%m').tolist()
+    assert weekday_labels(keys['WeekdayCode']).tolist() == DATES.dt.day_name().tolist()
+
+
+def test_key_dtypes_and_empty_input():
+    keys = calendar_keys(pd.Series(pd.to_datetime([])))
+    for name, dtype in CALENDAR_KEYS.items():
+        assert keys[name].dtype == np.dtype(dtype)
+        assert len(keys[name]) == 0
+    assert len(month_labels([])) == 0
+
+
+def test_add_calendar_keys_leaves_the_frame_alone(transactions):
+    frame = transactions[['Date', 'Amount']]
+    keyed = add_calendar_keys(frame)
+    assert list(frame.columns) == ['Date', 'Amount']
+    assert list(keyed.columns) == ['Date', 'Amount'] + list(CALENDAR_KEYS)
+    # Grouping on the integer month key gives the same totals as grouping on the month period
+    by_key = keyed.groupby('MonthKey')['Amount'].sum()
+    by_period = frame.groupby(frame['Date'].dt.to_period('M'))['Amount'].sum()
+    assert month_labels(by_key.index).tolist() == by_period.index.astype(str).tolist()
+    np.testing.assert_allclose(by_key.to_numpy(), by_period.to_numpy())
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from analytics import build_cube, extend_cube, period_totals
+from data_store import CENTS_COLUMN, amount_cents, to_columnar_schema
+
+
+def test_cents_column(transactions):
+    df = to_columnar_schema(transactions.copy())
+    cents = df[CENTS_COLUMN]
+    assert cents.dtype == np.int64
+    amount = transactions['Amount']
+    # Missing amounts count as 0 cents
+    assert (cents[amount.isna()] == 0).all()
+    assert (cents[amount.notna()] == (amount[amount.notna()] * 100).round().astype(np.int64)).all()
+    np.testing.assert_array_equal(amount_cents(transactions), cents.to_numpy())
+    # Query results that only need the dtypes are left without it
+    assert CENTS_COLUMN not in to_columnar_schema(transactions[['Date', 'Amount']].copy(), cents=False).columns
+
+
+def test_money_totals_are_exact():
+    # 0.10 has no exact float representation: float sums of many of them drift off the cent
+    n = 1000
+    df = to_columnar_schema(pd.DataFrame({
+        'Date': pd.Timestamp('2024-01-01'),
+        'Amount': np.tile([0.1, -0.1], n // 2),
+        'Amount_Abs': 0.1,
+        'Merchant_Category': 'Food & Dining', 'Country': 'Spain', 'City': 'Madrid', 'Type': 'Card Payment',
+        'Hour': np.zeros(n, dtype='int8'), 'Weekday': 'Monday',
+    }))
+    assert df['Amount_Abs'].sum() != n * 0.1
+    cube = build_cube(df)
+    assert cube['Amount_Abs'].sum() == 100.0
+    assert cube.loc[cube['Flow'] == 'Income', 'Amount'].sum() == 50.0
+    assert extend_cube(build_cube(df.iloc[:n // 2]), df.iloc[n // 2:])['Amount_Abs'].sum() == 100.0
+
+    expenses, income = df[df['Amount'] < 0], df[df['Amount'] > 0]
+    totals = period_totals(df, expenses, income)
+    assert totals['total_income'] == 50.0 and totals['total_expenses'] == 50.0
+    assert totals['current_month_expenses'] == 50.0
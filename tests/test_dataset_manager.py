@@ -0,0 +1,126 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_store
+import dataset_manager
+from analytics import CUBE_KEYS
+from dataset_manager import DatasetManager, build_version
+
+QUERIES = [
+    (pd.Timestamp('2024-01-01'), pd.Timestamp('2024-03-31'), 'All'),
+    (pd.Timestamp('2024-02-10'), pd.Timestamp('2024-03-31'), 'Transport'),
+    (pd.Timestamp('2024-03-20'), pd.Timestamp('2024-03-31'), 'Shopping'),
+]
+FILTERS = [(), (('Merchant_Category', ('Transport',)), ('Country', ('Spain',))), (('Type', ('Topup',)),)]
+
+
+def write_csv(frame, path, offset):
+    frame.to_csv(path, index=False)
+    # Stamp it `offset` seconds from now: distinct stamps, and newer than the copies, even with coarse timestamps
+    mtime_ns = time.time_ns() + offset * 1_000_000_000
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_scan_rows_refresh_in_the_background(statement, tmp_path):
+    path = str(tmp_path / 'statement.csv')
+    write_csv(statement.iloc[:-50], path, -60)
+    manager = DatasetManager(path, scan=True)
+    version = manager.get()
+    assert version['df'] is None
+    rows = manager.rows(version)
+    assert rows['df'] is not None and manager.rows(version) is rows
+
+    write_csv(statement, path, 5)
+    manager.get()
+    manager._refresh_thread.join()
+    new_version = manager.get()
+    assert new_version['row_count'] == len(statement)
+    # The previous rows are served while the new ones are built
+    assert manager.rows(new_version) is rows
+    manager._rows_thread.join()
+    new_rows = manager.rows(new_version)
+    assert new_rows['file_mtime'] == new_version['file_mtime']
+    pd.testing.assert_frame_equal(new_rows['df'], build_version(path, 0)['df'])
+
+
+def append_csv(frame, path, offset):
+    with open(path, 'a') as f:
+        frame.to_csv(f, index=False, header=False)
+    mtime_ns = time.time_ns() + offset * 1_000_000_000
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def assert_same_version(actual, expected):
+    """Every structure of a dataset version answers as the expected one's."""
+    pd.testing.assert_frame_equal(actual['df'], expected['df'])
+    pd.testing.assert_frame_equal(actual['cube'].sort_values(CUBE_KEYS).reset_index(drop=True),
+                                  expected['cube'].sort_values(CUBE_KEYS).reset_index(drop=True),
+                                  check_categorical=False)
+    for query in ['grocer', 'metro', 'book', 'salary transport']:
+        assert np.array_equal(actual['search_index'].search(query), expected['search_index'].search(query)), query
+    for start, end, category in QUERIES:
+        totals, expected_totals = actual['kpi_index'].totals(start, end, category), \
+            expected['kpi_index'].totals(start, end, category)
+        assert sorted(totals) == sorted(expected_totals)
+        for key, value in expected_totals.items():
+            if isinstance(value, float):
+                assert totals[key] == pytest.approx(value), key
+            else:
+                assert totals[key] == value, key
+        pd.testing.assert_frame_equal(actual['balances'].daily_balances(start, end),
+                                      expected['balances'].daily_balances(start, end))
+        assert actual['balances'].balance_as_of(end) == pytest.approx(expected['balances'].balance_as_of(end))
+    for name in ('bitmap_index', 'cube_bitmap_index'):
+        assert actual[name].values == expected[name].values
+        assert actual[name].amount_range == expected[name].amount_range
+    n_rows = len(expected['df'])
+    for filters in FILTERS:
+        assert actual['bitmap_index'].select(0, n_rows, filters).tolist() == \
+            expected['bitmap_index'].select(0, n_rows, filters).tolist()
+    assert actual['date_bounds'] == expected['date_bounds']
+
+
+def test_append_extends_every_structure(statement, tmp_path, monkeypatch):
+    path = str(tmp_path / 'statement.csv')
+    write_csv(statement.iloc[:-50], path, -60)
+    previous = build_version(path, 1)
+
+    append_csv(statement.iloc[-50:], path, 5)
+
+    def no_rebuild(df):
+        raise AssertionError("an append must not rebuild the cube")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(dataset_manager, 'build_cube', no_rebuild)
+        version = build_version(path, 2, previous)
+    assert version['row_count'] == len(statement)
+    assert_same_version(version, build_version(path, 3))
+
+
+def test_edited_prefix_reloads_in_full(statement, tmp_path, monkeypatch):
+    path = str(tmp_path / 'statement.csv')
+    write_csv(statement.iloc[:-50], path, -60)
+    previous = build_version(path, 1)
+
+    # A changed amount in the rows already read, and new rows after them
+    edited = statement.copy()
+    edited.loc[10, 'Amount'] = -edited.loc[10, 'Amount']
+    write_csv(edited.iloc[:-50], path, 5)
+    append_csv(edited.iloc[-50:], path, 5)
+
+    full_loads = []
+    load_tracked = data_store.load_tracked
+
+    def counting_load(csv_path):
+        full_loads.append(csv_path)
+        return load_tracked(csv_path)
+
+    monkeypatch.setattr(data_store, 'load_tracked', counting_load)
+    version = build_version(path, 2, previous)
+    assert full_loads == [path]
+    assert version['df']['Amount'].iloc[10] == edited.loc[10, 'Amount']
+    assert_same_version(version, build_version(path, 3))
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import filtered_rows, period_totals
+from kpi_index import KPIIndex
+
+from conftest import GAP
+
+CATEGORIES = ['All', 'Food & Dining', 'Transport', 'Unused', 'Not a category']
+
+WINDOWS = [
+    ('2024-01-01', '2024-04-30'),  # every day
+    ('2023-06-01', '2025-06-01'),  # wider than the data
+    ('2024-02-03', '2024-02-03'),  # a single day
+    ('2024-02-10', '2024-03-25'),  # spans the gap
+    (GAP[0], GAP[1]),              # only the gap: no rows
+    ('2023-01-01', '2023-12-31'),  # before the data
+    ('2024-05-01', '2024-06-30'),  # after the data
+    ('2024-03-05', '2024-03-01'),  # start after end
+]
+
+
+def expected_totals(df, start_date, end_date, category):
+    rows = filtered_rows(df, None, start_date, end_date, category)
+    return period_totals(rows['filtered_df'], rows['expenses_df'], rows['income_df'])
+
+
+def assert_same_totals(actual, expected):
+    assert sorted(actual) == sorted(expected)
+    for key, value in expected.items():
+        if isinstance(value, pd.Timestamp) or key in ('transactions', 'unique_days'):
+            assert actual[key] == value, key
+        elif pd.isna(value):
+            assert pd.isna(actual[key]), key
+        else:
+            assert actual[key] == pytest.approx(value, abs=1e-6), key
+
+
+@pytest.mark.parametrize('category', CATEGORIES)
+@pytest.mark.parametrize('window', WINDOWS)
+def test_totals_match_pandas(transactions, window, category):
+    index = KPIIndex(transactions)
+    assert_same_totals(index.totals(*window, category), expected_totals(transactions, *window, category))
+
+
+def test_empty_windows_and_categories(transactions):
+    index = KPIIndex(transactions)
+    empty = {'transactions': 0, 'largest_expense': 0, 'largest_income': 0}
+    assert index.totals(*GAP) == empty
+    assert index.totals('2024-01-01', '2024-04-30', 'Unused') == empty
+    assert index.totals('2024-01-01', '2024-04-30', 'Not a category') == empty
+
+
+def test_missing_amounts(transactions):
+    # Every amount of one day missing: the rows count, the money totals do not
+    df = transactions.copy()
+    day = df['Date'] == df['Date'].iloc[100]
+    df.loc[day, ['Amount', 'Amount_Abs']] = np.nan
+    date = df['Date'].iloc[100]
+    totals = KPIIndex(df).totals(date, date)
+    assert totals['transactions'] == int(day.sum())
+    assert totals['total_income'] == 0 and totals['total_expenses'] == 0
+    assert np.isnan(totals['mean_amount'])
+    assert 'last_expense_date' not in totals
+    assert_same_totals(totals, expected_totals(df, date, date, 'All'))
+
+
+def test_index_of_an_empty_table(transactions):
+    index = KPIIndex(transactions.iloc[:0])
+    assert index.totals('2024-01-01', '2024-04-30') == {'transactions': 0, 'largest_expense': 0,
+                                                        'largest_income': 0}
+
+
+@pytest.mark.parametrize('split', [0, 1, 300, 599])
+def test_extended_matches_a_fresh_index(transactions, split):
+    # New rows start on the last indexed day (same-day appends) or later
+    extended = KPIIndex(transactions.iloc[:split]).extended(transactions)
+    fresh = KPIIndex(transactions)
+    for window in WINDOWS:
+        for category in CATEGORIES:
+            assert_same_totals(extended.totals(*window, category), fresh.totals(*window, category))
+
+
+def test_extended_with_new_category(transactions):
+    df = transactions.copy()
+    df['Merchant_Category'] = df['Merchant_Category'].astype(object)
+    df.loc[550:, 'Merchant_Category'] = 'Travel'
+    extended = KPIIndex(df.iloc[:550]).extended(df)
+    for category in ['All', 'Travel', 'Transport']:
+        assert_same_totals(extended.totals('2024-01-01', '2024-04-30', category),
+                           expected_totals(df, '2024-01-01', '2024-04-30', category))
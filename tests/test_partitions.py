@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+
+import dataset_manager
+from dataset_manager import DatasetManager, build_version
+from partitions import load_partitioned, partitions_mtime, write_partitioned
+
+
+def test_stamp_ignores_derived_copies(statement, tmp_path):
+    root = str(tmp_path / 'statements')
+    write_partitioned(statement, root, 'Main')
+    before = partitions_mtime(root)
+    load_partitioned(root, max_workers=1)
+    assert any(name.endswith('.parquet') for _, _, files in os.walk(root) for name in files)
+    assert partitions_mtime(root) == before
+
+
+def test_stamp_sees_added_and_removed_partitions(statement, tmp_path):
+    root = str(tmp_path / 'statements')
+    written = write_partitioned(statement, root, 'Main')
+    before = partitions_mtime(root)
+    write_partitioned(statement[statement['Month'] == 1], root, 'Savings')
+    added = partitions_mtime(root)
+    assert added != before
+    os.remove(written[0])
+    assert partitions_mtime(root) not in (before, added)
+    assert partitions_mtime(str(tmp_path / 'missing')) == 0
+
+
+def test_unchanged_tree_loads_once(statement, tmp_path, monkeypatch):
+    root = str(tmp_path / 'statements')
+    write_partitioned(statement, root, 'Main')
+    builds = []
+
+    def counting_build(*args, **kwargs):
+        builds.append(args)
+        return build_version(*args, **kwargs)
+
+    monkeypatch.setattr(dataset_manager, 'build_version', counting_build)
+    manager = DatasetManager(root)
+    first = manager.get()
+    assert manager.get() is first
+    assert len(builds) == 1
+    assert manager._refresh_thread is None
+
+
+def test_empty_window_keeps_schema(statement, tmp_path):
+    root = str(tmp_path / 'statements')
+    write_partitioned(statement, root, 'Main')
+    full = load_partitioned(root, max_workers=1)
+    empty = load_partitioned(root, '2030-01-01', '2030-01-31')
+    assert len(empty) == 0
+    pd.testing.assert_series_equal(empty.dtypes, full.dtypes)
+
+    version = build_version(root, partitions_mtime(root), start_date='2030-01-01', end_date='2030-01-31')
+    assert version['row_count'] == 0
+    assert version['date_bounds'] is None
+    assert len(version['cube']) == 0
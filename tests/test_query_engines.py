@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from analytics import CUBE_KEYS, SCATTER_COLUMNS, PandasEngine
+from dataset_manager import build_version
+from query_engines import QUERY_ENGINES, create_engine
+
+QUERIES = [
+    (None, None, 'All'),
+    ('2024-01-15', '2024-02-20', 'All'),
+    ('2024-02-01', '2024-03-31', 'Transport'),
+    ('2024-03-05', '2024-03-05', 'Shopping'),
+]
+
+
+@pytest.fixture
+def version(statement, tmp_path):
+    csv_path = str(tmp_path / 'statement.csv')
+    statement.to_csv(csv_path, index=False)
+    return build_version(csv_path, 0)
+
+
+def engine_under_test(name, version, in_memory):
+    if not QUERY_ENGINES[name]:
+        pytest.skip(f"{name} is not installed")
+    if in_memory:
+        return create_engine(name, version['data_file'], version['df'], version['cube'], version['kpi_index'])
+    # Scan mode: no loaded table, the backend reads the Parquet copy
+    return create_engine(name, version['data_file'], None, None)
+
+
+def assert_same(actual, expected):
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                      check_dtype=False, check_categorical=False)
+    else:
+        assert sorted(actual) == sorted(expected)
+        for key, value in expected.items():
+            if isinstance(value, pd.Timestamp) or key in ('transactions', 'unique_days'):
+                assert actual[key] == value, key
+            elif pd.isna(value):
+                assert pd.isna(actual[key]), key
+            else:
+                assert actual[key] == pytest.approx(value, abs=1e-6), key
+
+
+# The pandas backend always answers from the loaded table
+@pytest.mark.parametrize('name, in_memory', [
+    ('pandas', True), ('duckdb', True), ('duckdb', False), ('polars', True), ('polars', False),
+], ids=['pandas', 'duckdb-memory', 'duckdb-parquet', 'polars-memory', 'polars-parquet'])
+def test_engine_matches_pandas(version, name, in_memory):
+    engine = engine_under_test(name, version, in_memory)
+    reference = PandasEngine(version['df'], version['cube'], version['kpi_index'])
+    for start, end, category in QUERIES:
+        start = pd.Timestamp(start) if start else version['date_bounds'][0]
+        end = pd.Timestamp(end) if end else version['date_bounds'][1]
+        assert_same(engine.totals(start, end, category), reference.totals(start, end, category))
+        assert_same(engine.monthly_summary(start, end, category), reference.monthly_summary(start, end, category))
+        assert_same(engine.top_merchants(start, end, category, n=3), reference.top_merchants(start, end, category, n=3))
+        for expenses_only in (False, True):
+            assert_same(engine.first_rows(start, end, category, SCATTER_COLUMNS, 40, expenses_only),
+                        reference.first_rows(start, end, category, SCATTER_COLUMNS, 40, expenses_only))
+        # Cube cells have no defined order within a day
+        cube, expected = engine.cube(start, end, category), reference.cube(start, end, category)
+        assert_same(cube[expected.columns].sort_values(CUBE_KEYS), expected.sort_values(CUBE_KEYS))
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from search_index import MAX_SEGMENTS, SearchIndex
+
+
+def transactions(descriptions, categories=None):
+    n = len(descriptions)
+    return pd.DataFrame({
+        'Description_Anon': pd.Categorical(descriptions),
+        'Merchant_Category': categories if categories is not None else ['Shopping'] * n,
+        'Country': ['Spain'] * n,
+        'City': ['Madrid'] * n,
+    })
+
+
+def rows(ids):
+    return np.asarray(ids).tolist()
+
+
+def test_words_match_token_prefixes_only():
+    index = SearchIndex(transactions(['Corner Store', 'Storehouse', 'Ore Mining', 'Bookstore']))
+    assert rows(index.search('store')) == [0, 1]
+    # Not a substring match: "ore" is a prefix of "ore" only, not of "store" or "bookstore"
+    assert rows(index.search('ore')) == [2]
+    assert rows(index.search('STO')) == [0, 1]
+    assert rows(index.search('stores')) == []
+
+
+def test_every_query_word_must_match():
+    df = transactions(['Bolt Ride', 'Bolt Food', 'Uber Ride', 'Food Market'],
+                      ['Transport', 'Food & Dining', 'Transport', 'Food & Dining'])
+    index = SearchIndex(df)
+    assert rows(index.search('bolt')) == [0, 1]
+    assert rows(index.search('bolt ride')) == [0]
+    assert rows(index.search('ride bolt')) == [0]
+    # Words may match in different columns (description and category)
+    assert rows(index.search('food din')) == [1, 3]
+    assert rows(index.search('uber food')) == []
+    # Repeated words and punctuation do not change the result
+    assert rows(index.search('bolt, bolt!')) == [0, 1]
+
+
+def test_query_without_words():
+    index = SearchIndex(transactions(['Corner Store']))
+    assert index.search('') is None
+    assert index.search('& -') is None
+
+
+def test_missing_values_are_not_indexed():
+    index = SearchIndex(transactions(['Corner Store', None, 'Store']))
+    assert rows(index.search('store')) == [0, 2]
+
+
+def test_extended_indexes_appended_rows():
+    df = transactions(['Corner Store', 'Bolt Ride', 'Storehouse', 'Bolt Food', 'New Store', 'Metro'])
+    head = SearchIndex(df.iloc[:3])
+    index = head.extended(df)
+    assert index.n_rows == len(df)
+    for query in ['store', 'bolt', 'bolt food', 'metro', 'ore', 'corner']:
+        assert rows(index.search(query)) == rows(SearchIndex(df).search(query)), query
+    # The earlier index is left as it was
+    assert rows(head.search('store')) == [0, 2]
+    assert head.extended(df.iloc[:3]) is head
+
+
+def test_extended_compacts_many_segments():
+    descriptions = [f'Shop {i}' if i % 2 else f'Store {i}' for i in range(MAX_SEGMENTS + 4)]
+    df = transactions(descriptions)
+    index = SearchIndex(df.iloc[:1])
+    for end in range(2, len(df) + 1):
+        index = index.extended(df.iloc[:end])
+        assert len(index._segments) <= MAX_SEGMENTS
+    assert rows(index.search('store')) == rows(SearchIndex(df).search('store'))
+    assert rows(index.search('shop 7')) == [7]